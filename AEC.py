@@ -3,7 +3,7 @@ Adaptive Efficiency Control (AEC)
 
 The module will provide businesses with the possibility for saving money by implementing a strategic planned 24 hour pumping regime and deliver this in the best manner.
 """
-import csv, datetime, time, itertools, os, json, sys
+import csv, datetime, hashlib, time, itertools, os, json, sys
 from dotenv import load_dotenv, find_dotenv
 import cvxpy as cp
 import numpy as np
@@ -11,7 +11,14 @@ from prettytable import PrettyTable
 import pandas as pd
 from AECDatabase import AECDatabase
 from AECUtilities import AECUtilities
-from AECExceptions import LevelTooLowError, LevelTooHighError, TargetNotSatisfiedError, MaxVolumeExceededError
+from AECPumpCurve import AECPumpCurve
+from AECCalendar import AECCalendar
+from AECCostEngine import AECCostEngine
+from AECPrices import AECPrices
+from AECSolutionCache import AECSolutionCache
+from AECProfiler import AECProfiler
+from AECCoordinator import AECCoordinator
+from AECExceptions import LevelTooLowError, LevelTooHighError, TargetNotSatisfiedError, MaxVolumeExceededError, RegimeInfeasibleError, RecalculationNotRequired
 load_dotenv(find_dotenv())
 
 class AEC(AECDatabase, AECUtilities):
@@ -35,46 +42,138 @@ class AEC(AECDatabase, AECUtilities):
     """Environment variable for DB_PORT"""
     DB_NAME = os.environ['DB_NAME']
     """Environment variable for DB_NAME"""
+    SUCTION_WINDOW = int(os.environ.get('AEC_SUCTION_WINDOW', 10))
+    """Number of recent suction pressure samples averaged for suction adjustment"""
+    SUCTION_CACHE_SECONDS = float(os.environ.get('AEC_SUCTION_CACHE_SECONDS', 300))
+    """Seconds a site's smoothed suction pressure is reused before it is read again"""
+    suction_cache = {}
+    """Smoothed suction pressure per site, shared by all AEC instances in the process"""
+    HOLIDAY_CACHE_SECONDS = float(os.environ.get('AEC_HOLIDAY_CACHE_SECONDS', 86400))
+    """Seconds the bank holidays are reused before they are read again"""
+    holiday_cache = []
+    """Time the bank holidays were read and the holidays, shared by all AEC instances in the process"""
+    solution_cache = AECSolutionCache()
+    """Regimes already solved, shared by all AEC instances in the process"""
+    coordinator = AECCoordinator()
+    """Runs in flight per site, shared by all AEC instances in the process so concurrent requests for a site are solved once"""
+    LEVEL_SLACK_PENALTY = float(os.environ.get('AEC_LEVEL_SLACK_PENALTY', 100000))
+    """Penalty per metre the level falls below MinLevel or rises above MaxLevel in each half hour, when the level band cannot be met"""
+    VOLUME_SLACK_PENALTY = float(os.environ.get('AEC_VOLUME_SLACK_PENALTY', 0.01))
+    """Penalty per litre the regime falls short of the target, when the target cannot be met"""
+    ANYTIME_BUDGET = float(os.environ.get('AEC_ANYTIME_BUDGET', 0))
+    """Seconds the optimiser has to replace the greedy regime published first, 0 to wait for the optimiser alone"""
 
-    def __init__(self, current_level, site_id, pump_combo, debug):
-        self.setup_connection(self.DB_USER, self.DB_PASS, self.DB_HOST, self.DB_PORT, self.DB_NAME)
-        self.month = datetime.datetime.today().strftime("%B")[:3]
-        self.day = self.CONST_DOW[datetime.datetime.today().weekday()]
-        self.hour = 0#datetime.datetime.today().hour
-        self.minute = 0#datetime.datetime.today().minute
-        self.weekday = self.is_weekday()
-        self.site_id = site_id
-        self.site_data = self.get_site_data()
-        self.cost_data = self.get_cost_data(self.site_data["CostType"], self.month)
-        self.pump_data = self.get_pump_data(pump_combo)
-        self.suctionAdjustment = bool(self.site_data["SuctionAdjustment"])
-
-        # If suction adjustment enabled then we will calculate the suction adjustment factor and apply to self.pump_data
-        if self.suctionAdjustment:
-            latest_suction_pressure = float(self.get_latest_suction_pressure()[0]["Pressure"])
-            
-            # Loop self.pump_data and apply suction adjustment factor
-            for i in range(len(self.pump_data)):
-                factor = latest_suction_pressure / float(self.pump_data[i]["SuctionPressure"])
-                self.pump_data[i]["Flow"] = float(self.pump_data[i]["Flow"]) * factor
-
-        self.pump_combo = pump_combo
-        self.time_data = self.get_tariff_data(self.site_data["TariffType"])
-        self.mode = self.get_mode()
-        self.all_data = []
-        self.best_cost = 1000000000000000000000000000000
-        self.best_volume = 0
-        self.target = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet'])).sum()*1800
-        self.current_level = current_level
-        self.min_level = self.site_data["MinLevel"]
-        self.max_level = self.site_data["MaxLevel"]
-        self.SURFACE_AREA = self.site_data["SurfaceArea"]
-        self.DEBUG = debug
-        print(json.dumps(self.get_regime()))
-        self.dev_debug()
+    def __init__(self, current_level, site_id, pump_combo, debug, run=True, inputs=None, now=None):
+        # Only runs are profiled, and only when AEC_PROFILE or --profile turns it on
+        self.profiler = AECProfiler(site_id) if run and AECProfiler.ENABLED else None
+        # The profiler is stopped however the run ends, including while the site is loaded
+        try:
+            self.profile_stage("site")
+            self.setup_connection(self.DB_USER, self.DB_PASS, self.DB_HOST, self.DB_PORT, self.DB_NAME)
+            # Time of the run, simulations such as AECReplay pass their own clock, live runs plan from midnight today
+            self.now = now or datetime.datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+            self.month = self.now.strftime("%B")[:3]
+            self.day = self.CONST_DOW[self.now.weekday()]
+            self.hour = self.now.hour
+            self.minute = self.now.minute
+            self.site_id = site_id
+            # Inputs already fetched by the caller (see AECAsyncDatabase.gather_run_inputs) are used instead of reading them again
+            inputs = inputs or {}
+            self.site_data = inputs["site"] if "site" in inputs else self.get_site_data()
+            self.cost_data = inputs["cost"] if "cost" in inputs else self.get_cost_data(self.site_data["CostType"], self.month)
+            # A pump_combo of None lets the optimiser choose jointly across every combination at the site
+            if "pump" in inputs:
+                self.pump_data = [dict(data) for data in inputs["pump"]]
+            elif pump_combo is None:
+                self.pump_data = self.get_all_pump_data()
+            else:
+                self.pump_data = self.get_pump_data(pump_combo)
+            self.suctionAdjustment = bool(self.site_data["SuctionAdjustment"])
+            self.continuousSpeed = bool(self.site_data.get("ContinuousSpeed"))
+
+            # If suction adjustment enabled then we will correct self.pump_data for the smoothed suction pressure
+            if self.suctionAdjustment:
+                suction_pressure = inputs["suction_pressure"] if "suction_pressure" in inputs else self.get_suction_pressure()
+                if suction_pressure is not None:
+                    self.pump_data = AECPumpCurve.adjust_for_suction(self.pump_data, suction_pressure)
+
+            self.pump_combo = pump_combo
+            self.profile_stage("tariff")
+            self.time_data = inputs["tariff"] if "tariff" in inputs else self.get_tariff_data(self.site_data["TariffType"])
+            # Period boundaries, bands and unit costs are compiled once per tariff and looked up by index from here on
+            self.calendar = AECCalendar.compile(self.time_data, [self.cost_data])
+            self.holidays = set(inputs["holidays"] if "holidays" in inputs else self.get_holidays())
+            self.weekday = self.is_weekday()
+            # A complete half hourly price curve for the day replaces the tariff bands, averaged over each tariff period
+            self.price_curve = inputs["prices"] if "prices" in inputs else AECPrices(self).day_prices(self.now.date())
+            self.mode = self.get_mode()
+            self.cost_engine = AECCostEngine(self.pump_data)
+            self.matrices = None
+            self.best_cost = 1000000000000000000000000000000
+            self.best_volume = 0
+            self.slacks = None
+            self.relaxed = {}
+            self.anytime = None
+            self.profile_stage("historical")
+            # The averaged demand profile is read once per run
+            self.historical = inputs["historical"] if "historical" in inputs else self.get_historical()
+            self.target = pd.Series(self.historical).apply(lambda x: float(x['Outlet'])).sum()*1800
+            self.current_level = current_level
+            self.min_level = self.site_data["MinLevel"]
+            self.max_level = self.site_data["MaxLevel"]
+            self.SURFACE_AREA = self.site_data["SurfaceArea"]
+            self.DEBUG = debug
+            # run=False only loads the site so callers such as AECNetwork can drive the optimisation themselves
+            if run:
+                regime = AEC.coordinator.run(self, self.get_regime, self.current_plan)
+                self.profile_stage("output")
+                print(json.dumps(regime))
+                self.dev_debug()
+        finally:
+            if self.profiler is not None:
+                self.profiler.finish()
+
+    def profile_stage(self, name):
+        """
+        This method starts the next stage of the run's profile, when the run is profiled (see `AECProfiler`).
+        """
+        if self.profiler is not None:
+            self.profiler.stage(name)
+
+    def get_suction_pressure(self):
+        """
+        This method returns the smoothed suction pressure for the site, reusing the cached value while it is fresh.
+
+        Returns
+        ----------
+        Float
+            Average of the recent suction pressure samples, None if the site has no samples.
+        """
+        cached = AEC.suction_cache.get(self.site_id)
+        if cached is not None and time.monotonic()-cached[0] < self.SUCTION_CACHE_SECONDS:
+            return cached[1]
+        window = self.get_suction_pressure_window(self.SUCTION_WINDOW)
+        pressure = float(window["Pressure"]) if window["Pressure"] is not None else None
+        AEC.suction_cache[self.site_id] = (time.monotonic(), pressure)
+        return pressure
+
+    def get_holidays(self):
+        """
+        This method returns the bank holidays, reusing the cached dates while they are fresh.
+
+        Returns
+        ----------
+        Array
+            Bank holiday dates as YYYY-MM-DD strings.
+        """
+        if len(AEC.holiday_cache) and time.monotonic()-AEC.holiday_cache[0] < self.HOLIDAY_CACHE_SECONDS:
+            return AEC.holiday_cache[1]
+        holidays = self.get_bank_holidays()
+        AEC.holiday_cache[:] = [time.monotonic(), holidays]
+        return holidays
 
     def slice_historical_data(self):
-        historical = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet']))
+        historical = pd.Series(self.historical).apply(lambda x: float(x['Outlet']))
         if self.hour == 0:
             historical_sliced = historical
         elif self.hour == 8:
@@ -109,31 +208,13 @@ class AEC(AECDatabase, AECUtilities):
             t.add_row(['Cost', self.best_cost, type(self.best_cost)])
             t.add_row(['Volume (litres)', self.best_volume, type(self.best_volume)])
             t.add_row(['Volume (m³)', self.best_volume/1000, type(self.best_volume/1000)])
+            t.add_row(['Solution Cache', "%(Hits)d hits, %(DiskHits)d disk hits, %(Misses)d misses" % AEC.solution_cache.metrics(), type(AEC.solution_cache.stats)])
+            t.add_row(['Relaxed', self.relaxed, type(self.relaxed)])
+            if self.anytime is not None:
+                t.add_row(['Anytime', self.anytime, type(self.anytime)])
+            t.add_row(['Coordination', AEC.coordinator.metrics(), type(AEC.coordinator.stats)])
             print(t)
 
-    def store_data(self, tariff_cost, hours):
-        """
-        This function stores the data for all the possible combinations found for the site.
-
-        Paramaters
-        ----------
-        tariff_cost
-            Cost of the tariff.
-        hours
-            Length of tariff in hours.
-
-        Returns
-        ----------
-        Array
-            Possible cominbations for regime calculations
-        """
-        v = [] # throw away array v
-        for data in self.pump_data:
-            volume = self.tp_volume(data["Flow"], hours)
-            cost = self.electricity_cost(data["Kw"], tariff_cost, hours)
-            v.append({"speed": data[AEC.CONST_SPEED], "volume": volume, "cost": cost})
-        self.all_data.append(v) # store data in all data array
-
     def get_tariff(self, tariff):
         """
         This method returns the cost per kilowatt hours for energy usage on current time (day, peak, evening or night).
@@ -164,18 +245,14 @@ class AEC(AECDatabase, AECUtilities):
 
         Returns
         ----------
-        Integer
-            Current tariff data is returned with relevant information.
+        Float
+            Unit cost of the period from the site calendar.
         """
-        if self.weekday: 
-            tariff = int(self.time_data[iterator][AEC.CONST_WKDAY])
-        else:
-            tariff = int(self.time_data[iterator][AEC.CONST_WKEND])
-        return self.get_tariff(tariff)
+        return float(self.calendar.unit_costs(self.month, self.weekday)[iterator])
 
     def prep_level_constraints(self):
         start_period = self.get_time_period()-1
-        hours = (np.array([0]+[float(self.time_data[i][AEC.CONST_HOURS]) for i in range(start_period,len(self.time_data))]).cumsum() *60/30).astype(int)
+        hours = self.calendar.boundaries[start_period:]-self.calendar.boundaries[start_period]
         hours_diff = np.diff(hours)
         hist_df = self.slice_historical_data()
         out_flow_matrix=np.zeros((max(hours_diff),len(hours_diff)))
@@ -183,6 +260,25 @@ class AEC(AECDatabase, AECUtilities):
             out_flow_matrix[:l,i]=hist_df[hours[i]:hours[i+1]]
         return hours_diff,out_flow_matrix
 
+    def sample_hours(self):
+        """
+        This method returns the hours each half hour sample of the level model really lasts, laid out like the outflow matrix of prep_level_constraints.
+        The samples are half an hour long except on the days the clocks change, where they follow `AECCalendar.slot_hours` so the level model and the
+        volume and cost of each period (see `AECCalendar.period_hours`) use the same time.
+
+        Returns
+        ----------
+        Numpy Array
+            Hours of each sample (samples x periods), 0 past the end of a period.
+        """
+        start_period = self.get_time_period()-1
+        hours = self.calendar.boundaries[start_period:]
+        slot_hours = self.calendar.slot_hours(self.now)
+        hours_matrix = np.zeros((max(np.diff(hours)),len(hours)-1))
+        for i in range(len(hours)-1):
+            hours_matrix[:hours[i+1]-hours[i],i]=slot_hours[hours[i]:hours[i+1]]
+        return hours_matrix
+
     def get_time_period(self):
         """
         This method returns an integer based on what the current time period is. This is calculated based on current time.
@@ -192,14 +288,7 @@ class AEC(AECDatabase, AECUtilities):
         Integer
             Period based on the current time of day.
         """
-        time_now = datetime.datetime.now().replace(hour=self.hour, minute=self.minute)
-        if time_now < time_now.replace(hour=8, minute=0): return 1
-        if time_now < time_now.replace(hour=14, minute=0): return 2
-        if time_now < time_now.replace(hour=16, minute=0): return 3
-        if time_now < time_now.replace(hour=19, minute=0): return 4
-        if time_now < time_now.replace(hour=20, minute=30): return 5
-        if time_now < time_now.replace(hour=22, minute=30): return 6
-        return 7
+        return self.calendar.period(self.now)+1
 
     def period_start_time(self):
         """
@@ -210,15 +299,7 @@ class AEC(AECDatabase, AECUtilities):
         DateTime
             Start time of specific time periods.
         """
-        time_period = self.get_time_period()+1
-        time_now = datetime.datetime.now().replace(hour=self.hour, minute=self.minute)
-        if time_period == 1: return time_now.replace(hour=0, minute=0)
-        if time_period == 2: return time_now.replace(hour=8, minute=0)
-        if time_period == 3: return time_now.replace(hour=14, minute=0)
-        if time_period == 4: return time_now.replace(hour=16, minute=0)
-        if time_period == 5: return time_now.replace(hour=19, minute=0)
-        if time_period == 6: return time_now.replace(hour=20, minute=30)
-        if time_period == 7: return time_now.replace(hour=22, minute=30)
+        return self.calendar.period_start(self.now, self.get_time_period())
 
     def refine_period_time(self):
         """
@@ -227,12 +308,9 @@ class AEC(AECDatabase, AECUtilities):
         Returns
         ----------
         Float
-            Total time reamining of period in seconds.
+            Total time reamining of period in hours.
         """
-        period_start_time = self.period_start_time()
-        time_now = datetime.datetime.now().replace(hour=self.hour, minute=self.minute)
-        diff = period_start_time-time_now
-        return diff.total_seconds()/3600
+        return self.calendar.remaining_hours(self.now)
     
     def data_collection(self, period_lengths):
         """
@@ -245,24 +323,87 @@ class AEC(AECDatabase, AECUtilities):
 
         Returns
         ----------
-        List
-            List of possible combinations, length of which depends on reamining time periods of the day.
+        Dictionary
+            Cost, volume, flow and energy matrices (remaining periods x pump rows), see `AECCostEngine.matrices`.
         """
-        hours = [float(i[AEC.CONST_HOURS]) for i in self.time_data]
-        hours[self.get_time_period()-1] = float(self.refine_period_time())
-        for i in range(period_lengths,len(self.time_data)):
-            if self.weekday: 
-                tariff = int(self.time_data[i][AEC.CONST_WKDAY])
-            else:
-                tariff = int(self.time_data[i][AEC.CONST_WKEND])
-            tariff = self.tariff_to_text(tariff)
-            tariff_cost = float(self.cost_data[tariff])
-            v = [] # throw away array v
-            for data in self.pump_data:
-                volume = self.tp_volume(data["Flow"], hours[i])
-                cost = self.electricity_cost(data["Energy"], tariff_cost, hours[i])
-                v.append({"speed": data[AEC.CONST_SPEED], "volume": volume, "cost": cost, "hours": hours[i], "flow": data["Flow"]})
-            self.all_data.append(v) # store data in all data array
+        hours = self.calendar.period_hours(self.now)[period_lengths:]
+        prices = AECCostEngine.period_prices(self.slot_prices(), self.calendar.boundaries, self.calendar.slot(self.now))[period_lengths:]
+        self.matrices = self.cost_engine.matrices(hours, prices)
+        return self.matrices
+
+    def slot_prices(self):
+        """
+        This method returns the cost per kilowatt hour of each half hour slot of the day.
+
+        Returns
+        ----------
+        Numpy Array
+            Price of each slot from the site's price curve, or the unit cost of the tariff band of each slot when there is no curve for the day.
+        """
+        if self.price_curve is not None:
+            return np.asarray(self.price_curve, dtype=float)
+        return self.calendar.slot_costs(self.month, self.weekday)
+
+    def candidates(self, assignments):
+        """
+        This method returns the chosen pump row of each remaining period.
+
+        Parameters
+        ----------
+        assignments
+            Array -> index of the chosen pump row for each period
+
+        Returns
+        ----------
+        Array
+            Speed, volume, cost, hours, flow, combination, tariff and energy of each period.
+        """
+        return self.cost_engine.candidates(self.matrices, assignments)
+
+    def solution_entry(self, combo):
+        """
+        This method returns the solution cache entry for a regime, converted to plain Python values so it can be stored as JSON.
+        """
+        return json.loads(json.dumps({"combo": combo, "cost": self.best_cost, "volume": self.best_volume, "relaxed": self.relaxed}, default=float))
+
+    def current_plan(self):
+        """
+        This method returns today's saved plan in the form of `manage_response()`, used when another process has just planned the site.
+
+        Returns
+        ----------
+        Array
+            Regime of each period as last saved.
+        """
+        plan = [{"Name": row["PeriodName"], "Speed": row["Speed"], "Volume": float(row["Volume"]), "Cost": float(row["Cost"]), "Time": float(row["Time"]),
+            "Flow": row["Flow"], "Combo": float(row["Pump"]), "EstLevel": float(row["EstLevel"])} for row in self.get_regime_data()]
+        self.best_cost = sum(period["Cost"] for period in plan)
+        self.best_volume = sum(period["Volume"] for period in plan)
+        return plan
+
+    def plan_assignments(self):
+        """
+        This method returns the pump row of each remaining period in today's saved plan, the row of the same combination with the flow closest to the plan's,
+        so the plan can be held fixed in a model built from the current matrices.
+
+        Returns
+        ----------
+        Array
+            Index of the pump row for each remaining period, None when the saved plan does not cover them.
+        """
+        remaining = self.get_regime_data()[self.get_time_period()-1:]
+        if len(remaining) != len(self.matrices["hours"]):
+            return None
+        return [self.pump_row(row) for row in remaining]
+
+    def pump_row(self, period):
+        """
+        This method returns the index of the pump row a saved period ran, the row of the same combination with the flow closest to the period's.
+        """
+        flow, combo = self.cost_engine.flow, self.cost_engine.combo
+        rows = np.flatnonzero(combo == float(period["Pump"]))
+        rows = rows if len(rows) else np.arange(len(flow))
+        return int(rows[np.argmin(np.abs(flow[rows]-float(period["Flow"])))])
 
     def tariff_to_text(self, tariff):
         """
@@ -280,7 +421,7 @@ class AEC(AECDatabase, AECUtilities):
 
     def demand_adjustment(self):
         clamp = lambda n, minn, maxn: max(min(maxn, n), minn)
-        averaged_demand = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet'])*1800)
+        averaged_demand = pd.Series(self.historical).apply(lambda x: float(x['Outlet'])*1800)
         actual_demand = self.get_volume_delivered_12()["VolumeDelivered"]
         averaged_demand_total = averaged_demand[24:].sum()
         demand_factor = 0.94#actual_demand/averaged_demand_total
@@ -300,6 +441,7 @@ class AEC(AECDatabase, AECUtilities):
         Array
             Array of pumping regime Time Period 1 - 6.
         """
+        self.profile_stage("response")
         name_start = len(self.time_data)-len(combo)
         empty_response = []
         if len(combo) < len(self.time_data):
@@ -312,25 +454,44 @@ class AEC(AECDatabase, AECUtilities):
                 time = data[i]["Time"]
                 flow = data[i]["Flow"]
                 est_level = data[i]["EstLevel"]
-                empty_response.append({"Name": name, "Speed": speed, "Volume": volume, "Cost": cost, "Time": time, "Flow": flow, "EstLevel": est_level, "Combo": self.pump_combo})
+                pump_combo = self.pump_combo if self.pump_combo is not None else data[i]["Pump"]
+                empty_response.append({"Name": name, "Speed": speed, "Volume": volume, "Cost": cost, "Time": time, "Flow": flow, "EstLevel": est_level, "Combo": pump_combo})
         combo_response = []
         for i in range(len(combo)):
             name = "T%s" % (name_start+1)
             name_start += 1
-            combo_response.append({"Name": name, "Speed": combo[i]["speed"], "Volume": combo[i]["volume"], "Cost": combo[i]["cost"], "Time": combo[i]["hours"], "Flow": combo[i]["flow"], "Combo": self.pump_combo})
+            pump_combo = self.pump_combo if self.pump_combo is not None else int(float(combo[i]["combo"]))
+            combo_response.append({"Name": name, "Speed": combo[i]["speed"], "Volume": combo[i]["volume"], "Cost": combo[i]["cost"], "Time": combo[i]["hours"], "Flow": combo[i]["flow"], "Combo": pump_combo})
         combo = empty_response+combo_response
         combo = self.estimate_reservoir_levels(combo) 
 
-        #Insert on new day, otherwise update regime
-        if(len(self.get_regime_data()) == 0):
-            self.insert_regime(combo)
-        else:
-            self.update_regime(combo)
+        # Store as a new plan version, only the changed periods are written
+        self.plan_version = self.save_plan(combo)
+        self.insert_level_trajectory(self.plan_version or self.get_latest_plan_version(), self.trajectory)
         return combo
 
+    def flow_trajectory(self, combo):
+        """
+        This method expands a regime onto the half hour samples of the day.
+
+        Parameters
+        ----------
+        combo
+            Array of regimes, as returned by `manage_response()` or get_regime_data
+
+        Returns
+        ----------
+        Tuple
+            Planned inflow and historical outflow of each sample, the inflow is NaN past the end of the regime.
+        """
+        inflow = pd.Series([float(data["Flow"]) for data in combo for i in range(0, int(float(data["Time"])*2))])
+        outflow = pd.Series(self.historical).apply(lambda x: float(x['Outlet']))
+        return inflow.reindex(outflow.index).values, outflow.values
+
     def estimate_reservoir_levels(self, combo):
         """
         This method will calculate the estimated reservoir levels after our inital calculations.
+        The level, inflow and outflow of every half hour sample are kept in `self.trajectory` to be stored with the plan version.
 
         Parameters
         ----------
@@ -341,43 +502,21 @@ class AEC(AECDatabase, AECUtilities):
         ----------
         Array of levels
         """
-        levels_ = []
-        pumped_ = pd.Series([float(data["Flow"]) for data in combo for i in range(0, int(float(data["Time"])*2))])
-        out_ = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet']))
-        diff_ = pumped_-out_
-        current_sample_period = sum([int(float(data["Length"]))*2 for data in self.time_data[:self.get_time_period()-1]])
-        if(len(self.get_regime_data()) == 0):
-            start_level = self.current_level
-        else:
-            start_level = float(self.get_regime_data()[0]["EstLevel"])
-
-        FACTOR = 1/self.SURFACE_AREA
-
-        for i in range(0, 48):
-            if i == 0: 
-                levels_.append(start_level)
-            else: 
-                if i == current_sample_period:
-                    new_level = self.current_level
-                else: 
-                    new_level = start_level+diff_[i]*FACTOR
-                start_level = new_level
-                levels_.append(start_level)
-        # print(len(levels_))
-
-        period_data = [float(data["Length"]) for data in self.time_data]
-        # Accumulate period_data
-        accum_index = 0
-        index_list = []
-        for i in range(len(period_data)):
-            index_list.append(accum_index)
-            accum_index += period_data[i]*2
-
-        index_list = [int(i) for i in index_list]
-        
-        # Loop combo and add "EstLevel" based on index of levels_
+        inflow, outflow = self.flow_trajectory(combo)
+        steps = (inflow-outflow)*(1/self.SURFACE_AREA)
+        current_sample_period = int(self.calendar.boundaries[self.get_time_period()-1])
+        regime = self.get_regime_data()
+        start_level = self.current_level if len(regime) == 0 else float(regime[0]["EstLevel"])
+
+        # The level is accumulated from the start of the day and restarts from the current level at the current period
+        levels_ = np.cumsum(np.concatenate(([start_level], steps[1:48])))
+        if current_sample_period > 0:
+            levels_[current_sample_period:] = np.cumsum(np.concatenate(([self.current_level], steps[current_sample_period+1:48])))
+        self.trajectory = np.vstack([levels_, inflow[:48], outflow[:48]])
+
+        # Loop combo and add "EstLevel" at the first sample of each period
         for i in range(self.get_time_period()-1, len(combo)):
-            combo[i]["EstLevel"] = levels_[index_list[i]]
+            combo[i]["EstLevel"] = levels_[self.calendar.boundaries[i]]
 
         return combo
 
@@ -428,9 +567,498 @@ class AEC(AECDatabase, AECUtilities):
         expected_volume = sum([float(data["Volume"]) for data in self.get_regime_data()[:self.get_time_period()]])
         return (volume_used/expected_volume)*self.target
 
-    def optimiser(self, cost_, volume_,v_min,flow_,min_level,max_level,initial_level,period_lengths,out_flow_, errors) :
+    def combination_constraints(self, selection, combo_):
+        """
+        This method builds the constraints for choosing jointly between pump combinations. A switch is counted whenever the combination changes between adjacent periods,
+        which is charged at the site `SwitchCost` and limited by the site `MaxSwitches` when they are set.
+
+        Parameters
+        ----------
+        selection
+            CVXPY Variable -> boolean selection matrix (periods x candidates)
+        combo_
+            Numpy Array -> pump combination of each candidate
+
+        Returns
+        ----------
+        Tuple
+            List of constraints and the switching cost expression.
+        """
+        return self.switching_constraints(selection, combo_, **self.switching_limits())
+
+    def switching_limits(self):
+        """
+        This method returns the combination running in the period before the first remaining period (None when today's regime has not started),
+        the site's maximum switches (None when not set) and its cost per switch, as the keyword arguments of `switching_constraints`.
+        """
+        regime = self.get_regime_data()
+        running_combo = None
+        if self.get_time_period() > 1 and len(regime) >= self.get_time_period()-1:
+            running_combo = float(regime[self.get_time_period()-2]["Pump"])
+        max_switches = None if self.site_data.get("MaxSwitches") is None else int(self.site_data["MaxSwitches"])
+        return {"running_combo": running_combo, "max_switches": max_switches, "switch_cost": float(self.site_data.get("SwitchCost") or 0)}
+
+    @staticmethod
+    def switching_constraints(selection, combo_, running_combo=None, max_switches=None, switch_cost=0):
+        """
+        This method builds the switching constraints of `combination_constraints` from plain values, so sites optimised together (see `AECNetwork`) share them.
+
+        Parameters
+        ----------
+        selection
+            CVXPY Variable -> boolean selection matrix (periods x candidates)
+        combo_
+            Numpy Array -> pump combination of each candidate
+        running_combo
+            Float -> combination running before the first period, None when there is none
+        max_switches
+            Integer -> maximum switches, None for no limit
+        switch_cost
+            Float -> cost per switch
+
+        Returns
+        ----------
+        Tuple
+            List of constraints and the switching cost expression.
+        """
+        combos = np.unique(combo_)
+        if len(combos) < 2:
+            return [], 0
+        membership = (combo_[:, None] == combos[None, :]).astype(float)
+        in_combo = selection @ membership
+
+        # Anchor the first remaining period to the combination already running today
+        if running_combo is not None:
+            running = (combos == running_combo).astype(float)
+            in_combo = cp.vstack([running.reshape(1, -1), in_combo])
+        if in_combo.shape[0] < 2:
+            return [], 0
+
+        # switches >= positive part of each combination change, which is exact because in_combo is integral
+        switches = cp.Variable(shape=(in_combo.shape[0]-1, len(combos)), nonneg=True)
+        constraints = [switches >= in_combo[1:]-in_combo[:-1]]
+        total_switches = cp.sum(switches)
+        if max_switches is not None:
+            constraints.append(total_switches <= max_switches)
+        return constraints, switch_cost*total_switches
+
+    def demand_limits(self):
+        """
+        This method returns the site's maximum demand (kW), maximum demand charge (per kW) and daily energy cap (kWh), each None when it is not set,
+        with the energy used and the peak demand of the periods already run today, as the keyword arguments of `demand_constraints`.
+        The periods already run are only read when there is an energy cap or a demand charge.
+        """
+        limits = {key: None if self.site_data.get(column) is None else float(self.site_data[column]) for key, column in [("max_demand", "MaxDemand"), ("demand_charge", "DemandCharge"), ("max_energy", "MaxEnergy")]}
+        limits["energy_used"], limits["peak"] = self.demand_history() if limits["max_energy"] is not None or limits["demand_charge"] else (0.0, 0.0)
+        return limits
+
+    def demand_history(self):
+        """
+        This method returns the energy (kWh) used and the peak demand (kW) of today's periods already run, from the pump rows they ran.
+        Both are 0 when today's saved regime does not cover the periods already run.
+        """
+        regime = self.get_regime_data()
+        done = self.get_time_period()-1
+        if len(regime) < done:
+            return 0.0, 0.0
+        demand = [(float(self.cost_engine.energy[self.pump_row(period)]) if float(period["Flow"]) > 0 else 0.0, float(period["Time"])) for period in regime[:done]]
+        return sum([kw*hours for kw, hours in demand], 0.0), max([kw for kw, hours in demand]+[0.0])
+
+    @staticmethod
+    def demand_constraints(energy_, hours_, max_demand=None, demand_charge=None, max_energy=None, energy_used=0.0, peak=0.0):
+        """
+        This method builds the supply constraints of a site. The demand in each period is capped at max_demand and the energy over the day at max_energy,
+        less the energy already used today, and the demand charge is applied to the peak demand of the day, which is at least the peak already reached,
+        through a single epigraph variable so no booleans are added.
+
+        Parameters
+        ----------
+        energy_
+            CVXPY Expression -> demand (kW) for each period
+        hours_
+            Numpy Array -> length of each remaining period in hours
+        max_demand
+            Float -> maximum demand in kW
+        demand_charge
+            Float -> charge per kW of peak demand
+        max_energy
+            Float -> maximum energy in kWh for the day
+        energy_used
+            Float -> energy in kWh already used today
+        peak
+            Float -> peak demand in kW already reached today
+
+        Returns
+        ----------
+        Tuple
+            List of constraints and the demand charge expression.
+        """
+        constraints, demand_cost = [], 0
+        if max_demand is not None:
+            constraints.append(energy_ <= max_demand)
+        if max_energy is not None:
+            constraints.append(cp.sum(cp.multiply(energy_, hours_)) <= max(max_energy-energy_used, 0.0))
+        if demand_charge:
+            peak_ = cp.Variable(nonneg=True)
+            constraints += [peak_ >= energy_, peak_ >= peak]
+            demand_cost = demand_charge*peak_
+        return constraints, demand_cost
+
+    def running_constraints(self, on_, flow_, hours_, max_flow):
+        """
+        This method builds the pump start, minimum run time and ramp constraints, set by the site `MaxStarts`, `MinRunHours` and `MaxRamp` (litres/second between adjacent periods) when they are set.
+        Starts are continuous variables bounded above and below by the change in the running state, so they are exact without extra booleans,
+        and the minimum run time uses the start window form (the pump is running in a period if it started within MinRunHours of the period starting), which is the tight formulation.
+
+        Parameters
+        ----------
+        on_
+            CVXPY Expression -> 1 for each period the pump is running, 0 when stopped
+        flow_
+            CVXPY Expression -> pump flow for each period
+        hours_
+            Numpy Array -> length of each remaining period in hours
+        max_flow
+            Float -> highest flow of any candidate
+
+        Returns
+        ----------
+        List
+            Constraints, empty when none of the limits are set.
+        """
+        return self.start_constraints(on_, flow_, hours_, max_flow, **self.running_limits())
+
+    def running_limits(self):
+        """
+        This method returns the site's `MaxStarts`, `MinRunHours` and `MaxRamp` with the state of the periods already run, as the keyword arguments of `start_constraints`:
+        the flow before the first remaining period, the starts already made today and how long the pump has been running, when it is.
+        The periods already run are only read when one of the limits is set.
+        """
+        max_starts, min_run, max_ramp = [self.site_data.get(column) for column in ["MaxStarts", "MinRunHours", "MaxRamp"]]
+        limits = {"previous_flow": 0.0, "starts_made": 0, "on_hours": 0.0, "max_starts": max_starts, "min_run": min_run, "max_ramp": max_ramp}
+        if max_starts is None and not min_run and max_ramp is None:
+            return limits
+        yesterday, today = self.run_history()
+        flows = [0.0]+[flow for hours, flow in yesterday+today]
+        limits["previous_flow"] = flows[-1]
+        # A start is a period run with the pump on after one with it stopped, the first of today following yesterday's last
+        limits["starts_made"] = sum(1 for i in range(len(flows)-len(today), len(flows)) if flows[i] > 0 and flows[i-1] <= 0)
+        for hours, flow in reversed(yesterday+today):
+            if flow <= 0:
+                break
+            limits["on_hours"] += hours
+        return limits
+
+    def run_history(self):
+        """
+        This method returns the length in hours and pump flow of yesterday's periods and of today's periods already run.
+        Both are empty when today's saved regime does not cover the periods already run, as then it is not known what ran.
+        """
+        regime = self.get_regime_data()
+        done = self.get_time_period()-1
+        if done > 0 and len(regime) < done:
+            return [], []
+        yesterday = [(float(row["Time"]), float(row["Flow"])) for row in self.get_regime_yesterday()]
+        return yesterday, [(float(row["Time"]), float(row["Flow"])) for row in regime[:done]]
+
+    @staticmethod
+    def start_constraints(on_, flow_, hours_, max_flow, previous_flow=0.0, starts_made=0, on_hours=0.0, max_starts=None, min_run=None, max_ramp=None):
+        """
+        This method builds the running constraints of `running_constraints` from plain values, so sites optimised together (see `AECNetwork`) share them.
+        MaxStarts is a daily limit, less the starts already made today, and a pump already running keeps running until it has run MinRunHours.
+
+        Parameters
+        ----------
+        on_, flow_, hours_, max_flow
+            See `running_constraints`
+        previous_flow
+            Float -> pump flow in the period before the first period
+        starts_made
+            Integer -> starts already made today
+        on_hours
+            Float -> hours the pump has been running before the first period, 0 when it is stopped
+        max_starts
+            Integer -> maximum pump starts, None for no limit
+        min_run
+            Float -> minimum run time in hours, None or 0 for no limit
+        max_ramp
+            Float -> maximum flow change between adjacent periods in litres/second, None for no limit
+
+        Returns
+        ----------
+        List
+            Constraints, empty when none of the limits are set.
+        """
+        if max_starts is None and not min_run and max_ramp is None:
+            return []
+
+        previous_on = cp.hstack([np.array([float(previous_flow > 0)]), on_[:-1]])
+        previous_flows = cp.hstack([np.array([previous_flow]), flow_[:-1]])
+
+        constraints = []
+        if max_starts is not None or min_run:
+            starts = cp.Variable(len(hours_), nonneg=True)
+            constraints += [starts >= on_-previous_on, starts <= on_, starts <= 1-previous_on]
+            if max_starts is not None:
+                constraints.append(cp.sum(starts) <= max(int(max_starts)-starts_made, 0))
+            if min_run:
+                begins = np.concatenate([[0.0], np.cumsum(hours_)[:-1]])
+                if previous_flow > 0:
+                    # The run already under way counts towards the minimum
+                    constraints += [on_[t] >= 1 for t in range(len(hours_)) if begins[t] < float(min_run)-on_hours]
+                for t in range(1, len(hours_)):
+                    window = [s for s in range(t) if begins[t]-begins[s] < float(min_run)]
+                    if len(window):
+                        constraints.append(on_[t] >= cp.sum(starts[window]))
+        if max_ramp is not None:
+            # A start or stop may move the flow from or to zero
+            constraints += [flow_-previous_flows <= float(max_ramp)+max_flow*(1-previous_on), previous_flows-flow_ <= float(max_ramp)+max_flow*(1-on_)]
+        return constraints
+
+    @staticmethod
+    def level_model(input_flow_, initial_level, period_lengths, out_flow_, surface_area, sample_hours=None):
+        """
+        This method expands the per period pump flow onto the half hour samples and builds the reservoir level trajectory.
+        The net volume of a sample is its flow over the hours it lasts, half an hour unless `sample_hours` says otherwise.
+
+        Parameters
+        ----------
+        input_flow_
+            CVXPY Expression -> pump flow for each period
+        initial_level
+            Float -> initial level
+        period_lengths
+            Numpy Array -> number of half hour samples in each period
+        out_flow_
+            Numpy Array
+        surface_area
+            Float -> reservoir surface area
+        sample_hours
+            Numpy Array -> hours of each sample from `sample_hours`, None for half an hour each
+
+        Returns
+        ----------
+        Tuple
+            Input flow for each sample and the reservoir level after each sample.
+        """
+        FACTOR = 1/surface_area
+        input_flow_matrix=np.zeros((max(period_lengths),len(period_lengths)))
+        for i,l in enumerate(period_lengths):
+            input_flow_matrix[:l,i]=1
+        input_flow_vector=cp.vec(cp.multiply(input_flow_matrix,np.ones((max(period_lengths), 1)) @ cp.reshape(input_flow_,(1,len(period_lengths)))))
+
+        res_flow= (input_flow_vector-cp.vec(out_flow_))
+        net_volume = res_flow * 1.8 if sample_hours is None else cp.multiply(res_flow, np.asarray(sample_hours, dtype=float).flatten(order="F")*3.6)
+        res_level=cp.cumsum(net_volume) * FACTOR + initial_level
+        return input_flow_vector, res_level
+
+    @staticmethod
+    def level_trajectory(flows, initial_level, period_lengths, out_flow_, surface_area, sample_hours=None):
+        """
+        This method is the NumPy counterpart of `level_model`, giving the reservoir level of many regimes at once.
+
+        Parameters
+        ----------
+        flows
+            Numpy Array -> pump flow for each period, one row per regime
+        initial_level
+            Float -> initial level
+        period_lengths
+            Numpy Array -> number of half hour samples in each period
+        out_flow_
+            Numpy Array -> outflow matrix from prep_level_constraints
+        surface_area
+            Float -> reservoir surface area
+        sample_hours
+            Numpy Array -> hours of each sample, as in `level_model`
+
+        Returns
+        ----------
+        Numpy Array
+            Level after each sample (regimes x samples), in the sample order of `level_model`.
+        """
+        flows = np.atleast_2d(np.asarray(flows, dtype=float))
+        mask = np.arange(max(period_lengths))[None, :] < np.asarray(period_lengths)[:, None]
+        input_flow = (flows[:, :, None]*mask[None, :, :]).reshape(len(flows), -1)
+        factor = 1.8 if sample_hours is None else np.asarray(sample_hours, dtype=float).T.reshape(1, -1)*3.6
+        return np.cumsum((input_flow-np.asarray(out_flow_, dtype=float).T.reshape(1, -1))*factor, axis=1)/surface_area+initial_level
+
+    def level_volume_constraints(self, res_level, volume_, v_min, min_level, max_level, elastic=False):
+        """
+        This method builds the level band and target constraints. The elastic form lets the level leave the band and the volume fall short of the target,
+        each by a slack that is penalised in the objective (see LEVEL_SLACK_PENALTY and VOLUME_SLACK_PENALTY), so it always has a solution while the pump limits can be met
+        and that solution is the regime that violates them least. The slacks are kept in `self.slacks` for `relaxation`.
+
+        Parameters
+        ----------
+        res_level
+            CVXPY Expression -> reservoir level after each half hour sample
+        volume_
+            CVXPY Expression -> total volume pumped
+        v_min
+            Float -> minimum volume
+        min_level
+            Float -> minimum level
+        max_level
+            Float -> maximum level
+        elastic
+            Boolean -> True to add the slacks
+
+        Returns
+        ----------
+        Tuple
+            List of constraints and the penalty expression, 0 when not elastic.
+        """
+        constraints, penalty, self.slacks = self.band_constraints(res_level, volume_, v_min, min_level, max_level, elastic)
+        return constraints, penalty
+
+    @classmethod
+    def band_constraints(cls, res_level, volume_, v_min, min_level, max_level, elastic=False):
+        """
+        This method builds the constraints of `level_volume_constraints` without keeping the slacks, so sites optimised together (see `AECNetwork`) share them.
+
+        Returns
+        ----------
+        Tuple
+            List of constraints, the penalty expression (0 when not elastic) and the slack variables (None when not elastic).
+        """
+        if not elastic:
+            return [res_level <= max_level, res_level >= min_level, volume_ >= v_min], 0, None
+        slacks = {"MinLevel": cp.Variable(res_level.shape, nonneg=True), "MaxLevel": cp.Variable(res_level.shape, nonneg=True), "Volume": cp.Variable(nonneg=True)}
+        constraints = [res_level <= max_level+slacks["MaxLevel"], res_level >= min_level-slacks["MinLevel"], volume_ >= v_min-slacks["Volume"]]
+        penalty = cls.LEVEL_SLACK_PENALTY*(cp.sum(slacks["MinLevel"])+cp.sum(slacks["MaxLevel"]))+cls.VOLUME_SLACK_PENALTY*slacks["Volume"]
+        return constraints, penalty, slacks
+
+    def profile_solve(self, problem):
+        """
+        This method records how long CVXPY spent compiling a solved problem and how long the solver took, when the run is profiled.
+        """
+        if self.profiler is not None:
+            self.profiler.note("Solves", {"Status": problem.status, "CompilationSeconds": problem.compilation_time, "SolverSeconds": problem.solver_stats.solve_time})
+
+    def relaxation(self):
+        """
+        This method returns how far the solved elastic problem relaxed each constraint.
+
+        Returns
+        ----------
+        Dictionary
+            Largest drop below MinLevel and rise above MaxLevel (metres) and the shortfall on the target (litres), only for the constraints that were relaxed.
+        """
+        return self.slack_relaxation(self.slacks)
+
+    @staticmethod
+    def slack_relaxation(slacks):
+        """
+        This method returns how far solved slacks from `band_constraints` relaxed each constraint, see `relaxation`.
+        """
+        if slacks is None or slacks["Volume"].value is None:
+            return {}
+        relaxed = {key: float(np.max(slack.value)) for key, slack in slacks.items()}
+        return {key: value for key, value in relaxed.items() if value > 1e-6}
+
+    def report_relaxation(self, relaxed):
+        """
+        This method records a relaxed regime in diagnostics with the error of the constraint relaxed, LevelTooLowError before LevelTooHighError before MaxVolumeExceededError.
+
+        Parameters
+        ----------
+        relaxed
+            Dictionary -> output of relaxation
+
+        Returns
+        ----------
+        Exception
+            Error class of the constraint relaxed, None when nothing was relaxed.
+        """
+        if len(relaxed) == 0:
+            return None
+        error = LevelTooLowError if "MinLevel" in relaxed else LevelTooHighError if "MaxLevel" in relaxed else MaxVolumeExceededError
+        self.insert_diagnostics(json.dumps({"Error": error.__name__, "Relaxed": relaxed, "Target": float(self.target), "MinLevel": float(self.min_level), "MaxLevel": float(self.max_level)}))
+        return error
+
+    def continuous_optimiser(self, hours_, tariff_, v_min, min_level, max_level, initial_level, period_lengths, out_flow_, elastic=False):
+        """
+        This method optimises the regime with continuous pump speeds. Each pump combination is modelled by its `AECPumpCurve`, so only one boolean per period and combination
+        (running or stopped) is needed while the flow can take any value between the slowest and fastest running speed.
+
+        Parameters
+        ----------
+        hours_
+            Numpy Array -> length of each remaining period in hours
+        tariff_
+            Numpy Array -> unit cost of each remaining period
+        v_min
+            Float -> minimum volume
+        min_level
+            Float -> minimum level
+        max_level
+            Float -> maximum level
+        initial_level
+            Float -> initial level
+        period_lengths
+            Numpy Array -> number of half hour samples in each period
+        out_flow_
+            Numpy Array
+        elastic
+            Boolean -> True to relax the level band and target, which is done when they cannot be met
+
+        Returns
+        ----------
+        Array
+            Pumping regime in the same format as `candidates`.
+        """
+        curves = AECPumpCurve.from_pump_data(self.pump_data)
+        periods = len(hours_)
+        running = cp.Variable(shape=(periods, len(curves)), boolean=True)
+        flow = cp.Variable(shape=(periods, len(curves)), nonneg=True)
+        energy = cp.Variable(shape=(periods, len(curves)), nonneg=True)
+        constraints = [cp.sum(running, axis=1) <= 1]
+        for c, curve in enumerate(curves.values()):
+            constraints += [flow[:, c] >= curve.min_flow*running[:, c], flow[:, c] <= curve.max_flow*running[:, c]]
+            # Epigraph of the convex hull, each line is switched off with the pump so a stopped pump costs nothing
+            for slope, intercept in zip(curve.slopes, curve.intercepts):
+                constraints.append(energy[:, c] >= slope*flow[:, c]+intercept*running[:, c])
+
+        input_flow_ = cp.sum(flow, axis=1)
+        input_flow_vector, res_level = self.level_model(input_flow_, initial_level, period_lengths, out_flow_, self.SURFACE_AREA, self.sample_hours())
+        volume_ = cp.sum(cp.multiply(input_flow_, hours_*3600))
+        level_constraints, penalty = self.level_volume_constraints(res_level, volume_, v_min, min_level, max_level, elastic)
+        constraints += level_constraints
+        cost_ = cp.sum(cp.multiply(cp.sum(energy, axis=1), tariff_*hours_))+penalty
+        switch_constraints, switch_cost = self.combination_constraints(running, np.array(list(curves)))
+        constraints += switch_constraints
+        cost_ = cost_ + switch_cost
+        demand_constraints, demand_cost = self.demand_constraints(cp.sum(energy, axis=1), hours_, **self.demand_limits())
+        constraints += demand_constraints
+        cost_ = cost_ + demand_cost
+        constraints += self.running_constraints(cp.sum(running, axis=1), input_flow_, hours_, max(curve.max_flow for curve in curves.values()))
+        weights = self.objective_weights()
+        if weights["level"] > 0:
+            cost_ = cost_ + weights["level"]*cp.abs(res_level[-1]-float(self.site_data["Setpoint"]))
+        if weights["energy"] > 0:
+            cost_ = cost_ + weights["energy"]*cp.sum(cp.multiply(cp.sum(energy, axis=1), hours_))
+        assign_prob = cp.Problem(cp.Minimize(cost_), constraints)
+        assign_prob.solve(solver=cp.CPLEX, verbose=False)
+        self.profile_solve(assign_prob)
+        if running.value is None:
+            if elastic:
+                raise RegimeInfeasibleError(assign_prob.status)
+            return self.continuous_optimiser(hours_, tariff_, v_min, min_level, max_level, initial_level, period_lengths, out_flow_, True)
+
+        combo = []
+        for i in range(periods):
+            c = int(np.argmax(running.value[i])) if running.value[i].max() >= 0.99 else 0
+            combo_id, curve = list(curves.items())[c]
+            pumped = float(flow.value[i, c]) if running.value[i, c] >= 0.99 else 0.0
+            combo.append({"speed": float(curve.speed_at(pumped)), "volume": self.tp_volume(pumped, hours_[i]), "cost": self.electricity_cost(curve.energy_at(pumped), tariff_[i], hours_[i]),
+                "hours": hours_[i], "flow": pumped, "combo": combo_id, "tariff": tariff_[i]})
+        return combo
+
+    def optimiser(self, cost_, volume_,v_min,flow_,min_level,max_level,initial_level,period_lengths,out_flow_, errors, combo_=None, energy_=None, hours_=None) :
         """
         This function optimises the regime possible combinations using convex optimisation. We assign and define the problem and uses `GLPK_MI` to solve our problem.
+        When the level band or target cannot be met the elastic problem is solved once instead, see `level_volume_constraints`.
 
         Parameters
         ----------
@@ -454,86 +1082,236 @@ class AEC(AECDatabase, AECUtilities):
             Numpy Array
         errors
             Exceptions -> error handling
+        combo_
+            Numpy Array -> pump combination of each candidate, only given when optimising across all combinations
+        energy_
+            Numpy Array -> demand (kW) of each candidate, only needed for the site supply limits
+        hours_
+            Numpy Array -> length of each remaining period in hours, only needed for the site supply and running limits
 
         Returns
         ----------
         selection
             Solved problem with the best possible combination for pumping regime.
         """
-        FACTOR = 1/self.SURFACE_AREA
-        input_flow_matrix=np.zeros((max(period_lengths),len(period_lengths)))
-        for i,l in enumerate(period_lengths):
-            input_flow_matrix[:l,i]=1
+        return self.solve_regime(self.regime_problems(cost_, volume_, v_min, flow_, min_level, max_level, initial_level, period_lengths, out_flow_, combo_, energy_, hours_))
+
+    def regime_problems(self, cost_, volume_, v_min, flow_, min_level, max_level, initial_level, period_lengths, out_flow_, combo_=None, energy_=None, hours_=None):
+        """
+        This method yields the strict and then the elastic regime problem, each with the site's objective weights set. The elastic problem is only built when it is asked for.
+
+        Parameters
+        ----------
+        See `optimiser`
+
+        Returns
+        ----------
+        Generator
+            Problem and selection variable.
+        """
+        weights = self.objective_weights()
+        weighted = weights["level"] > 0 or weights["energy"] > 0
+        for elastic in [False, True]:
+            assign_prob, selection, terms, parameters = self.regime_problem(cost_, volume_, v_min, flow_, min_level, max_level, initial_level, period_lengths, out_flow_, combo_, energy_, hours_, weighted, elastic)
+            for key, parameter in parameters.items():
+                parameter.value = weights[key]
+            yield assign_prob, selection
+
+    def solve_regime(self, problems, time_limit=None):
+        """
+        This method solves the problems from regime_problems in turn until one has a solution.
+
+        Parameters
+        ----------
+        problems
+            Iterable -> problems and selection variables from regime_problems
+        time_limit
+            Float -> seconds the solves may take between them, None for no limit. The solver is given what is left as its own time limit,
+            so it stops there and its best regime so far is used.
+
+        Returns
+        ----------
+        selection
+            Solved selection variable, None when the time limit was reached before a regime was found.
+        """
+        deadline = None if time_limit is None else time.perf_counter()+time_limit
+        for assign_prob, selection in problems:
+            options = {}
+            if deadline is not None:
+                remaining = deadline-time.perf_counter()
+                if remaining <= 0:
+                    return None
+                options["cplex_params"] = {"timelimit": remaining}
+            try:
+                assign_prob.solve(solver=cp.CPLEX, verbose=False, **options)
+            except cp.SolverError:
+                # Stopping at the time limit without a regime is reported as a solver error
+                if deadline is None or time.perf_counter() < deadline:
+                    raise
+                return None
+            self.profile_solve(assign_prob)
+            if selection.value is not None:
+                return selection
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+        # Even the elastic problem has no solution, so the pump running or supply limits cannot be met
+        raise RegimeInfeasibleError(assign_prob.status)
+
+    def objective_weights(self):
+        """
+        This method returns the objective weights of the site. Cost always has a weight of 1, the site `LevelWeight` (per metre the end of day level misses `Setpoint`)
+        and `EnergyWeight` (per kWh) add the other terms when they are set.
+        """
+        return {"cost": 1.0, "level": float(self.site_data.get("LevelWeight") or 0), "energy": float(self.site_data.get("EnergyWeight") or 0)}
+
+    def regime_problem(self, cost_, volume_, v_min, flow_, min_level, max_level, initial_level, period_lengths, out_flow_, combo_=None, energy_=None, hours_=None, weighted=False, elastic=False):
+        """
+        This method builds the regime optimisation problem. A weighted problem minimises cost, end of day deviation from `Setpoint` and energy,
+        each multiplied by a CVXPY Parameter, so the same problem is compiled once and solved again for other weights by changing the parameter values.
+
+        Parameters
+        ----------
+        See `optimiser`
+        weighted
+            Boolean -> False to minimise cost alone
+        elastic
+            Boolean -> True to relax the level band and target, see `level_volume_constraints`
+
+        Returns
+        ----------
+        Tuple
+            Problem, selection variable, the cost, deviation and energy expressions and the weight parameters by term (empty when not weighted).
+        """
         selection = cp.Variable(shape=cost_.shape,boolean=True)
         assignment_constraint = cp.sum(selection,axis=1) == 1
         input_flow_= cp.sum(cp.multiply(flow_,selection),axis=1)
-        input_flow_vector=cp.vec(cp.multiply(input_flow_matrix,np.ones((max(period_lengths), 1)) @ cp.reshape(input_flow_,(1,len(period_lengths)))))
-
-        res_flow= (input_flow_vector-cp.vec(out_flow_))
-        net_volume = res_flow * 1.8
-        res_level=cp.cumsum(net_volume) * FACTOR + initial_level
+        input_flow_vector, res_level = self.level_model(input_flow_, initial_level, period_lengths, out_flow_, self.SURFACE_AREA, self.sample_hours())
         volume_= cp.sum(cp.multiply(volume_,selection))
-        volume_constraint = volume_ >= v_min
-        min_level_constraint = res_level >= min_level
-        max_level_constraint = res_level <= max_level
+        level_constraints, penalty = self.level_volume_constraints(res_level, volume_, v_min, min_level, max_level, elastic)
 
-        constraints = [assignment_constraint, max_level_constraint, min_level_constraint, volume_constraint]
+        constraints = [assignment_constraint]+level_constraints
 
         cost_ = cp.sum(cp.multiply(cost_,selection))
-        assign_prob = cp.Problem(cp.Minimize(cost_),constraints)
-        assign_prob.solve(solver=cp.CPLEX, verbose=False)
+        if combo_ is not None:
+            switch_constraints, switch_cost = self.combination_constraints(selection, combo_)
+            constraints += switch_constraints
+            cost_ = cost_ + switch_cost
+        if energy_ is not None:
+            demand_constraints, demand_cost = self.demand_constraints(cp.sum(cp.multiply(energy_,selection),axis=1), hours_, **self.demand_limits())
+            constraints += demand_constraints
+            cost_ = cost_ + demand_cost
+        if hours_ is not None:
+            constraints += self.running_constraints(selection @ (flow_[0] > 0).astype(float), input_flow_, hours_, float(np.max(flow_)))
 
-        # Display res_levels as a plot
-        df = pd.DataFrame({
-            "Input Flow": input_flow_vector.value,
-            "Out Flow": cp.vec(out_flow_).value,
-            "Res Level": res_level.value,
-        })
-        df = df[df["Out Flow"] != 0]
+        terms = {
+            "cost": cost_,
+            "deviation": cp.abs(res_level[-1]-float(self.site_data["Setpoint"])),
+            "energy": cp.sum(cp.multiply(cp.sum(cp.multiply(energy_,selection),axis=1), hours_)) if energy_ is not None else cp.Constant(0),
+        }
+        if not weighted:
+            return cp.Problem(cp.Minimize(cost_+penalty),constraints), selection, terms, {}
+        parameters = {key: cp.Parameter(nonneg=True, value=1.0 if key == "cost" else 0.0) for key in ["cost", "level", "energy"]}
+        objective = parameters["cost"]*terms["cost"]+parameters["level"]*terms["deviation"]+parameters["energy"]*terms["energy"]+penalty
+        return cp.Problem(cp.Minimize(objective),constraints), selection, terms, parameters
 
-        return selection
+    def pareto_sweep(self, weights):
+        """
+        This method solves the regime for many objective weights in one call. The problem is built and compiled once, only the weight parameters change between solves.
+        The target is set once first, as it is for `get_regime`, and nothing is written: the target is not recorded, the regimes are not saved,
+        and the sweep runs even when no recalculation is required.
 
-    def recalulcation_required(self):
+        Parameters
+        ----------
+        weights
+            Array of Dictionaries -> cost, level and energy weights, missing weights take the site's values
+
+        Returns
+        ----------
+        Array
+            For each weighting, the solver status, cost, end of day deviation from `Setpoint`, energy (kWh), speed of each period
+            and whether another weighting found a plan at least as good on every term.
+        """
+        inputs = self.plan_inputs()
+        combo_ = inputs["combo"] if self.pump_combo is None else None
+        problem, selection, terms, parameters = self.regime_problem(inputs["cost"], inputs["volume"], self.target, inputs["flow"], self.min_level, self.max_level, self.current_level, inputs["period_lengths"], inputs["out_flow"], combo_, inputs["energy"], inputs["hours"], True)
+        defaults = self.objective_weights()
+        results = []
+        for weight in weights:
+            for key, parameter in parameters.items():
+                parameter.value = float(weight.get(key, defaults[key]))
+            problem.solve(solver=cp.CPLEX, verbose=False)
+            if selection.value is None:
+                results.append({"Weights": weight, "Status": problem.status})
+                continue
+            assignments = [int(np.argmax(r)) for r in selection.value]
+            results.append({
+                "Weights": weight,
+                "Status": problem.status,
+                "Cost": float(terms["cost"].value),
+                "LevelDeviation": float(terms["deviation"].value),
+                "Energy": float(terms["energy"].value),
+                "Speeds": [data["speed"] for data in self.candidates(assignments)],
+            })
+        solved = [result for result in results if "Cost" in result]
+        points = np.array([[result["Cost"], result["LevelDeviation"], result["Energy"]] for result in solved]).reshape(-1, 3)
+        # Plans within solver tolerance of each other on a term count as equal on it
+        for i, result in enumerate(solved):
+            result["Dominated"] = bool(np.any(np.all(points <= points[i]+1e-6, axis=1) & np.any(points < points[i]-1e-6, axis=1)))
+        return results
+
+    def recalculation_needed(self):
         """
         This method will termine if a recalculation is required at any point when triggered.
+        The level is projected from the current level over the rest of the day with the inflow and outflow stored with the plan (see `estimate_reservoir_levels`),
+        and no recalculation is needed when it stays within the level band.
+
+        Returns
+        ----------
+        Boolean
         """
-        regime = self.get_regime_data()
-        levels_ = []
-        pumped_ = pd.Series([float(data["Flow"]) for data in regime for i in range(0, int(float(data["Time"])*2))])
-        out_ = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet']))
-        diff_ = pumped_-out_
-        current_sample_period = sum([int(float(data["Length"]))*2 for data in self.time_data[:self.get_time_period()-1]])
-        FACTOR = 1/self.SURFACE_AREA
-
-        if(len(self.get_regime_data()) == 0):
-            start_level = self.current_level
+        trajectory = self.get_level_trajectory()
+        if trajectory is None:
+            # Plans saved before trajectories were stored are expanded from their periods
+            regime = self.get_regime_data()
+            inflow, outflow = self.flow_trajectory(regime)
+            start_level = self.current_level if len(regime) == 0 else float(regime[0]["EstLevel"])
         else:
-            start_level = float(self.get_regime_data()[0]["EstLevel"])
-
-        for i in range(current_sample_period, 48):
-            if i == 0: 
-                levels_.append(start_level)
-            else: 
-                if i == current_sample_period:
-                    new_level = self.current_level+diff_[i]*FACTOR
-                else: 
-                    new_level = start_level+diff_[i]*FACTOR
-                start_level = new_level
-                levels_.append(start_level)
-
-        levels_ = pd.Series(levels_)
-                
-        levels_ = pd.Series(levels_).apply(lambda row: row < self.max_level and row > self.min_level)
+            start_level, inflow, outflow = trajectory[0][0], trajectory[1], trajectory[2]
+        steps = (inflow-outflow)*(1/self.SURFACE_AREA)
+        current_sample_period = int(self.calendar.boundaries[self.get_time_period()-1])
+
+        if current_sample_period == 0:
+            levels_ = np.cumsum(np.concatenate(([start_level], steps[1:48])))
+        else:
+            levels_ = self.current_level+np.cumsum(steps[current_sample_period:48])
 
         # If all returns True then calulcation not needed
-        if levels_.all(): 
-            exit()
+        return not np.all((levels_ < self.max_level) & (levels_ > self.min_level))
+
+    def recalulcation_required(self):
+        """
+        This method exits the run with RecalculationNotRequired when no recalculation is required (see `recalculation_needed`).
+        """
+        if not self.recalculation_needed(): 
+            raise RecalculationNotRequired()
         else: 
             return True
 
     def regime_management(self):
         """
         This method manages the regime. It adjusts based on errors thrown and allows for setting and editing the target as required in order to be adaptive to the current demands as per reservoirs.
+        After midnight the run exits when no recalculation is required, and the target is recorded.
+        """
+        if not (self.hour == 0 and self.minute == 0):
+            self.recalulcation_required()
+        error = self.target_management()
+        self.record_target()
+        return error
+
+    def target_management(self):
+        """
+        This method sets the target for the rest of the day, compensated for the level, and returns the regime management error.
+        Nothing is written, the target and its compensation are kept in `target_row` for `record_target`.
         """
         error = None
         try:
@@ -543,7 +1321,7 @@ class AEC(AECDatabase, AECUtilities):
             # If target is 0 then it is a new day
             if len(self.get_target()) == 0:
                 # Want to calculate target from historical average for past 4 weeks.
-                self.target = pd.Series(self.get_historical()).apply(lambda x: float(x['Outlet'])).sum()*1800
+                self.target = pd.Series(self.historical).apply(lambda x: float(x['Outlet'])).sum()*1800
                 self.initial_target = self.target
             else:
                 # Get last target from the database to use
@@ -562,7 +1340,6 @@ class AEC(AECDatabase, AECUtilities):
                 self.target = self.target * demand_compensation
                 
             else:
-                self.recalulcation_required()
                 est_total = sum([float(data["Volume"]) for data in self.get_regime_data()[:self.get_time_period()-1]])
                 level_compensation = self.level_compensation()
                 demand_compensation = 1.0
@@ -581,10 +1358,74 @@ class AEC(AECDatabase, AECUtilities):
             error = MaxVolumeExceededError
             self.target = self.max_volume()
             
-        # AEC Target Management
-        self.insert_target(self.initial_target, demand_compensation, level_compensation, est_total, self.target+est_total)
+        self.target_row = (self.initial_target, demand_compensation, level_compensation, est_total, self.target+est_total)
         return error
 
+    def record_target(self):
+        """
+        This method records the target set by `target_management`.
+        """
+        # AEC Target Management
+        self.insert_target(*self.target_row)
+
+    def model_inputs(self):
+        """
+        This method runs the regime management and collects the optimiser inputs for the remaining periods of the day.
+
+        Returns
+        ----------
+        Dictionary
+            Errors from regime management, half hour samples, their outflow and hours in each period, and the candidate matrices (periods x candidates) for cost, volume, flow and energy.
+        """
+        return self.collect_inputs(self.regime_management())
+
+    def plan_inputs(self):
+        """
+        This method collects the optimiser inputs as `model_inputs` does, without writing the target or exiting when no recalculation is required.
+        It is used to explore or coordinate plans: the caller records the target with `record_target` if it saves the plan.
+
+        Returns
+        ----------
+        Dictionary
+            As `model_inputs`.
+        """
+        return self.collect_inputs(self.target_management())
+
+    def collect_inputs(self, errors):
+        """
+        This method collects the optimiser inputs for the remaining periods of the day, once the target is set.
+        """
+        matrices = self.data_collection(self.get_time_period()-1)
+        period_lengths, out_flow = self.prep_level_constraints()
+        return dict(matrices, errors=errors, period_lengths=period_lengths, out_flow=out_flow, sample_hours=self.sample_hours())
+
+    def solution_key(self, inputs):
+        """
+        This method returns the solution cache key of the regime problem. The level and target are rounded (see `AECSolutionCache`),
+        every other input of the problem is taken as it is: the site, pumps, tariff and prices, the period and day, the demand profile and the regime already run today.
+
+        Parameters
+        ----------
+        inputs
+            Dictionary -> output of model_inputs
+
+        Returns
+        ----------
+        String
+        """
+        site = {key: value for key, value in self.site_data.items() if key not in ("Created", "Updated")}
+        running = [self.site_data.get(column) for column in ["MaxStarts", "MinRunHours", "MaxRamp"]]
+        parts = {
+            "site": site, "combo": self.pump_combo, "pumps": self.pump_data, "tariff": self.time_data, "costs": self.cost_data,
+            "prices": None if self.price_curve is None else np.asarray(self.price_curve, dtype=float).tolist(),
+            "period": self.get_time_period(), "month": self.month, "weekday": self.weekday, "min_level": self.min_level,
+            "errors": None if inputs["errors"] is None else inputs["errors"].__name__,
+            "demand": hashlib.sha256(np.ascontiguousarray(inputs["out_flow"], dtype=float).tobytes()+np.ascontiguousarray(inputs["period_lengths"], dtype=float).tobytes()).hexdigest(),
+            "regime": [[data["Pump"], data["Flow"]] for data in self.get_regime_data()[:self.get_time_period()-1]],
+            "running": self.running_limits() if running[0] is not None or running[1] or running[2] is not None else None,
+        }
+        return AEC.solution_cache.fingerprint(self.current_level, self.target, parts)
+
     def get_regime(self):
         """
         This method returns the pumping regime. It calls upon regime_management and data_collection for processing possible regimes. 
@@ -594,25 +1435,146 @@ class AEC(AECDatabase, AECUtilities):
         ----------
         `manage_response()`
         """
-        regime_management = self.regime_management()
-        self.data_collection(self.get_time_period()-1)
-        hours,hist_df=self.prep_level_constraints()
-        flow_list=[ [ candidate["flow"] for candidate in slot   ]    for slot in  self.all_data ]
-        volume_list=[ [ candidate["volume"] for candidate in slot   ]    for slot in  self.all_data ]
-        cost_list=[ [ candidate["cost"] for candidate in slot   ]    for slot in  self.all_data ]
-        volume_=np.array(volume_list)
-        cost_=np.array(cost_list)
-        flow_=np.array(flow_list)
-        sol=self.optimiser(cost_,volume_, self.target,flow_,self.min_level,self.max_level,self.current_level,hours,hist_df,regime_management)
-        # sampler = 0.99
-        # while sol.value is None:
-        #     sol=self.optimiser(cost_,volume_, self.target*sampler,flow_,self.min_level,self.max_level,self.current_level,hours,hist_df,regime_management)
-        #     sampler = sampler - 0.01
-        #     if sampler <= 0.85:
-        #         break
-
-        assignments = [np.where(r>=0.99)[0][0] for r in sol.value]
-        combo=[ self.all_data[i][assignments[i]] for i in range(len(assignments)) ]
+        self.profile_stage("regime management")
+        inputs = self.model_inputs()
+        regime_management = inputs["errors"]
+        hours,hist_df = inputs["period_lengths"],inputs["out_flow"]
+        # A problem solved before with the same inputs, to within the rounding of the level and target, reuses its regime
+        key = self.solution_key(inputs)
+        cached = AEC.solution_cache.get(key)
+        if cached is not None:
+            self.best_cost, self.best_volume, self.relaxed = cached["cost"], cached["volume"], cached.get("relaxed", {})
+            self.report_relaxation(self.relaxed)
+            return self.manage_response(cached["combo"])
+        self.profile_stage("optimiser")
+        if self.continuousSpeed:
+            combo=self.continuous_optimiser(inputs["hours"],inputs["tariff"],self.target,self.min_level,self.max_level,self.current_level,hours,hist_df)
+            self.best_cost = self.get_cost(combo)
+            self.best_volume = self.get_volume(combo)
+            self.relaxed = self.relaxation()
+            self.report_relaxation(self.relaxed)
+            AEC.solution_cache.put(key, self.solution_entry(combo))
+            return self.manage_response(combo)
+        if self.ANYTIME_BUDGET > 0:
+            return self.anytime_regime(inputs, key)
+        volume_=inputs["volume"]
+        cost_=inputs["cost"]
+        flow_=inputs["flow"]
+        combo_=inputs["combo"] if self.pump_combo is None else None
+        sol=self.optimiser(cost_,volume_, self.target,flow_,self.min_level,self.max_level,self.current_level,hours,hist_df,regime_management,combo_,inputs["energy"],inputs["hours"])
+        # A regime that only meets the level band or target with slack is still run, and reported
+        self.relaxed = self.relaxation()
+        self.report_relaxation(self.relaxed)
+
+        assignments = [int(np.argmax(r)) for r in sol.value]
+        combo=self.candidates(assignments)
         self.best_cost = np.sum(np.multiply(cost_,sol.value))
         self.best_volume = np.sum(np.multiply(volume_,sol.value)) 
-        return self.manage_response(combo)
\ No newline at end of file
+        AEC.solution_cache.put(key, self.solution_entry(combo))
+        return self.manage_response(combo)
+
+    def greedy_assignments(self, inputs):
+        """
+        This method builds a regime in milliseconds without the solver. Every period starts on its cheapest candidate, then the periods are filled in order of unit cost,
+        cheapest first, each with the cheapest candidate that meets the target or else the largest, as long as the level stays below MaxLevel (or its peak, when it already starts above it).
+        Periods are then raised, cheapest first, wherever the level would fall below MinLevel. The site switching, running and supply limits are not checked.
+
+        Parameters
+        ----------
+        inputs
+            Dictionary -> output of model_inputs
+
+        Returns
+        ----------
+        Numpy Array
+            Index of the chosen pump row for each period.
+        """
+        cost_, volume_, flow_ = inputs["cost"], inputs["volume"], inputs["flow"]
+        periods, candidates = cost_.shape
+        rows = np.arange(periods)
+        assignments = np.argmin(cost_, axis=1)
+        trajectory = lambda options: self.level_trajectory(options, self.current_level, inputs["period_lengths"], inputs["out_flow"], self.SURFACE_AREA, inputs["sample_hours"])
+        order = np.argsort(inputs["tariff"], kind="stable")
+        ceiling = max(self.max_level, trajectory(flow_[rows, assignments]).max())
+
+        for p in order:
+            volume = volume_[rows, assignments].sum()
+            if volume >= self.target:
+                break
+            # Level of the regime with each candidate in this period and the others unchanged
+            options = np.tile(flow_[rows, assignments], (candidates, 1))
+            options[:, p] = flow_[p]
+            allowed = trajectory(options).max(axis=1) <= ceiling
+            totals = volume-volume_[p, assignments[p]]+volume_[p]
+            if np.any(allowed & (totals >= self.target)):
+                assignments[p] = np.argmin(np.where(allowed & (totals >= self.target), cost_[p], np.inf))
+            elif np.any(allowed):
+                assignments[p] = np.argmax(np.where(allowed, volume_[p], -np.inf))
+
+        samples = max(inputs["period_lengths"])
+        for _ in range(periods):
+            below = np.nonzero(trajectory(flow_[rows, assignments])[0] < self.min_level)[0]
+            if len(below) == 0:
+                break
+            raised = False
+            for p in order[order <= below[0]//samples]:
+                options = np.tile(flow_[rows, assignments], (candidates, 1))
+                options[:, p] = flow_[p]
+                allowed = (trajectory(options).max(axis=1) <= ceiling) & (volume_[p] > volume_[p, assignments[p]])
+                if np.any(allowed):
+                    assignments[p] = np.argmax(np.where(allowed, volume_[p], -np.inf))
+                    raised = True
+                    break
+            if not raised:
+                break
+        return assignments
+
+    def anytime_regime(self, inputs, key):
+        """
+        This method publishes a greedy regime straight away and replaces it with the optimiser's regime when that is solved within ANYTIME_BUDGET seconds.
+        The problems are built first, then the solver is given what is left of the budget as its time limit, so the solve stops at the budget and nothing outlives the run.
+        Both regimes, their timings and plan versions are written to diagnostics.
+
+        Parameters
+        ----------
+        inputs
+            Dictionary -> output of model_inputs
+        key
+            String -> solution cache key
+
+        Returns
+        ----------
+        `manage_response()`
+        """
+        started = time.perf_counter()
+        assignments = self.greedy_assignments(inputs)
+        greedy_seconds = time.perf_counter()-started
+        self.best_cost = float(np.sum(inputs["cost"][np.arange(len(assignments)), assignments]))
+        self.best_volume = float(np.sum(inputs["volume"][np.arange(len(assignments)), assignments]))
+        response = self.manage_response(self.candidates(assignments))
+        self.anytime = {"Greedy": {"Seconds": greedy_seconds, "Cost": self.best_cost, "Volume": self.best_volume, "Version": self.plan_version}}
+
+        started = time.perf_counter()
+        combo_ = inputs["combo"] if self.pump_combo is None else None
+        problems = list(self.regime_problems(inputs["cost"], inputs["volume"], self.target, inputs["flow"], self.min_level, self.max_level, self.current_level, inputs["period_lengths"], inputs["out_flow"], combo_, inputs["energy"], inputs["hours"]))
+        error = None
+        try:
+            sol = self.solve_regime(problems, self.ANYTIME_BUDGET-(time.perf_counter()-started))
+        except Exception as e:
+            sol, error = None, e
+        optimiser = {"Seconds": time.perf_counter()-started}
+
+        if sol is not None:
+            self.relaxed = self.relaxation()
+            self.report_relaxation(self.relaxed)
+            combo = self.candidates([int(np.argmax(r)) for r in sol.value])
+            self.best_cost = np.sum(np.multiply(inputs["cost"],sol.value))
+            self.best_volume = np.sum(np.multiply(inputs["volume"],sol.value))
+            AEC.solution_cache.put(key, self.solution_entry(combo))
+            response = self.manage_response(combo)
+            optimiser.update({"Status": "Solved", "Cost": float(self.best_cost), "Volume": float(self.best_volume), "Version": self.plan_version})
+        else:
+            optimiser["Status"] = type(error).__name__ if error is not None else "Budget exceeded"
+        self.anytime["Optimiser"] = optimiser
+        self.insert_diagnostics(json.dumps({"Anytime": self.anytime}))
+        return response
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio, datetime
+from concurrent.futures import ThreadPoolExecutor
+from AECDatabase import AECDatabase
+from AECPrices import AECPrices
+
+class AECAsyncDatabase():
+    """
+    This class provides asyncio access to the database. It mirrors the AECDatabase API, each call runs the matching AECDatabase method
+    on its own instance in a thread pool, so concurrent calls for one or many sites never share a connection or cursor.
+    """
+    CONNECTION_METHODS = ["setup_connection", "open_connection", "close_connection"]
+    """AECDatabase methods that are not mirrored"""
+
+    def __init__(self, username, password, host, port, database, site_id=None, max_workers=8):
+        """
+        This method sets up the connection details and the thread pool.
+
+        Parameters
+        ----------
+        username
+            String
+        password
+            String
+        host
+            IP Address as String
+        port
+            Integer
+        database
+            String
+        site_id
+            Integer -> site used by the mirrored methods, can be overridden per call with `site_id=`
+        max_workers
+            Integer -> maximum number of concurrent database calls
+        """
+        self.connection_details = (username, password, host, port, database)
+        self.site_id = site_id
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def database(self, site_id):
+        """
+        This method returns a new AECDatabase for a single call.
+        """
+        db = AECDatabase()
+        db.setup_connection(*self.connection_details)
+        db.site_id = site_id
+        return db
+
+    async def call(self, name, *args, site_id=None):
+        """
+        This method runs an AECDatabase method in the thread pool.
+
+        Parameters
+        ----------
+        name
+            String -> AECDatabase method name
+        args
+            Arguments passed to the method
+        site_id
+            Integer -> site for this call, defaults to the site given to the constructor
+
+        Returns
+        ----------
+        Result of the AECDatabase method.
+        """
+        db = self.database(self.site_id if site_id is None else site_id)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: getattr(db, name)(*args))
+
+    async def gather_run_inputs(self, site_id, pump_combo, suction_window=10, today=None):
+        """
+        This method reads the inputs an AEC run takes up front. The site is read first because the cost and tariff reads depend on it, the remaining reads are issued concurrently.
+        Today's regime and target are not read here: the run reads them once it holds the site's lock, as another run may change them while it waits.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+        pump_combo
+            Float -> pump combination, None for every combination
+        suction_window
+            Integer -> number of recent suction pressure samples to average
+        today
+            DateTime -> day of the run, defaults to today
+
+        Returns
+        ----------
+        Dictionary
+            Site, cost, pump, tariff and historical data, bank holidays, the smoothed suction pressure and the day's price curve, keyed as expected by the `inputs` argument of AEC.
+        """
+        today = today or datetime.datetime.today()
+        site = await self.call("get_site_data", site_id=site_id)
+        pump = self.call("get_all_pump_data", site_id=site_id) if pump_combo is None else self.call("get_pump_data", pump_combo, site_id=site_id)
+        cost, pump, tariff, historical, holidays, suction, prices = await asyncio.gather(
+            self.call("get_cost_data", site["CostType"], today.strftime("%B")[:3], site_id=site_id),
+            pump,
+            self.call("get_tariff_data", site["TariffType"], site_id=site_id),
+            self.call("get_historical", site_id=site_id),
+            self.call("get_bank_holidays", site_id=site_id),
+            self.call("get_suction_pressure_window", suction_window, site_id=site_id),
+            self.call("get_price_curve", today.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"), site_id=site_id),
+        )
+        suction_pressure = float(suction["Pressure"]) if suction["Pressure"] is not None else None
+        return {"site": site, "cost": cost, "pump": pump, "tariff": tariff, "historical": historical, "holidays": holidays, "suction_pressure": suction_pressure, "prices": AECPrices.curve(prices, today.strftime("%Y-%m-%d"))}
+
+    def close(self):
+        """
+        This method shuts down the thread pool.
+        """
+        self.executor.shutdown(wait=True)
+
+def _mirror(name):
+    async def method(self, *args, site_id=None):
+        return await self.call(name, *args, site_id=site_id)
+    method.__name__ = name
+    method.__doc__ = getattr(AECDatabase, name).__doc__
+    return method
+
+for _name in dir(AECDatabase):
+    if not _name.startswith("_") and callable(getattr(AECDatabase, _name)) and _name not in AECAsyncDatabase.CONNECTION_METHODS:
+        setattr(AECAsyncDatabase, _name, _mirror(_name))
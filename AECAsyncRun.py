@@ -0,0 +1,43 @@
+import asyncio, json, sys
+from concurrent.futures import ThreadPoolExecutor
+from AEC import AEC
+from AECExceptions import RecalculationNotRequired
+from AECAsyncDatabase import AECAsyncDatabase
+from AECProfiler import AECProfiler
+
+async def run_site(db, executor, current_level, site_id, pump_combo):
+    """
+    Reads the inputs of one site concurrently and then runs AEC for it in the executor.
+    A site that needs no recalculation exits its run and a site that fails raises, either is reported as its status so the other sites carry on.
+    """
+    try:
+        inputs = await db.gather_run_inputs(site_id, pump_combo, AEC.SUCTION_WINDOW)
+        await asyncio.get_running_loop().run_in_executor(executor, lambda: AEC(current_level, site_id, pump_combo, False, inputs=inputs))
+        return {"SiteID": site_id, "Status": "Planned"}
+    except RecalculationNotRequired:
+        return {"SiteID": site_id, "Status": "Not required"}
+    except SystemExit as e:
+        # Any other exit, such as the database connection failing
+        return {"SiteID": site_id, "Status": "SystemExit", "Detail": "Exit code %s" % e.code}
+    except Exception as e:
+        return {"SiteID": site_id, "Status": type(e).__name__, "Detail": str(e)}
+
+async def main(sites):
+    db = AECAsyncDatabase(AEC.DB_USER, AEC.DB_PASS, AEC.DB_HOST, AEC.DB_PORT, AEC.DB_NAME)
+    try:
+        with ThreadPoolExecutor() as executor:
+            return await asyncio.gather(*[run_site(db, executor, current_level, site_id, pump_combo) for site_id, current_level, pump_combo in sites], return_exceptions=True)
+    finally:
+        db.close()
+
+# Command line arguments: SITE=LEVEL[:COMBO] for each site, COMBO defaults to 1 and "all" optimises across every combination, then --profile to profile each run
+sites = []
+for arg in AECProfiler.from_argv(sys.argv)[1:]:
+    site_id, value = arg.split("=")
+    current_level, _, pump_combo = value.partition(":")
+    pump_combo = pump_combo or "1"
+    sites.append((int(site_id), float(current_level), None if pump_combo == "all" else float(pump_combo)))
+
+statuses = asyncio.run(main(sites))
+# Requests for the same site made at once are solved once, see AECCoordinator
+print(json.dumps({"Sites": [status if isinstance(status, dict) else {"Status": type(status).__name__, "Detail": str(status)} for status in statuses], "Coordination": AEC.coordinator.metrics()}))
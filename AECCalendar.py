@@ -0,0 +1,201 @@
+import datetime, os
+from zoneinfo import ZoneInfo
+import numpy as np
+
+class AECCalendar:
+    """
+    This class is the compiled tariff calendar of a site. The tariff periods are turned into half hour slot boundaries and the tariff bands and unit costs into arrays,
+    so finding the period, band or cost for a time is an array index.
+    Period lengths in hours are measured on the local clock of TIMEZONE, so the night period is an hour shorter or longer on the days the clocks change.
+    Bank holidays use the weekend bands.
+    """
+    SLOTS = 48
+    """Half hour slots in a day"""
+    BANDS = ["Day", "Peak", "Evening", "Night"]
+    """cost columns for tariff bands 1 to 4"""
+    TIMEZONE = ZoneInfo(os.environ.get('AEC_TIMEZONE', 'Europe/London'))
+    """Local time zone of the sites"""
+    compiled = {}
+    """Calendars already compiled in the process, keyed by their tariff and cost rows"""
+
+    def __init__(self, tariff_data, cost_data):
+        """
+        This method compiles the calendar.
+
+        Parameters
+        ----------
+        tariff_data
+            Array of tariff rows in period order (Length, Weekday, Weekend)
+        cost_data
+            Array of cost rows, one per month (Month, Day, Peak, Evening, Night)
+        """
+        self.lengths = np.array([float(data["Length"]) for data in tariff_data])
+        self.boundaries = np.concatenate([[0], np.cumsum(np.rint(self.lengths*2))]).astype(int)
+        """Slot each period starts at, followed by the end of the day"""
+        self.slot_period = np.repeat(np.arange(len(self.lengths)), np.diff(self.boundaries))
+        """Period of each slot"""
+        self.bands = np.array([[int(data["Weekday"]) for data in tariff_data], [int(data["Weekend"]) for data in tariff_data]])
+        """Band of each period on working days (row 0) and on weekends and bank holidays (row 1)"""
+        self.costs = {data["Month"]: np.array([0.0]+[float(data[band]) for band in self.BANDS]) for data in cost_data}
+        """Unit cost of each band per month, indexed by band"""
+
+    @classmethod
+    def compile(cls, tariff_data, cost_data):
+        """
+        This method returns the calendar for the tariff and cost rows, compiling it the first time they are seen in the process.
+
+        Parameters
+        ----------
+        tariff_data
+            Array of tariff rows in period order
+        cost_data
+            Array of cost rows
+
+        Returns
+        ----------
+        AECCalendar
+        """
+        key = (
+            tuple((float(data["Length"]), int(data["Weekday"]), int(data["Weekend"])) for data in tariff_data),
+            tuple((data["Month"],)+tuple(float(data[band]) for band in cls.BANDS) for data in cost_data),
+        )
+        if key not in cls.compiled:
+            cls.compiled[key] = cls(tariff_data, cost_data)
+        return cls.compiled[key]
+
+    @staticmethod
+    def is_working_day(day, holidays):
+        """
+        This method returns whether the day uses the weekday bands, weekends and bank holidays do not.
+
+        Parameters
+        ----------
+        day
+            Date
+        holidays
+            Set of bank holiday dates as YYYY-MM-DD strings
+        """
+        return day.weekday() < 5 and day.strftime("%Y-%m-%d") not in holidays
+
+    def slot(self, now):
+        """
+        This method returns the half hour slot of a time of day.
+        """
+        return min(now.hour*2+now.minute//30, self.SLOTS-1)
+
+    def period(self, now):
+        """
+        This method returns the index of the tariff period a time of day falls in, starting from 0.
+        """
+        return int(self.slot_period[self.slot(now)])
+
+    def boundary_time(self, day, boundary):
+        """
+        This method returns the local time a slot boundary falls at, the last boundary being midnight at the end of the day.
+
+        Parameters
+        ----------
+        day
+            Date or DateTime
+        boundary
+            Integer -> slot
+
+        Returns
+        ----------
+        DateTime
+        """
+        midnight = datetime.datetime(day.year, day.month, day.day)
+        return midnight+datetime.timedelta(minutes=30*int(boundary))
+
+    def elapsed_hours(self, start, end):
+        """
+        This method returns the hours that really pass between two local times, which differs from the clock difference across a change to or from summer time.
+        """
+        start = start.replace(tzinfo=self.TIMEZONE).astimezone(datetime.timezone.utc)
+        end = end.replace(tzinfo=self.TIMEZONE).astimezone(datetime.timezone.utc)
+        return (end-start).total_seconds()/3600
+
+    def period_start(self, now, period):
+        """
+        This method returns the local time a period of the day starts at.
+
+        Parameters
+        ----------
+        now
+            DateTime -> any time on the day
+        period
+            Integer -> period index, the number of periods gives the end of the day
+        """
+        return self.boundary_time(now, self.boundaries[period])
+
+    def remaining_hours(self, now):
+        """
+        This method returns the hours left in the period a time falls in.
+        """
+        return self.elapsed_hours(now, self.period_start(now, self.period(now)+1))
+
+    def period_hours(self, now):
+        """
+        This method returns the length in hours of each period of the day, with the current period shortened to the hours remaining.
+
+        Parameters
+        ----------
+        now
+            DateTime
+
+        Returns
+        ----------
+        Numpy Array
+            Hours per period.
+        """
+        hours = np.array([self.elapsed_hours(self.period_start(now, i), self.period_start(now, i+1)) for i in range(len(self.lengths))])
+        hours[self.period(now)] = self.remaining_hours(now)
+        return hours
+
+    def slot_hours(self, now):
+        """
+        This method returns the hours that really pass in each half hour slot of the day, so the slots of a period add up to its length in `period_hours`.
+        The slots in the hour skipped when the clocks go forward last no time and the hour repeated when they go back is added to the slot before the change.
+
+        Parameters
+        ----------
+        now
+            DateTime -> any time on the day
+
+        Returns
+        ----------
+        Numpy Array
+            Hours per slot.
+        """
+        elapsed = np.array([self.elapsed_hours(self.boundary_time(now, 0), self.boundary_time(now, slot)) for slot in range(self.SLOTS+1)])
+        return np.diff(np.minimum.accumulate(elapsed[::-1])[::-1])
+
+    def period_bands(self, working_day):
+        """
+        This method returns the tariff band of each period.
+        """
+        return self.bands[0 if working_day else 1]
+
+    def unit_costs(self, month, working_day):
+        """
+        This method returns the unit cost of each period of the day.
+
+        Parameters
+        ----------
+        month
+            String -> month as stored in cost (Jan, Feb, ...)
+        working_day
+            Boolean -> False for weekends and bank holidays
+
+        Returns
+        ----------
+        Numpy Array
+            Cost per kilowatt hour for each period.
+        """
+        return self.costs[month][self.period_bands(working_day)]
+
+    def slot_costs(self, month, working_day):
+        """
+        This method returns the unit cost of each half hour slot of the day.
+        """
+        return self.unit_costs(month, working_day)[self.slot_period]
@@ -0,0 +1,163 @@
+import os, threading, time
+from concurrent.futures import Future, wait
+from AECExceptions import SiteBusyError
+
+class AECCoordinator:
+    """
+    This class makes sure only one regime is computed for a site at a time.
+    Within a process, a run requested while another for the same site is in flight joins it and returns the same result, or raises the same exception, without solving again.
+    Across processes, the site's lock in the database (see AECStorage.acquire_site_lock) is held while solving. A run that had to wait for it
+    returns the plan saved by the run it waited for instead of solving again, and solves as usual when that run saved no new plan version.
+    Sites planned together hold all of their locks at once (see `run_group`).
+    Contention is counted in `stats`.
+    """
+    LOCK_TIMEOUT = int(os.environ.get('AEC_LOCK_TIMEOUT', 60))
+    """Seconds a run waits for another process to finish with the site before giving up"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.stats = {"Runs": 0, "Coalesced": 0, "LockContended": 0, "LockWaitSeconds": 0.0, "LockTimeouts": 0, "Reused": 0, "MaxInFlight": 0}
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def run(self, storage, solve, reuse):
+        """
+        This method runs the regime of a site, or joins the run already in flight for it.
+
+        Parameters
+        ----------
+        storage
+            AECStorage -> storage of the run, its `site_id` is coordinated
+        solve
+            Function -> computes, saves and returns the regime
+        reuse
+            Function -> returns the plan saved for today
+
+        Returns
+        ----------
+        Array
+            Regime returned by solve, by the run joined or reused from the database.
+        """
+        site_id = int(storage.site_id)
+        with self.lock:
+            future = self.in_flight.get(site_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.in_flight[site_id] = future
+                self.stats["Runs"] += 1
+                self.stats["MaxInFlight"] = max(self.stats["MaxInFlight"], len(self.in_flight))
+            else:
+                self.stats["Coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self.run_locked(storage, solve, reuse)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            # RecalculationNotRequired, a SystemExit, reaches the joined runs too
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[site_id]
+
+    def run_locked(self, storage, solve, reuse):
+        """
+        This method solves while holding the site's lock in the database.
+        """
+        version = self.wait_for_lock(storage)
+        try:
+            # Another process ran the site while this one waited, use its plan when it saved one
+            if version is not None and storage.get_latest_plan_version() > version:
+                self.count("Reused")
+                return reuse()
+            return solve()
+        finally:
+            storage.release_site_lock()
+
+    def wait_for_lock(self, storage):
+        """
+        This method takes the site's lock in the database, waiting up to LOCK_TIMEOUT when another process holds it.
+
+        Returns
+        ----------
+        Integer
+            Latest plan version of the site before waiting, None when the lock was free.
+        """
+        if storage.acquire_site_lock(0):
+            return None
+        self.count("LockContended")
+        version = storage.get_latest_plan_version()
+        started = time.perf_counter()
+        acquired = storage.acquire_site_lock(self.LOCK_TIMEOUT)
+        self.count("LockWaitSeconds", time.perf_counter()-started)
+        if not acquired:
+            storage.release_site_lock()
+            self.count("LockTimeouts")
+            raise SiteBusyError(storage.site_id)
+        return version
+
+    def run_group(self, storages, solve):
+        """
+        This method plans several sites together, such as a network of sites (see `AECNetwork`). It waits for the runs of those sites already in flight in the process,
+        then takes the lock of every site in the database in order of site, so groups that share sites cannot deadlock. Runs of the sites requested meanwhile join the group's.
+        The group always solves, as its sites are planned from the inputs read once every lock is held.
+
+        Parameters
+        ----------
+        storages
+            Array of AECStorage -> storage of each site, each with its own `site_id`
+        solve
+            Function -> computes, saves and returns the regime of each site by site
+
+        Returns
+        ----------
+        Dictionary
+            Regime of each site returned by solve.
+        """
+        storages = sorted(storages, key=lambda storage: int(storage.site_id))
+        site_ids = [int(storage.site_id) for storage in storages]
+        while True:
+            with self.lock:
+                running = [self.in_flight[site_id] for site_id in site_ids if site_id in self.in_flight]
+                if len(running) == 0:
+                    futures = {site_id: Future() for site_id in site_ids}
+                    self.in_flight.update(futures)
+                    self.stats["Runs"] += 1
+                    self.stats["MaxInFlight"] = max(self.stats["MaxInFlight"], len(self.in_flight))
+                    break
+            wait(running)
+
+        held = []
+        try:
+            for storage in storages:
+                self.wait_for_lock(storage)
+                held.append(storage)
+            result = solve()
+            for site_id, future in futures.items():
+                future.set_result(result[site_id])
+            return result
+        except BaseException as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            for storage in reversed(held):
+                storage.release_site_lock()
+            with self.lock:
+                for site_id in site_ids:
+                    del self.in_flight[site_id]
+
+    def metrics(self):
+        """
+        This method returns a copy of the contention counters with the number of runs in flight.
+        """
+        with self.lock:
+            return dict(self.stats, InFlight=len(self.in_flight))
@@ -0,0 +1,100 @@
+import numpy as np
+
+class AECCostEngine:
+    """
+    This class builds the optimiser inputs for the remaining periods of the day as (periods x pump rows) arrays by broadcasting the period hours and prices against the pump table.
+    Prices are given per half hour slot, so band tariffs and half hourly price curves take the same path.
+    A pump row runs for the whole of a period, so a price curve re-prices the existing tariff periods: the optimiser cannot move pumping to the cheaper half hours within a period.
+    """
+    def __init__(self, pump_data):
+        """
+        This method reads the pump table once.
+
+        Parameters
+        ----------
+        pump_data
+            Array of pump rows (Speed, Flow, Energy, Combination)
+        """
+        self.pump_data = pump_data
+        self.flow = np.array([float(data["Flow"]) for data in pump_data])
+        self.energy = np.array([float(data["Energy"]) for data in pump_data])
+        self.combo = np.array([float(data["Combination"]) for data in pump_data])
+
+    @staticmethod
+    def period_prices(slot_prices, boundaries, start_slot):
+        """
+        This method averages the slot prices over each period, counting only the slots from start_slot onwards.
+        The average prices a pump row run for the whole period exactly, it is the only regime within a period the optimiser chooses.
+
+        Parameters
+        ----------
+        slot_prices
+            Numpy Array -> cost per kilowatt hour of each half hour slot
+        boundaries
+            Numpy Array -> slot each period starts at, followed by the end of the day
+        start_slot
+            Integer -> current slot
+
+        Returns
+        ----------
+        Numpy Array
+            Average cost per kilowatt hour of each period, periods already over use all their slots.
+        """
+        ends = boundaries[1:]
+        starts = np.where(ends > start_slot, np.maximum(boundaries[:-1], start_slot), boundaries[:-1])
+        slot_prices = np.asarray(slot_prices, dtype=float)
+        # A period whose slots all cost the same keeps that cost exactly rather than a rounded average
+        flat = np.minimum.reduceat(slot_prices, starts) == np.maximum.reduceat(slot_prices, starts)
+        return np.where(flat, slot_prices[starts], np.add.reduceat(slot_prices, starts)/(ends-starts))
+
+    def matrices(self, hours, prices):
+        """
+        This method returns the cost, volume, flow and energy of every pump row in every period.
+
+        Parameters
+        ----------
+        hours
+            Numpy Array -> hours of each period to optimise
+        prices
+            Numpy Array -> cost per kilowatt hour of each period to optimise
+
+        Returns
+        ----------
+        Dictionary
+            Matrices of cost, volume (litres), flow and energy, and the combination of each pump row and the hours and price of each period.
+        """
+        hours = np.asarray(hours, dtype=float)
+        prices = np.asarray(prices, dtype=float)
+        cost = self.energy[None, :]*prices[:, None]*hours[:, None]
+        volume = hours[:, None]*self.flow[None, :]*3600
+        return {
+            "cost": cost,
+            "volume": volume,
+            "flow": np.broadcast_to(self.flow, cost.shape),
+            "energy": np.broadcast_to(self.energy, cost.shape),
+            "combo": self.combo,
+            "hours": hours,
+            "tariff": prices,
+        }
+
+    def candidates(self, matrices, assignments):
+        """
+        This method returns the chosen pump row of each period in the format used by manage_response.
+
+        Parameters
+        ----------
+        matrices
+            Dictionary -> output of matrices
+        assignments
+            Array -> chosen pump row for each period
+
+        Returns
+        ----------
+        Array
+            Speed, volume, cost, hours, flow, combination, tariff and energy of each period.
+        """
+        combo = []
+        for i, j in enumerate(assignments):
+            data = self.pump_data[j]
+            combo.append({"speed": data["Speed"], "volume": matrices["volume"][i, j], "cost": matrices["cost"][i, j], "hours": matrices["hours"][i], "flow": data["Flow"], "combo": data["Combination"], "tariff": matrices["tariff"][i], "energy": data["Energy"]})
+        return combo
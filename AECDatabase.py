@@ -1,8 +1,11 @@
-import mariadb, sys
+import re, sys
+import numpy as np
+from AECStorage import AECStorage
 
-class AECDatabase():
+class AECDatabase(AECStorage):
     """
-    This class handles the parsing and quering of the databse.
+    This class handles the parsing and quering of the databse. It is the MariaDB implementation of AECStorage.
+    The MariaDB driver is imported when a connection is first opened, so subclasses with their own connection, such as AECSQLiteDatabase, run without it.
     """
     def setup_connection(self, username, password, host, port, database):
         """
@@ -31,6 +34,7 @@ class AECDatabase():
         """
         This method opens the database connection.
         """
+        import mariadb
         try:
             self.connection = mariadb.connect(user=self.username, password=self.password, host=self.host, port=self.port, database=self.database)
             self.cur = self.connection.cursor()
@@ -160,6 +164,52 @@ class AECDatabase():
         self.close_connection()
         return result
 
+    def get_bank_holidays(self):
+        """
+        This method returns the bank holiday dates as YYYY-MM-DD strings.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT HolidayDate FROM bank_holiday ORDER BY HolidayDate;")
+        result = [str(row[0]) for row in self.cur]
+        self.close_connection()
+        return result
+
+    def get_price_curve(self, first_date, last_date):
+        """
+        This method returns the half hourly prices of the site from first_date to last_date inclusive.
+
+        Parameters
+        ----------
+        first_date
+            String -> YYYY-MM-DD
+        last_date
+            String -> YYYY-MM-DD
+
+        Returns
+        ----------
+        Array
+            Rows of PriceDate as a YYYY-MM-DD string, Slot and Price, ordered by date and slot.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT PriceDate, Slot, Price FROM price_curve WHERE SiteID = ? AND PriceDate BETWEEN ? AND ? ORDER BY PriceDate, Slot;", (self.site_id, first_date, last_date,))
+        result = [{"PriceDate": str(row[0]), "Slot": int(row[1]), "Price": float(row[2])} for row in self.cur]
+        self.close_connection()
+        return result
+
+    def insert_price_curve(self, rows):
+        """
+        This method stores half hourly prices in one batch, replacing any price already stored for the same site, date and slot.
+
+        Parameters
+        ----------
+        rows
+            Array of (SiteID, PriceDate, Slot, Price) tuples
+        """
+        self.open_connection()
+        self.cur.executemany("REPLACE INTO price_curve (SiteID, PriceDate, Slot, Price) VALUES (?, ?, ?, ?);", rows)
+        self.connection.commit()
+        self.close_connection()
+
     def get_pump_data(self, pump_combo):
         """
         This method returns the stored procedure getPumpData.
@@ -173,6 +223,19 @@ class AECDatabase():
         self.close_connection()
         return result
 
+    def get_all_pump_data(self):
+        """
+        This method returns the pump data for every combination at the site in a single query, ordered by combination and speed.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT * FROM pump WHERE SiteID = ? ORDER BY Combination, Speed;", (self.site_id,))
+        headers = [x[0] for x in self.cur.description]
+        result = []
+        for row in self.cur:
+            result.append(dict(zip(headers, list(map(str, list(row))))))
+        self.close_connection()
+        return result
+
     def get_latest_suction_pressure(self):
         """
         This method returns the stored procedure getPumpData.
@@ -186,6 +249,22 @@ class AECDatabase():
         self.close_connection()
         return result
     
+    def get_suction_pressure_window(self, samples):
+        """
+        This method returns the average of the most recent suction pressure samples for the site.
+
+        Parameters
+        ----------
+        samples
+            Integer -> number of recent samples to average
+        """
+        self.open_connection()
+        self.cur.execute("SELECT AVG(Pressure) AS Pressure, COUNT(*) AS Samples FROM (SELECT Pressure FROM suction_pressure WHERE SiteID = ? ORDER BY ID DESC LIMIT ?) AS recent;", (self.site_id, samples,))
+        fetch_pressure = self.cur.fetchone()
+        result = dict(zip([c[0] for c in self.cur.description], fetch_pressure))
+        self.close_connection()
+        return result
+
     def get_tariff_data(self, tariff_id):
         """
         This method returns the stored procedure getTariffData.
@@ -204,7 +283,7 @@ class AECDatabase():
         This method returns the stored procedure getRegime.
         """
         self.open_connection()
-        self.cur.execute("SELECT * FROM regime WHERE SiteID = ? AND DATE(Created) = CURDATE();", (self.site_id,))
+        self.cur.execute("SELECT * FROM regime WHERE SiteID = ? AND PlanDate = CURDATE() ORDER BY ID;", (self.site_id,))
         headers = [x[0] for x in self.cur.description]
         result = []
         for row in self.cur:
@@ -226,20 +305,118 @@ class AECDatabase():
         self.connection.commit()
         self.close_connection()
 
-    def insert_historical(self, outlet):
+    def insert_historical(self, outlet, created=None):
         """
-        This method returns the stored procedure insertRegime.
+        This method stores an outlet flow sample.
 
         Paramaters
         ----------
-        combo
-            Array of regimes
+        outlet
+            Float -> outlet flow in litres/second
+        created
+            DateTime -> start of the slot the sample is for, defaults to now
         """
         self.open_connection()
-        self.cur.execute("INSERT INTO historical (ID, SiteID, Outlet) VALUES (null, ?, ?);", (self.site_id, outlet,))
+        if created is None:
+            self.cur.execute("INSERT INTO historical (ID, SiteID, Outlet) VALUES (null, ?, ?);", (self.site_id, outlet,))
+        else:
+            self.cur.execute("INSERT INTO historical (ID, SiteID, Outlet, Created) VALUES (null, ?, ?, ?);", (self.site_id, outlet, created.strftime("%Y-%m-%d %H:%M:%S"),))
         self.connection.commit()
         self.close_connection()
 
+    def get_historical_state(self):
+        """
+        This method returns the saved AECResampler state of the site, None when there is none.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT BinStart, BinLevel, BinPumped, LastTime, LastLevel, LastFlow FROM historical_state WHERE SiteID = ?;", (self.site_id,))
+        row = self.cur.fetchone()
+        result = None if row is None else dict(zip([c[0] for c in self.cur.description], row))
+        self.close_connection()
+        return result
+
+    def save_historical_state(self, state):
+        """
+        This method saves the AECResampler state of the site.
+
+        Paramaters
+        ----------
+        state
+            Dictionary -> BinStart, BinLevel, BinPumped, LastTime, LastLevel and LastFlow
+        """
+        self.open_connection()
+        self.cur.execute("REPLACE INTO historical_state (SiteID, BinStart, BinLevel, BinPumped, LastTime, LastLevel, LastFlow) VALUES (?, ?, ?, ?, ?, ?, ?);",
+            (self.site_id, state["BinStart"].strftime("%Y-%m-%d %H:%M:%S"), state["BinLevel"], state["BinPumped"], state["LastTime"].strftime("%Y-%m-%d %H:%M:%S.%f"), state["LastLevel"], state["LastFlow"],))
+        self.connection.commit()
+        self.close_connection()
+
+    def insert_samples(self, buffer, historical, suction, states):
+        """
+        This method stores a batch of samples of any sites, as queued by AECSampleWriter, with multi-row inserts and a single commit.
+
+        Paramaters
+        ----------
+        buffer
+            Array of (SiteID, PumpedFlow, Level, Created) tuples for historical_buffer
+        historical
+            Array of (SiteID, Outlet, Created) tuples
+        suction
+            Array of (SiteID, Pressure, Created) tuples
+        states
+            Array of (SiteID, BinStart, BinLevel, BinPumped, LastTime, LastLevel, LastFlow) tuples, the resampler state of each site after the batch
+        """
+        self.open_connection()
+        if len(buffer):
+            self.cur.executemany("INSERT INTO historical_buffer (SiteID, PumpedFlow, `Level`, `Created`) VALUES (?, ?, ?, ?);", buffer)
+        if len(historical):
+            self.cur.executemany("INSERT INTO historical (SiteID, Outlet, Created) VALUES (?, ?, ?);", historical)
+        if len(suction):
+            self.cur.executemany("INSERT INTO suction_pressure (SiteID, Pressure, Created) VALUES (?, ?, ?);", suction)
+        if len(states):
+            self.cur.executemany("REPLACE INTO historical_state (SiteID, BinStart, BinLevel, BinPumped, LastTime, LastLevel, LastFlow) VALUES (?, ?, ?, ?, ?, ?, ?);", states)
+        self.connection.commit()
+        self.close_connection()
+
+    def insert_level_trajectory(self, version, trajectory):
+        """
+        This method stores the predicted trajectory of a plan version of today in one row, replacing any already stored for the version.
+
+        Paramaters
+        ----------
+        version
+            Integer -> plan version
+        trajectory
+            Numpy Array -> level, inflow and outflow of each half hour sample (3 x samples), packed as little endian float32
+        """
+        trajectory = np.ascontiguousarray(trajectory, dtype="<f4")
+        self.open_connection()
+        self.cur.execute("REPLACE INTO level_trajectory (SiteID, PlanDate, Version, Samples, Trajectory) VALUES (?, CURDATE(), ?, ?, ?);", (self.site_id, version, trajectory.shape[1], trajectory.tobytes(),))
+        self.connection.commit()
+        self.close_connection()
+
+    def get_level_trajectory(self, version=None):
+        """
+        This method returns the predicted trajectory of a plan version of today, read straight from the packed bytes.
+
+        Paramaters
+        ----------
+        version
+            Integer -> plan version, None for the latest
+
+        Returns
+        ----------
+        Numpy Array
+            Level, inflow and outflow of each half hour sample (3 x samples) as read only float32, None when none is stored.
+        """
+        self.open_connection()
+        if version is None:
+            self.cur.execute("SELECT Samples, Trajectory FROM level_trajectory WHERE SiteID = ? AND PlanDate = CURDATE() ORDER BY Version DESC LIMIT 1;", (self.site_id,))
+        else:
+            self.cur.execute("SELECT Samples, Trajectory FROM level_trajectory WHERE SiteID = ? AND PlanDate = CURDATE() AND Version = ?;", (self.site_id, version,))
+        row = self.cur.fetchone()
+        self.close_connection()
+        return None if row is None else np.frombuffer(row[1], dtype="<f4").reshape(-1, int(row[0]))
+
     def insert_level_estimate(self, t1, t2, t3, t4, t5, t6, end_day):
         """
         This method returns the stored procedure insertRegime.
@@ -269,8 +446,11 @@ class AECDatabase():
         self.close_connection()
 
     def last_historical_buffer(self):
+        """
+        This method returns the latest pumped flow and level sample of the last week, reading only the newest partitions.
+        """
         self.open_connection()
-        self.cur.execute("SELECT * FROM historical_buffer WHERE SiteID = ? ORDER BY ID DESC LIMIT 1;", (self.site_id,))
+        self.cur.execute("SELECT * FROM historical_buffer WHERE SiteID = ? AND `Created` >= NOW() - INTERVAL 7 DAY ORDER BY `Created` DESC, ID DESC LIMIT 1;", (self.site_id,))
         headers = [x[0] for x in self.cur.description]
         result = []
         for row in self.cur:
@@ -278,42 +458,191 @@ class AECDatabase():
         self.close_connection()
         return result
 
-    def insert_regime(self, combo):
+    def add_plan_columns(self):
         """
-        This method returns the stored procedure insertRegime.
+        This method upgrades a database created before plan versions: regime gains PlanDate, Version and the (SiteID, PlanDate) index,
+        and the regime_version and regime_version_period tables are created. It does nothing to a database that already has them.
+        """
+        self.open_connection()
+        self.cur.execute("ALTER TABLE regime ADD COLUMN IF NOT EXISTS `PlanDate` date DEFAULT NULL AFTER `Pump`, ADD COLUMN IF NOT EXISTS `Version` int(11) DEFAULT NULL AFTER `PlanDate`, ADD INDEX IF NOT EXISTS `site_plan_date` (`SiteID`,`PlanDate`);")
+        self.cur.execute("CREATE TABLE IF NOT EXISTS `regime_version` (`ID` int(11) NOT NULL AUTO_INCREMENT, `SiteID` int(11) NOT NULL, `PlanDate` date NOT NULL, `Version` int(11) NOT NULL, `ChangedPeriods` int(11) DEFAULT NULL, "
+            "`Created` timestamp NULL DEFAULT current_timestamp(), PRIMARY KEY (`ID`), UNIQUE KEY `site_plan_version` (`SiteID`,`PlanDate`,`Version`)) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;")
+        self.cur.execute("CREATE TABLE IF NOT EXISTS `regime_version_period` (`ID` int(11) NOT NULL AUTO_INCREMENT, `VersionID` int(11) NOT NULL, `PeriodName` varchar(50) COLLATE armscii8_bin DEFAULT NULL, "
+            "`Speed` float(10,2) DEFAULT NULL, `Flow` float(10,2) DEFAULT NULL, `Time` float(10,2) DEFAULT NULL, `Volume` float(10,2) DEFAULT NULL, `Cost` float(10,2) DEFAULT NULL, `EstLevel` float(10,2) DEFAULT NULL, `Pump` int(11) DEFAULT NULL, "
+            "PRIMARY KEY (`ID`), KEY `FK_regime_version_period_version` (`VersionID`), CONSTRAINT `FK_regime_version_period_version` FOREIGN KEY (`VersionID`) REFERENCES `regime_version` (`ID`) ON DELETE NO ACTION ON UPDATE NO ACTION) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;")
+        self.connection.commit()
+        self.close_connection()
+
+    def backfill_plan_versions(self):
+        """
+        This method gives the regime rows written before plan versions their PlanDate, the date they were created, and seeds version 1 of each of those plans
+        in regime_version and regime_version_period, so today's plan at the time of the upgrade and the earlier plans are still read. It is safe to run again.
+        A plan that already has versions, because it was saved by the new code before the backfill ran, keeps them and its older rows are left without a version.
+
+        Returns
+        ----------
+        Dictionary
+            Rows dated and plans seeded.
+        """
+        self.open_connection()
+        self.cur.execute("UPDATE regime SET PlanDate = DATE(Created) WHERE PlanDate IS NULL AND Created IS NOT NULL;")
+        dated = self.cur.rowcount
+        self.cur.execute("SELECT ID, SiteID, PlanDate, PeriodName, Speed, Flow, Time, Volume, Cost, EstLevel, Pump FROM regime WHERE Version IS NULL AND PlanDate IS NOT NULL ORDER BY SiteID, PlanDate, ID;")
+        plans = {}
+        for row in self.cur.fetchall():
+            plans.setdefault((row[1], str(row[2])), []).append(row)
+        seeded = 0
+        for (site_id, plan_date), rows in plans.items():
+            self.cur.execute("SELECT COUNT(*) FROM regime_version WHERE SiteID = ? AND PlanDate = ?;", (site_id, plan_date,))
+            if int(self.cur.fetchone()[0]) > 0:
+                continue
+            self.cur.execute("INSERT INTO regime_version (ID, SiteID, PlanDate, Version, ChangedPeriods) VALUES (null, ?, ?, 1, ?);", (site_id, plan_date, len(rows),))
+            version_id = self.cur.lastrowid
+            self.cur.executemany("INSERT INTO regime_version_period (ID, VersionID, PeriodName, Speed, Flow, Time, Volume, Cost, EstLevel, Pump) VALUES (null, ?, ?, ?, ?, ?, ?, ?, ?, ?);", [(version_id, *row[3:]) for row in rows])
+            self.cur.executemany("UPDATE regime SET Version = 1 WHERE ID = ?;", [(row[0],) for row in rows])
+            seeded += 1
+        self.connection.commit()
+        self.close_connection()
+        return {"Dated": dated, "Seeded": seeded}
+
+    def save_plan(self, combo):
+        """
+        This method stores the regime as a new immutable plan version for today. Only the periods that differ from the current plan are written,
+        both to the version history and to the current plan in regime.
 
         Paramaters
         ----------
         combo
             Array of regimes
+
+        Returns
+        ----------
+        Integer
+            New plan version, None when nothing changed.
         """
+        fields = ["Speed", "Flow", "Time", "Volume", "Cost", "EstLevel", "Pump"]
         self.open_connection()
+        self.cur.execute("SELECT * FROM regime WHERE SiteID = ? AND PlanDate = CURDATE() ORDER BY ID;", (self.site_id,))
+        headers = [x[0] for x in self.cur.description]
+        current = {}
+        for row in self.cur:
+            data = dict(zip(headers, list(row)))
+            current[data["PeriodName"]] = data
+
+        # Values are compared at the precision they are stored with
+        changed = []
         for data in combo:
-            self.cur.execute("INSERT INTO regime (ID, SiteID, PeriodName, Speed, Flow, Time, Volume, Cost, EstLevel, Pump) VALUES (null, ?, ?, ?, ?, ?, ?, ?, ?, ?);", (self.site_id, data["Name"], data["Speed"], data["Flow"], data["Time"], data["Volume"], data["Cost"], data["EstLevel"], data["Combo"],))
-            self.connection.commit()
+            row = [data["Speed"], data["Flow"], data["Time"], data["Volume"], data["Cost"], data["EstLevel"], data["Combo"]]
+            stored = current.get(data["Name"])
+            if stored is None or any(stored[field] is None or round(float(stored[field]), 2) != round(float(value), 2) for field, value in zip(fields, row)):
+                changed.append((data["Name"], row))
+        if len(changed) == 0:
+            self.close_connection()
+            return None
+
+        self.cur.execute("SELECT COALESCE(MAX(Version), 0) FROM regime_version WHERE SiteID = ? AND PlanDate = CURDATE();", (self.site_id,))
+        version = int(self.cur.fetchone()[0])+1
+        self.cur.execute("INSERT INTO regime_version (ID, SiteID, PlanDate, Version, ChangedPeriods) VALUES (null, ?, CURDATE(), ?, ?);", (self.site_id, version, len(changed),))
+        version_id = self.cur.lastrowid
+        self.cur.executemany("INSERT INTO regime_version_period (ID, VersionID, PeriodName, Speed, Flow, Time, Volume, Cost, EstLevel, Pump) VALUES (null, ?, ?, ?, ?, ?, ?, ?, ?, ?);", [(version_id, name, *row) for name, row in changed])
+        for name, row in changed:
+            if name in current:
+                self.cur.execute("UPDATE regime SET `Speed`=?, `Flow`=?, `Time`=?, `Volume`=?, `Cost`=?, `EstLevel`=?, `Pump`=?, `Version`=? WHERE ID = ?;", (*row, version, current[name]["ID"],))
+            else:
+                self.cur.execute("INSERT INTO regime (ID, SiteID, PeriodName, Speed, Flow, Time, Volume, Cost, EstLevel, Pump, PlanDate, Version) VALUES (null, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURDATE(), ?);", (self.site_id, name, *row, version,))
+        self.connection.commit()
         self.close_connection()
+        return version
 
-    def update_regime(self, combo):
+    def get_latest_plan_version(self):
         """
-        This method returns the stored procedure updateRegime.
+        This method returns the latest version of today's plan, 0 when there is none.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT COALESCE(MAX(Version), 0) FROM regime_version WHERE SiteID = ? AND PlanDate = CURDATE();", (self.site_id,))
+        result = int(self.cur.fetchone()[0])
+        self.close_connection()
+        return result
 
-        Paramaters
+    def acquire_site_lock(self, timeout):
+        """
+        This method takes the named lock of the site with GET_LOCK. The lock belongs to a connection of its own, held open until release_site_lock,
+        as the connection of the other queries is closed after each one and would release it.
+
+        Parameters
         ----------
-        combo
-            Array of regimes
+        timeout
+            Integer -> seconds to wait for the lock, 0 to only try
+
+        Returns
+        ----------
+        Boolean
+            True when the lock is held.
+        """
+        if getattr(self, "lock_connection", None) is None:
+            import mariadb
+            self.lock_connection = mariadb.connect(user=self.username, password=self.password, host=self.host, port=self.port, database=self.database)
+        cur = self.lock_connection.cursor()
+        cur.execute("SELECT GET_LOCK(?, ?);", ("aec_site_%d" % int(self.site_id), timeout,))
+        return cur.fetchone()[0] == 1
+
+    def release_site_lock(self):
+        """
+        This method releases the lock of the site and closes its connection.
+        """
+        if getattr(self, "lock_connection", None) is None:
+            return
+        cur = self.lock_connection.cursor()
+        cur.execute("SELECT RELEASE_LOCK(?);", ("aec_site_%d" % int(self.site_id),))
+        self.lock_connection.close()
+        self.lock_connection = None
+
+    def get_plan_versions(self, plan_date):
+        """
+        This method returns the version history of the plan for the given date.
+
+        Parameters
+        ----------
+        plan_date
+            String -> date of the plan (YYYY-MM-DD)
+        """
+        self.open_connection()
+        self.cur.execute("SELECT * FROM regime_version WHERE SiteID = ? AND PlanDate = ? ORDER BY Version;", (self.site_id, plan_date,))
+        headers = [x[0] for x in self.cur.description]
+        result = []
+        for row in self.cur:
+            result.append(dict(zip(headers, list(map(str, list(row))))))
+        self.close_connection()
+        return result
+
+    def get_plan_version(self, plan_date, version):
+        """
+        This method rebuilds the plan as it was at the given version by taking the latest stored row for each period up to that version.
+
+        Parameters
+        ----------
+        plan_date
+            String -> date of the plan (YYYY-MM-DD)
+        version
+            Integer -> plan version
         """
         self.open_connection()
-        for data in combo[self.get_time_period()-1:]:
-            self.cur.execute("UPDATE regime SET `Speed`=?, `Cost`=?, `Volume`=?, `Time`=?, `Flow`=?, `EstLevel`=?, `Pump`=? WHERE SiteID = ? AND `PeriodName` = ? AND DATE(`Created`) = CURDATE();", (data["Speed"], data["Cost"], data["Volume"], data["Time"], data["Flow"], data["EstLevel"], data["Combo"], self.site_id, data["Name"],))
-            self.connection.commit()
+        self.cur.execute("SELECT p.*, v.Version, v.Created FROM regime_version_period p JOIN regime_version v ON v.ID = p.VersionID WHERE v.SiteID = ? AND v.PlanDate = ? AND v.Version <= ? ORDER BY v.Version, p.ID;", (self.site_id, plan_date, version,))
+        headers = [x[0] for x in self.cur.description]
+        periods = {}
+        for row in self.cur:
+            data = dict(zip(headers, list(map(str, list(row)))))
+            periods[data["PeriodName"]] = data
         self.close_connection()
+        return sorted(periods.values(), key=lambda data: int(data["PeriodName"][1:]))
 
     def get_historical(self):
         """
         This method returns the stored procedure getHistorical.
         """
         self.open_connection()
-        self.cur.execute("SELECT TIME(`Created`) AS 'Time', AVG(`Outlet`) AS 'Outlet' FROM `historical` WHERE DATE(`Created`) BETWEEN NOW() - INTERVAL 4 WEEK AND NOW() - INTERVAL 1 WEEK AND WEEKDAY(`Created`) = WEEKDAY(NOW()) AND SiteID = ? GROUP BY HOUR(`Created`), MINUTE(`Created`);", (self.site_id,))
+        # Created is compared as it is stored so the site_created index and the monthly partitions limit the read to the three weeks
+        self.cur.execute("SELECT TIME(`Created`) AS 'Time', AVG(`Outlet`) AS 'Outlet' FROM `historical` WHERE SiteID = ? AND `Created` >= CURDATE() - INTERVAL 3 WEEK AND `Created` < CURDATE() - INTERVAL 6 DAY AND WEEKDAY(`Created`) = WEEKDAY(NOW()) GROUP BY HOUR(`Created`), MINUTE(`Created`);", (self.site_id,))
         headers = [x[0] for x in self.cur.description]
         result = []
         for row in self.cur:
@@ -335,6 +664,184 @@ class AECDatabase():
         return result
     
 
+    def get_rows_after(self, table, last_id, limit):
+        """
+        This method returns the next batch of rows for the site from one of the exported tables, ordered by ID.
+
+        Parameters
+        ----------
+        table
+            String -> historical, historical_buffer, regime or target
+        last_id
+            Integer -> only rows with a greater ID are returned
+        limit
+            Integer -> maximum number of rows
+
+        Returns
+        ----------
+        Tuple
+            Column names and rows with their database types.
+        """
+        if table not in ["historical", "historical_buffer", "regime", "target"]:
+            raise ValueError("Table %s cannot be exported" % table)
+        self.open_connection()
+        self.cur.execute("SELECT * FROM `%s` WHERE SiteID = ? AND ID > ? ORDER BY ID LIMIT ?;" % table, (self.site_id, last_id, limit,))
+        headers = [x[0] for x in self.cur.description]
+        result = [list(row) for row in self.cur]
+        self.close_connection()
+        return headers, result
+
+    def get_partitions(self, table):
+        """
+        This method returns the monthly partitions of historical or historical_buffer.
+
+        Returns
+        ----------
+        Array
+            Name and upper bound (Unix time, None for MAXVALUE) of each partition in order.
+        """
+        if table not in ["historical", "historical_buffer"]:
+            raise ValueError("Table %s is not partitioned" % table)
+        self.open_connection()
+        self.cur.execute("SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION;", (table,))
+        result = [{"Name": row[0], "LessThan": None if row[1] == "MAXVALUE" else int(row[1])} for row in self.cur]
+        self.close_connection()
+        return result
+
+    def add_partition(self, table, name, less_than):
+        """
+        This method splits a new monthly partition off the MAXVALUE partition `pmax`.
+
+        Parameters
+        ----------
+        table
+            String -> historical or historical_buffer
+        name
+            String -> partition name, pYYYYMM
+        less_than
+            Date -> first day of the following month
+        """
+        if table not in ["historical", "historical_buffer"] or not re.fullmatch(r"p\d{6}", name):
+            raise ValueError("Cannot add partition %s to %s" % (name, table))
+        self.open_connection()
+        # Partition bounds cannot be bound as parameters, the values are validated above
+        self.cur.execute("ALTER TABLE `%s` REORGANIZE PARTITION `pmax` INTO (PARTITION `%s` VALUES LESS THAN (UNIX_TIMESTAMP('%s')), PARTITION `pmax` VALUES LESS THAN MAXVALUE);" % (table, name, less_than.strftime("%Y-%m-%d")))
+        self.close_connection()
+
+    def drop_partition(self, table, name):
+        """
+        This method drops a monthly partition and every row in it.
+        """
+        if table not in ["historical", "historical_buffer"] or not re.fullmatch(r"p\d{6}", name):
+            raise ValueError("Cannot drop partition %s of %s" % (name, table))
+        self.open_connection()
+        self.cur.execute("ALTER TABLE `%s` DROP PARTITION `%s`;" % (table, name))
+        self.close_connection()
+
+    def delete_rows_before(self, table, before):
+        """
+        This method deletes the rows of historical or historical_buffer created before a time, for storage without partitions.
+        """
+        if table not in ["historical", "historical_buffer"]:
+            raise ValueError("Cannot expire rows of %s" % table)
+        self.open_connection()
+        self.cur.execute("DELETE FROM `%s` WHERE `Created` < ?;" % table, (before.strftime("%Y-%m-%d %H:%M:%S"),))
+        self.connection.commit()
+        self.close_connection()
+
+    def get_buffer_samples(self, first, last):
+        """
+        This method returns the historical_buffer samples of every site from first up to but not including last.
+
+        Returns
+        ----------
+        Array
+            Rows of SiteID, PumpedFlow, Level and Created.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT SiteID, PumpedFlow, `Level`, `Created` FROM historical_buffer WHERE `Created` >= ? AND `Created` < ? ORDER BY `Created`;", (first.strftime("%Y-%m-%d %H:%M:%S"), last.strftime("%Y-%m-%d %H:%M:%S"),))
+        headers = [x[0] for x in self.cur.description]
+        result = [dict(zip(headers, row)) for row in self.cur]
+        self.close_connection()
+        return result
+
+    def get_last_rollup(self):
+        """
+        This method returns the latest slot rolled up into historical_buffer_rollup, None when nothing has been rolled up.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT MAX(SlotStart) FROM historical_buffer_rollup;")
+        result = self.cur.fetchone()[0]
+        self.close_connection()
+        return result
+
+    def insert_buffer_rollup(self, rows):
+        """
+        This method stores slot aggregates of historical_buffer in one batch, replacing any already stored for the same site and slot.
+
+        Paramaters
+        ----------
+        rows
+            Array of (SiteID, SlotStart, Samples, PumpedFlow, Level, MinLevel, MaxLevel) tuples
+        """
+        self.open_connection()
+        self.cur.executemany("REPLACE INTO historical_buffer_rollup (SiteID, SlotStart, Samples, PumpedFlow, `Level`, MinLevel, MaxLevel) VALUES (?, ?, ?, ?, ?, ?, ?);", rows)
+        self.connection.commit()
+        self.close_connection()
+
+    def get_site_ids(self):
+        """
+        This method returns the ID of every site.
+        """
+        self.open_connection()
+        self.cur.execute("SELECT ID FROM site ORDER BY ID;")
+        result = [int(row[0]) for row in self.cur]
+        self.close_connection()
+        return result
+
+    def get_table(self, table):
+        """
+        This method returns every row of one of the tables AECFleet derives synthetic sites from.
+
+        Parameters
+        ----------
+        table
+            String -> site, pump, tariff_type, tariff, cost_type, cost or historical
+
+        Returns
+        ----------
+        Array
+            Rows ordered by ID.
+        """
+        if table not in ["site", "pump", "tariff_type", "tariff", "cost_type", "cost", "historical"]:
+            raise ValueError("Table %s is not a fleet table" % table)
+        self.open_connection()
+        self.cur.execute("SELECT * FROM `%s` ORDER BY ID;" % table)
+        headers = [x[0] for x in self.cur.description]
+        result = [dict(zip(headers, row)) for row in self.cur]
+        self.close_connection()
+        return result
+
+    def insert_rows(self, table, columns, rows):
+        """
+        This method stores rows generated by AECFleet in one batch.
+
+        Paramaters
+        ----------
+        table
+            String -> site, pump, tariff_type, tariff, cost_type, cost or historical
+        columns
+            Array of column names
+        rows
+            Array of tuples in the order of columns
+        """
+        if table not in ["site", "pump", "tariff_type", "tariff", "cost_type", "cost", "historical"] or not all(re.fullmatch(r"\w+", column) for column in columns):
+            raise ValueError("Cannot insert into %s" % table)
+        self.open_connection()
+        self.cur.executemany("INSERT INTO `%s` (%s) VALUES (%s);" % (table, ", ".join("`%s`" % column for column in columns), ", ".join("?" for column in columns)), rows)
+        self.connection.commit()
+        self.close_connection()
+
     def get_historical_for_target(self, date):
         """
         This method returns the stored procedure getHistoricalForTarget.
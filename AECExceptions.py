@@ -21,3 +21,28 @@ class TargetNotSatisfiedError(Exception):
     This exception will be raised when the pumped volume has not reached the target volume.
     """
     pass
+
+class NetworkConfigurationError(Exception):
+    """
+    This exception will be raised when the site network configuration cannot be optimised as a single model.
+    """
+    pass
+
+class RegimeInfeasibleError(Exception):
+    """
+    This exception will be raised when no regime meets the pump running or supply limits of the site, even with the level band and target relaxed.
+    """
+    pass
+
+class SiteBusyError(Exception):
+    """
+    This exception will be raised when another process holds the site's lock for longer than the run is willing to wait.
+    """
+    pass
+
+class RecalculationNotRequired(SystemExit):
+    """
+    This exception will be raised when the plan keeps the level within the band for the rest of the day. It exits a command line run with status 0,
+    callers that run several sites catch it to tell it apart from other exits.
+    """
+    pass
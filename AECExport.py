@@ -0,0 +1,219 @@
+import datetime, json, os, sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+from AECDatabase import AECDatabase
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+class AECExport(AECDatabase):
+    """
+    This class exports the historical, historical_buffer, regime and target tables into Parquet files partitioned by site and month,
+    laid out as <root>/<table>/site_id=<site>/month=<YYYY-MM>/part-<first ID>-<last ID>.parquet.
+    Each export appends new part files for the rows added since the last export, the highest exported ID per table and site is kept in <root>/watermarks.json.
+    Rows updated in place after they were exported (regime and target) are not exported again, the plan history is kept in regime_version.
+    """
+    TABLES = ["historical", "historical_buffer", "regime", "target"]
+    """Tables that are exported"""
+    TIME_COLUMNS = ["Created", "Updated", "PlanDate"]
+    """Columns stored as timestamps"""
+    TEXT_COLUMNS = ["PeriodName"]
+    """Columns stored as strings, every other column is stored as a float"""
+    BATCH_SIZE = int(os.environ.get("AEC_EXPORT_BATCH", 50000))
+    """Number of rows read from the database per query"""
+
+    def __init__(self, root, connect=True):
+        """
+        This method sets up the export directory and, when connect is set, the database connection from the environment.
+
+        Parameters
+        ----------
+        root
+            String -> export directory
+        connect
+            Boolean -> False to only read existing exports
+        """
+        self.root = root
+        if connect:
+            self.setup_connection(os.environ['DB_USER'], os.environ['DB_PASS'], os.environ['DB_HOST'], int(os.environ['DB_PORT']), os.environ['DB_NAME'])
+
+    def load_watermarks(self):
+        """
+        This method returns the highest exported ID for each table and site, keyed "<table>/<site>".
+        """
+        path = os.path.join(self.root, "watermarks.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_watermarks(self, watermarks):
+        """
+        This method replaces the watermark file, writing to a temporary file first so an interrupted export never leaves it half written.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, "watermarks.json")
+        with open(path+".tmp", "w") as f:
+            json.dump(watermarks, f)
+        os.replace(path+".tmp", path)
+
+    def to_frame(self, headers, rows):
+        """
+        This method converts a batch of database rows into a DataFrame with a fixed type per column, so every part file of a table shares one schema.
+
+        Parameters
+        ----------
+        headers
+            Array of column names
+        rows
+            Array of rows
+
+        Returns
+        ----------
+        DataFrame
+            Rows without SiteID, which is stored in the partition path, and with a month column.
+        """
+        df = pd.DataFrame(rows, columns=headers).drop(columns=["SiteID"])
+        for column in df.columns:
+            if column in self.TIME_COLUMNS:
+                df[column] = pd.to_datetime(df[column]).astype("datetime64[ms]")
+            elif column in self.TEXT_COLUMNS:
+                df[column] = df[column].astype("string")
+            elif column == "ID":
+                df[column] = df[column].astype("int64")
+            else:
+                df[column] = pd.to_numeric(df[column]).astype("float64")
+        df["month"] = df["Created"].dt.strftime("%Y-%m").fillna("none")
+        return df
+
+    def export_table(self, site_id, table, watermarks):
+        """
+        This method appends the rows added to a table since the last export for one site.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+        table
+            String -> one of TABLES
+        watermarks
+            Dictionary -> highest exported IDs, updated and saved after every batch
+
+        Returns
+        ----------
+        Integer
+            Number of rows exported.
+        """
+        self.site_id = site_id
+        key = "%s/%s" % (table, site_id)
+        exported = 0
+        while True:
+            headers, rows = self.get_rows_after(table, watermarks.get(key, 0), self.BATCH_SIZE)
+            if len(rows) == 0:
+                return exported
+            df = self.to_frame(headers, rows)
+            for month, part in df.groupby("month"):
+                path = os.path.join(self.root, table, "site_id=%s" % site_id, "month=%s" % month)
+                os.makedirs(path, exist_ok=True)
+                name = "part-%012d-%012d.parquet" % (part["ID"].iloc[0], part["ID"].iloc[-1])
+                pq.write_table(pa.Table.from_pandas(part.drop(columns=["month"]), preserve_index=False), os.path.join(path, name))
+            watermarks[key] = int(df["ID"].iloc[-1])
+            self.save_watermarks(watermarks)
+            exported += len(rows)
+
+    def export_site(self, site_id):
+        """
+        This method exports every table for one site.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+
+        Returns
+        ----------
+        Dictionary
+            Number of rows exported per table.
+        """
+        watermarks = self.load_watermarks()
+        return {table: self.export_table(site_id, table, watermarks) for table in self.TABLES}
+
+    def dataset(self, table):
+        """
+        This method opens the exported files of a table as a dataset. Files are memory mapped, so reads take their columns straight from the page cache without copying.
+
+        Parameters
+        ----------
+        table
+            String -> one of TABLES
+
+        Returns
+        ----------
+        Dataset
+            With site_id and month partition columns.
+        """
+        partitioning = ds.partitioning(pa.schema([("site_id", pa.int32()), ("month", pa.string())]), flavor="hive")
+        return ds.dataset(os.path.join(self.root, table), format="parquet", partitioning=partitioning, filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    def read(self, table, site_id, months=None, columns=None):
+        """
+        This method reads the exported rows for one site, only opening the partitions for the given months.
+
+        Parameters
+        ----------
+        table
+            String -> one of TABLES
+        site_id
+            Integer
+        months
+            Array of "YYYY-MM" strings, None for every month
+        columns
+            Array of column names, None for every column
+
+        Returns
+        ----------
+        DataFrame
+            Rows ordered by ID.
+        """
+        if not os.path.isdir(os.path.join(self.root, table)):
+            return pd.DataFrame(columns=columns or [])
+        condition = ds.field("site_id") == site_id
+        if months is not None:
+            condition = condition & ds.field("month").isin(list(months))
+        df = self.dataset(table).to_table(columns=columns, filter=condition).to_pandas()
+        return df.sort_values("ID").reset_index(drop=True) if "ID" in df.columns else df
+
+    def historical_profile(self, site_id, today=None):
+        """
+        This method returns the same daily demand profile as AECDatabase.get_historical from the exported historical data:
+        the average outlet flow for each half hour on the same weekday one, two and three weeks ago.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+        today
+            DateTime -> day of the profile, defaults to today
+
+        Returns
+        ----------
+        Array
+            Rows with Time and Outlet, as strings, in time order.
+        """
+        today = (today or datetime.datetime.today()).date()
+        days = [today - datetime.timedelta(weeks=week) for week in [1, 2, 3]]
+        df = self.read("historical", site_id, sorted(set(day.strftime("%Y-%m") for day in days)), ["ID", "Outlet", "Created"])
+        if len(df) == 0:
+            return []
+        df = df[df["Created"].dt.date.isin(days)]
+        grouped = df.groupby([df["Created"].dt.hour, df["Created"].dt.minute], sort=True)
+        profile = grouped.agg(Time=("Created", "first"), Outlet=("Outlet", "mean"))
+        return [{"Time": row.Time.strftime("%H:%M:%S"), "Outlet": str(row.Outlet)} for row in profile.itertuples()]
+
+# Command line arguments: export directory followed by the sites to export
+if __name__ == "__main__":
+    export = AECExport(sys.argv[1])
+    for site_id in sys.argv[2:]:
+        print(json.dumps({"SiteID": int(site_id), "Rows": export.export_site(int(site_id))}))
@@ -0,0 +1,147 @@
+import datetime, json, os, sys
+import numpy as np
+import pandas as pd
+from AECSQLiteDatabase import AECSQLiteDatabase
+
+class AECFleet:
+    """
+    This class generates synthetic sites from the sites already in the database, so AEC can be benchmarked at fleet scale.
+    Each synthetic site copies a template site that has pumps and historical demand and is then varied statistically:
+    its pump flows, energy and demand are scaled together by a log-normal size factor so the pumps can still meet the demand,
+    its surface area by another log-normal factor and its level band shifted, and it gets its own tariff and cost types with the template's periods and jittered prices.
+    Historical demand is drawn per day and slot from the template's mean and spread for that slot on weekdays or at weekends, scaled by a log-normal day factor.
+    """
+    SIZE_SIGMA = float(os.environ.get('AEC_FLEET_SIZE_SIGMA', 0.25))
+    """Standard deviation of the log of the pump and demand size factor"""
+    AREA_SIGMA = float(os.environ.get('AEC_FLEET_AREA_SIGMA', 0.3))
+    """Standard deviation of the log of the surface area factor"""
+    PRICE_SIGMA = float(os.environ.get('AEC_FLEET_PRICE_SIGMA', 0.1))
+    """Standard deviation of the log of the price factor of each band"""
+    SLOTS = 48
+    """Half hour slots in a day"""
+
+    def __init__(self, storage, seed=0):
+        """
+        Parameters
+        ----------
+        storage
+            AECStorage -> database the templates are read from and the synthetic sites written to
+        seed
+            Integer -> seed of the random generator, the same seed and database give the same fleet
+        """
+        self.storage = storage
+        self.random = np.random.default_rng(seed)
+        self.tables = {table: storage.get_table(table) for table in ["site", "pump", "tariff_type", "tariff", "cost_type", "cost"]}
+        self.templates = self.demand_profiles(pd.DataFrame(storage.get_table("historical")))
+
+    def demand_profiles(self, historical):
+        """
+        This method derives the demand statistics of every site that has pumps and historical demand.
+
+        Parameters
+        ----------
+        historical
+            DataFrame -> historical rows
+
+        Returns
+        ----------
+        Dictionary
+            Per site ID the mean and standard deviation of the outlet in each slot (2 x 48, weekdays then weekends) and the standard deviation of the log of the daily mean.
+        """
+        pumped = {int(pump["SiteID"]) for pump in self.tables["pump"]}
+        historical = historical[historical["SiteID"].isin(pumped)].copy()
+        created = pd.to_datetime(historical["Created"])
+        historical["Date"] = created.dt.date
+        historical["Slot"] = created.dt.hour*2+created.dt.minute//30
+        historical["Weekend"] = (created.dt.weekday >= 5).astype(int)
+        historical["Outlet"] = historical["Outlet"].astype(float)
+        profiles = {}
+        for site_id, rows in historical.groupby("SiteID"):
+            slots = rows.groupby(["Weekend", "Slot"])["Outlet"].agg(["mean", "std"]).reindex(pd.MultiIndex.from_product([[0, 1], range(self.SLOTS)]))
+            # Slots never recorded take the site's mean
+            mean = slots["mean"].fillna(rows["Outlet"].mean()).values.reshape(2, self.SLOTS)
+            std = slots["std"].fillna(0).values.reshape(2, self.SLOTS)
+            daily = rows.groupby("Date")["Outlet"].mean()
+            profiles[int(site_id)] = {"Mean": mean, "Std": std, "DaySigma": float(np.std(np.log(daily[daily > 0]))) if (daily > 0).sum() > 1 else 0.0}
+        return profiles
+
+    def next_id(self, table):
+        return max([int(row["ID"]) for row in self.tables[table]] or [0])+1
+
+    def generate(self, sites, days, today=None):
+        """
+        This method writes synthetic sites with their pumps, tariff, costs and historical demand.
+
+        Parameters
+        ----------
+        sites
+            Integer -> number of sites
+        days
+            Integer -> days of historical demand before today
+        today
+            Date -> defaults to today
+
+        Returns
+        ----------
+        Dictionary
+            IDs of the sites generated and the number of rows written to each table.
+        """
+        today = today or datetime.date.today()
+        templates = sorted(self.templates)
+        site_id, pump_id, tariff_type, tariff_id, cost_type, cost_id = [self.next_id(table) for table in ["site", "pump", "tariff_type", "tariff", "cost_type", "cost"]]
+        rows = {table: [] for table in ["site", "pump", "tariff_type", "tariff", "cost_type", "cost", "historical"]}
+        site_ids = []
+        first = datetime.datetime.combine(today-datetime.timedelta(days=days), datetime.time())
+        slot_starts = pd.date_range(first, periods=days*self.SLOTS, freq="30min")
+        weekend = (np.asarray(slot_starts.weekday) >= 5).astype(int).reshape(days, self.SLOTS)
+        slot = np.tile(np.arange(self.SLOTS), (days, 1))
+        for i in range(sites):
+            template_id = templates[i % len(templates)]
+            template = next(site for site in self.tables["site"] if int(site["ID"]) == template_id)
+            size = float(self.random.lognormal(0, self.SIZE_SIGMA))
+            shift = float(self.random.uniform(-0.5, 0.5))
+            site = {key: value for key, value in template.items() if key not in ("ID", "Created", "Updated")}
+            site.update({"ID": site_id, "Name": "Fleet %d" % site_id, "CarID": None, "TariffType": tariff_type, "CostType": cost_type,
+                "MinLevel": float(template["MinLevel"])+shift, "MaxLevel": float(template["MaxLevel"])+shift, "Setpoint": float(template["Setpoint"])+shift,
+                "SurfaceArea": float(template["SurfaceArea"])*float(self.random.lognormal(0, self.AREA_SIGMA))})
+            rows["site"].append(site)
+
+            for pump in [pump for pump in self.tables["pump"] if int(pump["SiteID"]) == template_id]:
+                rows["pump"].append({"ID": pump_id, "SiteID": site_id, "Combination": pump["Combination"], "Speed": pump["Speed"],
+                    "Flow": float(pump["Flow"])*size, "Energy": float(pump["Energy"])*size, "SuctionPressure": pump["SuctionPressure"]})
+                pump_id += 1
+
+            rows["tariff_type"].append({"ID": tariff_type, "Name": "Fleet %d" % site_id})
+            for period in [period for period in self.tables["tariff"] if int(period["TypeID"]) == int(template["TariffType"])]:
+                rows["tariff"].append({"ID": tariff_id, "TypeID": tariff_type, "Length": period["Length"], "Weekday": period["Weekday"], "Weekend": period["Weekend"]})
+                tariff_id += 1
+
+            rows["cost_type"].append({"ID": cost_type, "Name": "Fleet %d" % site_id})
+            prices = self.random.lognormal(0, self.PRICE_SIGMA, 4)
+            for cost in [cost for cost in self.tables["cost"] if int(cost["CostID"]) == int(template["CostType"])]:
+                rows["cost"].append({"ID": cost_id, "CostID": cost_type, "Month": cost["Month"],
+                    **{band: round(float(cost[band])*price, 4) for band, price in zip(["Day", "Peak", "Evening", "Night"], prices)}})
+                cost_id += 1
+
+            profile = self.templates[template_id]
+            day_factor = self.random.lognormal(0, profile["DaySigma"], (days, 1))
+            outlet = np.maximum(profile["Mean"][weekend, slot]+profile["Std"][weekend, slot]*self.random.standard_normal((days, self.SLOTS)), 0)*day_factor*size
+            rows["historical"].extend(zip([site_id]*outlet.size, outlet.ravel().round(3).tolist(), slot_starts.strftime("%Y-%m-%d %H:%M:%S")))
+
+            site_ids.append(site_id)
+            site_id, tariff_type, cost_type = site_id+1, tariff_type+1, cost_type+1
+
+        # Parents first, so the foreign keys of MariaDB are satisfied
+        for table in ["tariff_type", "cost_type", "site", "pump", "tariff", "cost"]:
+            columns = list(rows[table][0]) if len(rows[table]) else []
+            self.storage.insert_rows(table, columns, [tuple(row[column] for column in columns) for row in rows[table]])
+        for batch in range(0, len(rows["historical"]), 100000):
+            self.storage.insert_rows("historical", ["SiteID", "Outlet", "Created"], rows["historical"][batch:batch+100000])
+        return {"Sites": site_ids, "Rows": {table: len(table_rows) for table, table_rows in rows.items()}}
+
+# Command line arguments: SQLITE_FILE SITES [DAYS] [SEED], the file is created from the aec.sql dump when it does not exist
+if __name__ == "__main__":
+    storage = AECSQLiteDatabase(sys.argv[1])
+    fleet = AECFleet(storage, int(sys.argv[4]) if len(sys.argv) > 4 else 0)
+    result = fleet.generate(int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 56)
+    print(json.dumps({"First": result["Sites"][0], "Last": result["Sites"][-1], "Rows": result["Rows"]}))
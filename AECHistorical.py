@@ -1,6 +1,8 @@
 from AECDatabase import AECDatabase
+from AECResampler import AECResampler
+from AECSampleWriter import AECSampleWriter
 from dotenv import dotenv_values
-import sys, os
+import datetime, json, sys, os
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
@@ -21,41 +23,34 @@ class AECHistorical(AECDatabase):
         self.calculate_historical()
         self.insert_suction_pressure(self.suction_pressure)
 
-    def calculate_historical(self):
-        buffer_data = self.last_historical_buffer()
-
-        # Check if this is the first time we are running this
-        if(len(buffer_data) == 0):
-            # If so insert the data and return
-            self.insert_buffer(self.pumped_flow, self.current_level)
-            return
-
-        # If not, calculate the historical
-        start_level = float(buffer_data[0]["Level"])
-        sample_level = self.current_level
-        sample_flow = self.pumped_flow
-
-        hourly_pumped = sample_flow * 1800
-        diff = sample_level - start_level
-        net_gain = diff*self.site_data["SurfaceArea"]
-        diff_litres = abs(net_gain*1000)
-
-        # Calculate the historical
-        outlet = 0
-        if(diff_litres >= 0):
-            outlet = hourly_pumped-abs(diff_litres)
-        else: 
-            outlet = hourly_pumped+diff_litres
-
-        outlet = abs(outlet / 1800)
-        
-        # Don't let the output go below 0
-        if(outlet < 0):
-            outlet = 0
-            
-        # Insert the data
-        self.insert_buffer(sample_flow, sample_level)
-        self.insert_historical(outlet)
-        return
-
-AECHistorical()
\ No newline at end of file
+    def calculate_historical(self, created=None):
+        """
+        This method adds the sample to the site's resampler and stores the average outlet flow of every slot the sample completes (see AECResampler.BIN_SECONDS), timestamped at the start of the slot.
+        The resampler state is saved between runs, so samples arriving at any interval give one historical row per slot.
+
+        Parameters
+        ----------
+        created
+            DateTime -> time the sample was taken, defaults to now
+        """
+        resampler = AECResampler(self.site_data["SurfaceArea"], self.get_historical_state())
+        for slot_start, outlet in resampler.add(created or datetime.datetime.now(), self.current_level, self.pumped_flow):
+            self.insert_historical(outlet, slot_start)
+        self.save_historical_state(resampler.state)
+        self.insert_buffer(self.pumped_flow, self.current_level)
+
+# Command line arguments: SITE LEVEL PUMPED_FLOW SUCTION_PRESSURE, or --stream to keep running and read one "SITE LEVEL PUMPED_FLOW SUCTION_PRESSURE" line per sample from standard input,
+# stored in batches through AECSampleWriter until the input ends
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--stream"]:
+        db = AECDatabase()
+        db.setup_connection(os.environ['DB_USER'], os.environ['DB_PASS'], os.environ['DB_HOST'], int(os.environ['DB_PORT']), os.environ['DB_NAME'])
+        writer = AECSampleWriter(db)
+        for line in sys.stdin:
+            if line.strip():
+                site_id, current_level, pumped_flow, suction_pressure = line.split()
+                writer.add(int(site_id), float(current_level), float(pumped_flow), float(suction_pressure))
+        writer.close()
+        print(json.dumps(writer.metrics()))
+    else:
+        AECHistorical()
\ No newline at end of file
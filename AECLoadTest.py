@@ -0,0 +1,205 @@
+import datetime, json, os, resource, sys, tempfile, time
+import numpy as np
+from AEC import AEC
+from AECFleet import AECFleet
+from AECHistorical import AECHistorical
+from AECSampleWriter import AECSampleWriter
+from AECSQLiteDatabase import AECSQLiteDatabase
+
+class FleetAEC(AECSQLiteDatabase, AEC):
+    """
+    This class runs AEC for a synthetic site against the embedded database of a load test, counting the queries it makes.
+    """
+    def __init__(self, storage, current_level, site_id, pump_combo):
+        self.share(storage)
+        AEC.__init__(self, current_level, site_id, pump_combo, False, run=False, now=storage.clock())
+
+    def translate(self, sql, params):
+        AECLoadTest.queries += 1
+        return AECSQLiteDatabase.translate(self, sql, params)
+
+class FleetHistorical(AECSQLiteDatabase, AECHistorical):
+    """
+    This class ingests one level and pumped flow sample for a synthetic site, as AECHistorical.py does, counting the queries it makes.
+    """
+    def __init__(self, storage, site_id, current_level, pumped_flow, created):
+        self.share(storage)
+        self.site_id = site_id
+        self.site_data = self.get_site_data()
+        self.current_level = current_level
+        self.pumped_flow = pumped_flow
+        self.calculate_historical(created)
+
+    def translate(self, sql, params):
+        AECLoadTest.queries += 1
+        return AECSQLiteDatabase.translate(self, sql, params)
+
+class FleetStorage(AECSQLiteDatabase):
+    """
+    This class is the embedded database of a load test as AECSampleWriter uses it, counting the queries it makes.
+    """
+    def __init__(self, storage):
+        self.share(storage)
+
+    def translate(self, sql, params):
+        AECLoadTest.queries += 1
+        return AECSQLiteDatabase.translate(self, sql, params)
+
+class AECLoadTest:
+    """
+    This class is a repeatable capacity benchmark. It generates a synthetic fleet with AECFleet in an embedded AECSQLiteDatabase,
+    then computes the regime of every site at midnight and ingests SAMPLES level and pumped flow samples per site, one AECHistorical run per sample,
+    and SAMPLES more through an AECSampleWriter, reporting the throughput, p50, p95 and p99 latency and query count of each and the peak resident memory of the process.
+    """
+    SAMPLES = int(os.environ.get('AEC_LOADTEST_SAMPLES', 8))
+    """Samples ingested per site, one every SAMPLE_MINUTES"""
+    SAMPLE_MINUTES = int(os.environ.get('AEC_LOADTEST_SAMPLE_MINUTES', 15))
+    """Minutes between ingested samples"""
+    queries = 0
+    """Queries made by the runs being measured"""
+
+    def __init__(self, sites, days=56, seed=0, path=":memory:"):
+        """
+        Parameters
+        ----------
+        sites
+            Integer -> synthetic sites to generate
+        days
+            Integer -> days of historical demand per site
+        seed
+            Integer -> seed of the generator
+        path
+            String -> SQLite file, ":memory:" to keep the database in memory
+        """
+        self.sites = sites
+        self.days = days
+        self.seed = seed
+        self.today = datetime.date.today()
+        midnight = datetime.datetime.combine(self.today, datetime.time())
+        self.storage = AECSQLiteDatabase(path, clock=lambda: midnight)
+
+    @staticmethod
+    def summary(seconds, queries, statuses):
+        """
+        This method summarises the timings of one phase.
+
+        Parameters
+        ----------
+        seconds
+            Array -> duration of each run
+        queries
+            Integer -> queries made by the runs
+        statuses
+            Dictionary -> number of runs ending in each status
+
+        Returns
+        ----------
+        Dictionary
+        """
+        seconds = np.array(seconds)
+        return {
+            "Runs": len(seconds),
+            "Statuses": statuses,
+            "Seconds": float(seconds.sum()),
+            "PerSecond": float(len(seconds)/seconds.sum()) if seconds.sum() > 0 else None,
+            "P50": float(np.percentile(seconds, 50)),
+            "P95": float(np.percentile(seconds, 95)),
+            "P99": float(np.percentile(seconds, 99)),
+            "Queries": queries,
+            "QueriesPerRun": queries/len(seconds),
+        }
+
+    def run_regimes(self, site_ids):
+        """
+        This method computes the regime of every site at midnight, starting each at its setpoint.
+        """
+        seconds, statuses = [], {}
+        AECLoadTest.queries = 0
+        for site_id in site_ids:
+            self.storage.site_id = site_id
+            setpoint = float(self.storage.get_site_data()["Setpoint"])
+            start = time.perf_counter()
+            try:
+                FleetAEC(self.storage, setpoint, site_id, 1.0).get_regime()
+                status = "Planned"
+            except SystemExit:
+                status = "Not required"
+            except Exception as e:
+                status = type(e).__name__
+            seconds.append(time.perf_counter()-start)
+            statuses[status] = statuses.get(status, 0)+1
+        return self.summary(seconds, AECLoadTest.queries, statuses)
+
+    def run_ingest(self, site_ids):
+        """
+        This method ingests SAMPLES samples for every site, site by site within each sample time as the Node-RED flows deliver them.
+        """
+        seconds, statuses = [], {}
+        AECLoadTest.queries = 0
+        midnight = datetime.datetime.combine(self.today, datetime.time())
+        for sample in range(self.SAMPLES):
+            created = midnight+datetime.timedelta(minutes=sample*self.SAMPLE_MINUTES)
+            self.storage.clock = lambda: created
+            for site_id in site_ids:
+                start = time.perf_counter()
+                try:
+                    FleetHistorical(self.storage, site_id, 2.5, 10.0, created)
+                    status = "Stored"
+                except Exception as e:
+                    status = type(e).__name__
+                seconds.append(time.perf_counter()-start)
+                statuses[status] = statuses.get(status, 0)+1
+        self.storage.clock = lambda: midnight
+        return self.summary(seconds, AECLoadTest.queries, statuses)
+
+    def run_write_behind(self, site_ids):
+        """
+        This method ingests the SAMPLES samples after those of run_ingest for every site through an AECSampleWriter, timing each add and then the final flush.
+        """
+        seconds = []
+        AECLoadTest.queries = 0
+        midnight = datetime.datetime.combine(self.today, datetime.time())
+        with tempfile.TemporaryDirectory() as directory:
+            writer = AECSampleWriter(FleetStorage(self.storage), os.path.join(directory, "samples.spool"))
+            for sample in range(self.SAMPLES, 2*self.SAMPLES):
+                created = midnight+datetime.timedelta(minutes=sample*self.SAMPLE_MINUTES)
+                for site_id in site_ids:
+                    start = time.perf_counter()
+                    writer.add(site_id, 2.5, 10.0, None, created)
+                    seconds.append(time.perf_counter()-start)
+            start = time.perf_counter()
+            writer.close()
+            close_seconds = time.perf_counter()-start
+        summary = self.summary(seconds, AECLoadTest.queries, {"Queued": len(seconds)})
+        summary.update({"CloseSeconds": close_seconds, "Writer": writer.metrics()})
+        return summary
+
+    def run(self):
+        """
+        This method runs the whole benchmark.
+
+        Returns
+        ----------
+        Dictionary
+            Generation time and rows, the regime and ingest summaries and the peak resident memory in MB.
+        """
+        start = time.perf_counter()
+        fleet = AECFleet(self.storage, self.seed).generate(self.sites, self.days, self.today)
+        generated = time.perf_counter()-start
+        return {
+            "Sites": self.sites,
+            "Days": self.days,
+            "Generate": {"Seconds": generated, "Rows": fleet["Rows"]},
+            "Regime": self.run_regimes(fleet["Sites"]),
+            "Ingest": self.run_ingest(fleet["Sites"]),
+            "IngestWriteBehind": self.run_write_behind(fleet["Sites"]),
+            # ru_maxrss is in kilobytes on Linux
+            "PeakMemoryMB": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024,
+        }
+
+# Command line arguments: [SITES] [DAYS] [SEED], 500 sites with 56 days of demand by default
+if __name__ == "__main__":
+    sites = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 56
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(json.dumps(AECLoadTest(sites, days, seed).run()))
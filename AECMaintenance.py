@@ -0,0 +1,145 @@
+import datetime, json, os, sys
+import pandas as pd
+from AECDatabase import AECDatabase
+from AECExport import AECExport
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+class AECMaintenance:
+    """
+    This class is the daily maintenance job for the historical and historical_buffer tables, which are partitioned by month.
+    It keeps the partitions for the coming months ready, rolls raw historical_buffer samples older than BUFFER_DAYS up into half hour aggregates in historical_buffer_rollup,
+    and drops a partition once every row in it has expired: historical_buffer after BUFFER_DAYS and historical after HISTORICAL_MONTHS.
+    Expired rows can be archived to Parquet with AECExport before they are dropped. Storage without partitions, such as AECSQLiteDatabase, has expired rows deleted instead.
+    """
+    BUFFER_DAYS = int(os.environ.get('AEC_BUFFER_DAYS', 35))
+    """Days raw historical_buffer samples are kept before they are only available rolled up"""
+    HISTORICAL_MONTHS = int(os.environ.get('AEC_HISTORICAL_MONTHS', 13))
+    """Whole months of historical kept before the current one"""
+    PARTITIONS_AHEAD = int(os.environ.get('AEC_PARTITIONS_AHEAD', 3))
+    """Monthly partitions created ahead of the current month"""
+    SLOT_SECONDS = 1800
+    """Length of a rolled up slot"""
+
+    def __init__(self, storage, archive=None):
+        """
+        Parameters
+        ----------
+        storage
+            AECStorage
+        archive
+            AECExport -> export that expired rows are archived to before they are dropped, None to drop them without archiving
+        """
+        self.storage = storage
+        self.archive = archive
+
+    @staticmethod
+    def month_start(day, months=0):
+        """
+        This method returns the first day of the month a number of months after (or before, when negative) the month of day.
+        """
+        month = day.year*12+day.month-1+months
+        return datetime.date(month//12, month%12+1, 1)
+
+    def ensure_partitions(self, today):
+        """
+        This method adds the partitions from the current month to PARTITIONS_AHEAD months ahead that are missing.
+
+        Returns
+        ----------
+        Array
+            Table and name of each partition added.
+        """
+        added = []
+        for table in ["historical", "historical_buffer"]:
+            partitions = self.storage.get_partitions(table)
+            if len(partitions) == 0:
+                continue
+            latest = max([partition["Name"] for partition in partitions if partition["LessThan"] is not None] or [""])
+            for months in range(0, self.PARTITIONS_AHEAD+1):
+                name = self.month_start(today, months).strftime("p%Y%m")
+                # Partitions can only be split off pmax after the last bounded one
+                if name > latest:
+                    self.storage.add_partition(table, name, self.month_start(today, months+1))
+                    added.append([table, name])
+                    latest = name
+        return added
+
+    def rollup(self, cutoff):
+        """
+        This method aggregates every historical_buffer sample before the cutoff that is not yet rolled up into half hour slots per site.
+
+        Parameters
+        ----------
+        cutoff
+            DateTime -> midnight at the start of the first day kept raw
+
+        Returns
+        ----------
+        Integer
+            Number of slots stored.
+        """
+        last = self.storage.get_last_rollup()
+        first = datetime.datetime(2000, 1, 1) if last is None else pd.Timestamp(last).to_pydatetime()+datetime.timedelta(seconds=self.SLOT_SECONDS)
+        samples = pd.DataFrame(self.storage.get_buffer_samples(first, cutoff), columns=["SiteID", "PumpedFlow", "Level", "Created"])
+        if len(samples) == 0:
+            return 0
+        samples["Slot"] = pd.to_datetime(samples["Created"]).dt.floor("%ds" % self.SLOT_SECONDS)
+        slots = samples.groupby(["SiteID", "Slot"]).agg(Samples=("Level", "size"), PumpedFlow=("PumpedFlow", "mean"), Level=("Level", "mean"), MinLevel=("Level", "min"), MaxLevel=("Level", "max"))
+        rows = [(int(site_id), slot.strftime("%Y-%m-%d %H:%M:%S"), int(row.Samples), float(row.PumpedFlow), float(row.Level), float(row.MinLevel), float(row.MaxLevel)) for (site_id, slot), row in zip(slots.index, slots.itertuples())]
+        self.storage.insert_buffer_rollup(rows)
+        return len(rows)
+
+    def expire(self, table, before):
+        """
+        This method removes the rows of a table created before a time, dropping each partition that lies wholly before it.
+        The rows of a partition that still holds newer rows are kept until the whole partition has expired.
+
+        Returns
+        ----------
+        Array
+            Names of the partitions dropped, or "rows" when the rows were deleted.
+        """
+        partitions = self.storage.get_partitions(table)
+        if len(partitions) == 0:
+            self.storage.delete_rows_before(table, before)
+            return ["rows"]
+        expired = [partition["Name"] for partition in partitions if partition["LessThan"] is not None and partition["LessThan"] <= before.timestamp()]
+        if len(expired) and self.archive is not None:
+            for site_id in self.storage.get_site_ids():
+                self.archive.export_site(site_id)
+        for name in expired:
+            self.storage.drop_partition(table, name)
+        return expired
+
+    def run(self, today=None):
+        """
+        This method runs the whole job.
+
+        Parameters
+        ----------
+        today
+            Date -> defaults to today
+
+        Returns
+        ----------
+        Dictionary
+            Partitions added, slots rolled up and what expired from each table.
+        """
+        today = today or datetime.date.today()
+        cutoff = datetime.datetime.combine(today-datetime.timedelta(days=self.BUFFER_DAYS), datetime.time())
+        added = self.ensure_partitions(today)
+        rolled_up = self.rollup(cutoff)
+        return {
+            "Added": added,
+            "RolledUp": rolled_up,
+            "BufferExpired": self.expire("historical_buffer", cutoff),
+            "HistoricalExpired": self.expire("historical", datetime.datetime.combine(self.month_start(today, -self.HISTORICAL_MONTHS), datetime.time())),
+        }
+
+# Command line arguments: [ARCHIVE_DIR], expired rows are exported there with AECExport before they are dropped
+if __name__ == "__main__":
+    db = AECDatabase()
+    db.setup_connection(os.environ['DB_USER'], os.environ['DB_PASS'], os.environ['DB_HOST'], int(os.environ['DB_PORT']), os.environ['DB_NAME'])
+    archive = AECExport(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(json.dumps(AECMaintenance(db, archive).run()))
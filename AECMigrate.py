@@ -0,0 +1,38 @@
+import json, os
+from AECDatabase import AECDatabase
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+class AECMigrate:
+    """
+    This class upgrades a database created before plan versions. It adds the PlanDate and Version columns of regime and the regime_version tables,
+    then dates the existing regime rows and seeds version 1 of their plans, so get_regime_data and getRegimeYesterday, which read by PlanDate, still find them.
+    Running it again changes nothing.
+    """
+
+    def __init__(self, storage):
+        """
+        Parameters
+        ----------
+        storage
+            AECStorage
+        """
+        self.storage = storage
+
+    def run(self):
+        """
+        This method runs the upgrade.
+
+        Returns
+        ----------
+        Dictionary
+            Regime rows dated and plans seeded.
+        """
+        self.storage.add_plan_columns()
+        return self.storage.backfill_plan_versions()
+
+# Command line arguments: none, the database is taken from the environment
+if __name__ == "__main__":
+    db = AECDatabase()
+    db.setup_connection(os.environ['DB_USER'], os.environ['DB_PASS'], os.environ['DB_HOST'], int(os.environ['DB_PORT']), os.environ['DB_NAME'])
+    print(json.dumps(AECMigrate(db).run()))
@@ -0,0 +1,426 @@
+"""
+AEC Network
+
+Schedules several interconnected sites in one optimisation. Reservoirs can feed each other through transfer links and sites can share an electricity supply point
+with a kW cap and/or a maximum demand charge. The network is described by a JSON file:
+
+    {
+        "sites": {"11": {"combo": 1}, "13": {"combo": "all"}},
+        "transfers": [{"from": 11, "to": 13, "max_flow": 20.0}],
+        "supplies": [{"sites": [11, 13], "max_kw": 150.0, "demand_charge": 0.0}]
+    }
+
+Transfer flows are in litres/second and are held constant over each tariff period, so every site in a network must share the same tariff periods.
+Each site keeps the limits it has when planned alone: its combinations and switching, running limits and objective weights. When the level band or target cannot be met
+the network is solved again with the elastic level band and target. A site that does not need recalculating keeps its current plan, which is held fixed in the network.
+"""
+import argparse, json, math
+from concurrent.futures import ProcessPoolExecutor
+import cvxpy as cp
+import numpy as np
+from AEC import AEC
+from AECExceptions import NetworkConfigurationError
+
+def site_constraints(bundle, incoming, outgoing, elastic=False):
+    """
+    This function builds the regime model of one site from its plain optimiser inputs, with the transfer flows in and out of the reservoir added to the pump flow.
+    The constraints are those of `AEC.regime_problem`, built by the same helpers.
+
+    Parameters
+    ----------
+    bundle
+        Dictionary -> optimiser inputs of the site (see `AECNetwork.bundle`)
+    incoming
+        Array of CVXPY Expressions or Numpy Arrays -> transfer flow into the reservoir for each period
+    outgoing
+        Array of CVXPY Expressions or Numpy Arrays -> transfer flow out of the reservoir for each period
+    elastic
+        Boolean -> True to relax the level band and target, see `AEC.level_volume_constraints`
+
+    Returns
+    ----------
+    Tuple
+        Selection variable, energy per period expression, objective expression, list of constraints and the slack variables (None when not elastic).
+    """
+    selection = cp.Variable(shape=bundle["cost"].shape, boolean=True)
+    transfer = sum(incoming, np.zeros(len(bundle["hours"])))-sum(outgoing, np.zeros(len(bundle["hours"])))
+    pump_flow_ = cp.sum(cp.multiply(bundle["flow"], selection), axis=1)
+    input_flow_vector, res_level = AEC.level_model(pump_flow_+transfer, bundle["initial_level"], bundle["period_lengths"], bundle["out_flow"], bundle["surface_area"], bundle["sample_hours"])
+    volume_ = cp.sum(cp.multiply(bundle["volume"], selection))+cp.sum(cp.multiply(transfer, bundle["hours"]*3600))
+    band_constraints, penalty, slacks = AEC.band_constraints(res_level, volume_, bundle["target"], bundle["min_level"], bundle["max_level"], elastic)
+    constraints = [cp.sum(selection, axis=1) == 1]+band_constraints
+    if bundle["fixed"] is not None:
+        # The site keeps its current plan
+        constraints.append(selection == np.eye(bundle["cost"].shape[1])[bundle["fixed"]])
+    cost = cp.sum(cp.multiply(bundle["cost"], selection))
+    if bundle["combo"] is not None:
+        switch_constraints, switch_cost = AEC.switching_constraints(selection, bundle["combo"], **bundle["switching"])
+        constraints += switch_constraints
+        cost = cost+switch_cost
+    energy = cp.sum(cp.multiply(bundle["energy"], selection), axis=1)
+    demand_constraints, demand_cost = AEC.demand_constraints(energy, bundle["hours"], **bundle["demand"])
+    constraints += demand_constraints
+    cost = cost+demand_cost
+    constraints += AEC.start_constraints(selection @ (bundle["flow"][0] > 0).astype(float), pump_flow_, bundle["hours"], float(np.max(bundle["flow"])), **bundle["running"])
+    objective = bundle["weights"]["cost"]*cost+penalty
+    if bundle["weights"]["level"] > 0:
+        objective = objective+bundle["weights"]["level"]*cp.abs(res_level[-1]-bundle["setpoint"])
+    if bundle["weights"]["energy"] > 0:
+        objective = objective+bundle["weights"]["energy"]*cp.sum(cp.multiply(energy, bundle["hours"]))
+    return selection, energy, objective, constraints, slacks
+
+def solve_site(bundle, energy_price, transfer_prices, fixed_transfers=None):
+    """
+    This function solves the Lagrangian subproblem of one site. It is defined at module level so it can run in a worker process.
+
+    Parameters
+    ----------
+    bundle
+        Dictionary -> optimiser inputs of the site
+    energy_price
+        Numpy Array -> price on the site's energy in each period from the shared supply constraints
+    transfer_prices
+        Dictionary -> price per period for each transfer link the site is on
+    fixed_transfers
+        Dictionary -> transfer flow per period for each link, used instead of local transfer variables when given
+
+    Returns
+    ----------
+    Dictionary
+        Selection, energy and transfer values with the solver status and the constraints relaxed, the elastic problem being solved when the strict one has no solution.
+    """
+    periods = len(bundle["hours"])
+    for elastic in [False, True]:
+        transfers = {}
+        for link, max_flow in bundle["links"].items():
+            if fixed_transfers is not None:
+                transfers[link] = np.asarray(fixed_transfers[link])
+            else:
+                transfers[link] = cp.Variable(periods, nonneg=True)
+        incoming = [transfers[link] for link in bundle["incoming"]]
+        outgoing = [transfers[link] for link in bundle["outgoing"]]
+        selection, energy, cost, constraints, slacks = site_constraints(bundle, incoming, outgoing, elastic)
+        constraints += [transfers[link] <= max_flow for link, max_flow in bundle["links"].items() if fixed_transfers is None]
+
+        # Outgoing transfers are charged and incoming transfers credited at the link price
+        objective = cost+energy_price @ energy
+        for link in bundle["outgoing"]:
+            objective = objective+transfer_prices[link] @ transfers[link]
+        for link in bundle["incoming"]:
+            objective = objective-transfer_prices[link] @ transfers[link]
+        problem = cp.Problem(cp.Minimize(objective), constraints)
+        problem.solve(solver=cp.CPLEX, verbose=False)
+        if selection.value is not None:
+            break
+    if selection.value is None:
+        return {"status": problem.status, "selection": None, "energy": None, "transfers": {}, "relaxed": {}}
+    return {
+        "status": problem.status,
+        "selection": selection.value,
+        "energy": np.asarray(energy.value),
+        "transfers": {link: np.asarray(transfers[link].value if fixed_transfers is None else transfers[link]) for link in bundle["links"]},
+        "relaxed": AEC.slack_relaxation(slacks),
+    }
+
+class AECNetwork:
+    """
+    This class optimises the regimes of a network of sites together, either as one joint model or by Lagrangian decomposition across worker processes.
+    `run` plans the network while holding the lock of every site, see `AECCoordinator.run_group`.
+    """
+    def __init__(self, config, levels, debug=False, now=None):
+        """
+        This method loads every site in the network, its optimiser inputs are collected by `prepare`.
+
+        Parameters
+        ----------
+        config
+            Dictionary -> network configuration
+        levels
+            Dictionary -> current level of each site
+        debug
+            Boolean
+        now
+            DateTime -> time of the run, see `AEC`
+        """
+        self.config = config
+        self.debug = debug
+        self.links = config.get("transfers", [])
+        self.supplies = config.get("supplies", [])
+        self.sites = {}
+        self.inputs = {}
+        self.fixed = {}
+        for site_id, site in config["sites"].items():
+            site_id = int(site_id)
+            combo = site.get("combo", 1)
+            combo = None if combo == "all" else float(combo)
+            self.sites[site_id] = AEC(float(levels[site_id]), site_id, combo, debug, run=False, now=now)
+        self.validate()
+
+    @classmethod
+    def from_file(cls, path, levels, debug=False, now=None):
+        """
+        This method loads the network configuration from a JSON file.
+        """
+        with open(path) as f:
+            return cls(json.load(f), levels, debug, now)
+
+    def prepare(self):
+        """
+        This method sets the target of every site and collects its optimiser inputs, without writing anything. Except at midnight, a site whose plan keeps its level
+        within the band (see `AEC.recalculation_needed`) keeps the rest of its current plan: its selection is fixed to it and it has no target of its own.
+        """
+        for site_id, site in self.sites.items():
+            self.inputs[site_id] = site.plan_inputs()
+            self.fixed[site_id] = None
+            if not (site.hour == 0 and site.minute == 0) and not site.recalculation_needed():
+                self.fixed[site_id] = site.plan_assignments()
+        period_lengths = [tuple(inputs["period_lengths"]) for inputs in self.inputs.values()]
+        if len(set(period_lengths)) > 1:
+            raise NetworkConfigurationError("All sites in a network must share the same remaining tariff periods")
+
+    def validate(self):
+        """
+        This method checks that the transfers and supplies only reference sites in the network.
+        """
+        for link in self.links:
+            if int(link["from"]) not in self.sites or int(link["to"]) not in self.sites:
+                raise NetworkConfigurationError("Transfer %s -> %s references a site outside the network" % (link["from"], link["to"]))
+        for supply in self.supplies:
+            if any(int(site_id) not in self.sites for site_id in supply["sites"]):
+                raise NetworkConfigurationError("Supply %s references a site outside the network" % supply["sites"])
+
+    def bundle(self, site_id):
+        """
+        This method returns the plain optimiser inputs of a site, which can be sent to a worker process.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+
+        Returns
+        ----------
+        Dictionary
+            Candidate matrices, level model inputs, limits, supply, switching and running limits, objective weights, target, the current plan when it is kept
+            and the transfer links of the site.
+        """
+        site = self.sites[site_id]
+        inputs = self.inputs[site_id]
+        fixed = self.fixed[site_id]
+        return {
+            "cost": inputs["cost"],
+            "volume": inputs["volume"],
+            "flow": inputs["flow"],
+            "energy": inputs["energy"],
+            "hours": inputs["hours"],
+            "period_lengths": inputs["period_lengths"],
+            "out_flow": inputs["out_flow"],
+            "sample_hours": inputs["sample_hours"],
+            "min_level": site.min_level,
+            "max_level": site.max_level,
+            "initial_level": site.current_level,
+            "target": 0.0 if fixed is not None else site.target,
+            "surface_area": site.SURFACE_AREA,
+            "demand": site.demand_limits(),
+            "combo": inputs["combo"] if site.pump_combo is None else None,
+            "switching": site.switching_limits(),
+            "running": site.running_limits(),
+            "weights": site.objective_weights(),
+            "setpoint": float(site.site_data["Setpoint"]),
+            "fixed": fixed,
+            "links": {i: float(link["max_flow"]) for i, link in enumerate(self.links) if site_id in (int(link["from"]), int(link["to"]))},
+            "incoming": [i for i, link in enumerate(self.links) if int(link["to"]) == site_id],
+            "outgoing": [i for i, link in enumerate(self.links) if int(link["from"]) == site_id],
+        }
+
+    def solve(self):
+        """
+        This method solves the whole network as one model with shared transfer variables and supply constraints,
+        solving it again with the elastic level band and target of every site when it has no solution.
+
+        Returns
+        ----------
+        Dictionary
+            Selection matrix, transfer flows and constraints relaxed for each site.
+        """
+        bundles = {site_id: self.bundle(site_id) for site_id in self.sites}
+        for elastic in [False, True]:
+            problem, selections, transfers, slacks = self.joint_problem(bundles, elastic)
+            problem.solve(solver=cp.CPLEX, verbose=False)
+            if problem.status in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+                break
+        if problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE):
+            raise NetworkConfigurationError("Network optimisation finished with status %s" % problem.status)
+        return {site_id: {"selection": selections[site_id].value, "transfers": {i: transfers[i].value for i in bundles[site_id]["links"]},
+            "relaxed": AEC.slack_relaxation(slacks[site_id])} for site_id in self.sites}
+
+    def joint_problem(self, bundles, elastic=False):
+        """
+        This method builds the network as one model.
+
+        Returns
+        ----------
+        Tuple
+            Problem, selection variable of each site, transfer variables and slack variables of each site.
+        """
+        periods = len(next(iter(self.inputs.values()))["hours"])
+        transfers = [cp.Variable(periods, nonneg=True) for link in self.links]
+        constraints = [transfers[i] <= float(link["max_flow"]) for i, link in enumerate(self.links)]
+        objective = 0
+        selections, energies, slacks = {}, {}, {}
+        for site_id, bundle in bundles.items():
+            incoming = [transfers[i] for i in bundle["incoming"]]
+            outgoing = [transfers[i] for i in bundle["outgoing"]]
+            selections[site_id], energies[site_id], cost, site_constraints_, slacks[site_id] = site_constraints(bundle, incoming, outgoing, elastic)
+            constraints += site_constraints_
+            objective = objective+cost
+
+        for supply in self.supplies:
+            total = sum(energies[int(site_id)] for site_id in supply["sites"])
+            if supply.get("max_kw") is not None:
+                constraints.append(total <= float(supply["max_kw"]))
+            if supply.get("demand_charge"):
+                peak = cp.Variable(nonneg=True)
+                constraints.append(peak >= total)
+                objective = objective+float(supply["demand_charge"])*peak
+        return cp.Problem(cp.Minimize(objective), constraints), selections, transfers, slacks
+
+    def solve_decomposed(self, iterations=20, step=0.01, workers=None):
+        """
+        This method solves the network by Lagrangian relaxation. The shared supply caps and transfer links are priced instead of enforced, each site is solved on its own
+        in a worker process, and the prices are updated by subgradient steps. A final pass fixes each transfer at the average of its two ends so both sites agree.
+
+        Parameters
+        ----------
+        iterations
+            Integer -> number of price updates
+        step
+            Float -> initial subgradient step size
+        workers
+            Integer -> worker processes, defaults to the number of cores
+
+        Returns
+        ----------
+        Dictionary
+            Selection matrix, transfer flows and constraints relaxed for each site, with the remaining supply cap violation under "residual".
+        """
+        if any(supply.get("demand_charge") for supply in self.supplies):
+            raise NetworkConfigurationError("Demand charges are only supported by the joint solve")
+        site_ids = list(self.sites)
+        bundles = [self.bundle(site_id) for site_id in site_ids]
+        periods = len(bundles[0]["hours"])
+        supply_prices = [np.zeros(periods) for supply in self.supplies]
+        link_prices = {i: np.zeros(periods) for i in range(len(self.links))}
+
+        def energy_price(site_id):
+            price = np.zeros(periods)
+            for g, supply in enumerate(self.supplies):
+                if site_id in [int(s) for s in supply["sites"]]:
+                    price = price+supply_prices[g]
+            return price
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for k in range(iterations):
+                results = list(executor.map(solve_site, bundles, [energy_price(site_id) for site_id in site_ids], [link_prices]*len(bundles)))
+                if any(result["selection"] is None for result in results):
+                    raise NetworkConfigurationError("A site subproblem is infeasible: %s" % [result["status"] for result in results])
+                solved = dict(zip(site_ids, results))
+                alpha = step/math.sqrt(k+1)
+                for g, supply in enumerate(self.supplies):
+                    if supply.get("max_kw") is not None:
+                        total = sum(solved[int(site_id)]["energy"] for site_id in supply["sites"])
+                        supply_prices[g] = np.maximum(0, supply_prices[g]+alpha*(total-float(supply["max_kw"])))
+                for i, link in enumerate(self.links):
+                    sent = solved[int(link["from"])]["transfers"][i]
+                    received = solved[int(link["to"])]["transfers"][i]
+                    link_prices[i] = link_prices[i]+alpha*(sent-received)
+
+            # Repair pass so both ends of every link use the same transfer, trying the receiving end's, the sending end's and then the average flow
+            ends = [("to",), ("from",), ("from", "to")]
+            for end in ends:
+                fixed = {i: sum(solved[int(link[e])]["transfers"][i] for e in end)/len(end) for i, link in enumerate(self.links)}
+                results = list(executor.map(solve_site, bundles, [energy_price(site_id) for site_id in site_ids], [link_prices]*len(bundles), [fixed]*len(bundles)))
+                if all(result["selection"] is not None for result in results):
+                    break
+        if any(result["selection"] is None for result in results):
+            raise NetworkConfigurationError("A site is infeasible with the agreed transfers: %s" % [result["status"] for result in results])
+        solved = dict(zip(site_ids, results))
+        residual = [float(np.max(sum(solved[int(site_id)]["energy"] for site_id in supply["sites"])-float(supply["max_kw"]))) for supply in self.supplies if supply.get("max_kw") is not None]
+        solution = {site_id: {"selection": solved[site_id]["selection"], "transfers": solved[site_id]["transfers"], "relaxed": solved[site_id]["relaxed"]} for site_id in site_ids}
+        solution["residual"] = max(residual + [0.0])
+        return solution
+
+    def publish(self, solution):
+        """
+        This method turns each site's selection into its regime and stores it as the site's new plan, with its target.
+        A site that kept its current plan returns it and nothing is written for it but the constraints relaxed.
+
+        Parameters
+        ----------
+        solution
+            Dictionary -> output of `solve` or `solve_decomposed`
+
+        Returns
+        ----------
+        Dictionary
+            Regime, transfer flows and whether the current plan was kept for each site.
+        """
+        response = {}
+        for site_id, site in self.sites.items():
+            selection = solution[site_id]["selection"]
+            inputs = self.inputs[site_id]
+            site.relaxed = solution[site_id]["relaxed"]
+            site.report_relaxation(site.relaxed)
+            transfers = {"%s->%s" % (self.links[i]["from"], self.links[i]["to"]): [float(t) for t in value] for i, value in solution[site_id]["transfers"].items()}
+            if self.fixed[site_id] is not None:
+                response[site_id] = {"Regime": site.current_plan(), "Transfers": transfers, "Kept": True}
+                continue
+            assignments = [int(np.argmax(r)) for r in selection]
+            combo = site.candidates(assignments)
+            site.best_cost = np.sum(np.multiply(inputs["cost"], selection))
+            site.best_volume = np.sum(np.multiply(inputs["volume"], selection))
+            site.record_target()
+            response[site_id] = {"Regime": site.manage_response(combo), "Transfers": transfers, "Kept": False}
+            site.dev_debug()
+        return response
+
+    def run(self, decompose=False, iterations=20, workers=None):
+        """
+        This method plans the network while holding the lock of every site, see `AECCoordinator.run_group`. The inputs are collected once the locks are held,
+        so the plan of a run that was waited for is taken into account.
+
+        Parameters
+        ----------
+        decompose
+            Boolean -> True to solve by Lagrangian decomposition, see `solve_decomposed`
+        iterations
+            Integer -> number of price updates when decomposed
+        workers
+            Integer -> worker processes when decomposed
+
+        Returns
+        ----------
+        Dictionary
+            Output of `publish`.
+        """
+        response = {}
+        def solve():
+            self.prepare()
+            solution = self.solve_decomposed(iterations, workers=workers) if decompose else self.solve()
+            response.update(self.publish(solution))
+            return {site_id: data["Regime"] for site_id, data in response.items()}
+        AEC.coordinator.run_group(list(self.sites.values()), solve)
+        return response
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Optimise a network of AEC sites together.")
+    parser.add_argument("config", help="network configuration JSON file")
+    parser.add_argument("levels", nargs="+", help="current level of each site as SITE=LEVEL")
+    parser.add_argument("--decompose", action="store_true", help="solve by Lagrangian decomposition across worker processes")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    levels = {int(site_id): float(level) for site_id, level in (item.split("=") for item in args.levels)}
+    network = AECNetwork.from_file(args.config, levels, args.debug)
+    print(json.dumps({str(site_id): data for site_id, data in network.run(args.decompose, args.iterations, args.workers).items()}))
@@ -0,0 +1,12 @@
+import itertools, json, sys
+from AEC import AEC
+
+# Command line arguments: LEVEL COMBO LEVEL_WEIGHTS ENERGY_WEIGHTS, weights as comma separated lists which are swept as a grid
+current_level = float(sys.argv[1])
+pump_combo = None if sys.argv[2] == "all" else float(sys.argv[2])
+site_id = 2
+
+aec = AEC(current_level, site_id, pump_combo, False, run=False)
+weights = [{"cost": 1.0, "level": float(level), "energy": float(energy)} for level, energy in itertools.product(sys.argv[3].split(","), sys.argv[4].split(","))]
+for result in aec.pareto_sweep(weights):
+    print(json.dumps(result))
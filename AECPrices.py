@@ -0,0 +1,166 @@
+import csv, datetime, json, os, sys, time
+import numpy as np
+from AECCalendar import AECCalendar
+from AECDatabase import AECDatabase
+from dotenv import load_dotenv, find_dotenv
+load_dotenv(find_dotenv())
+
+class AECPrices:
+    """
+    This class loads half hourly price curves into the price_curve table and keeps the current and next day's curve of each site in memory.
+    CSV files have a header row with SiteID, Date, Slot and Price columns. JSON files hold an array of objects with the same keys,
+    or of objects with SiteID, Date and Prices, the 48 prices of the day in slot order. Slot is 0 to 47 or the HH:MM the slot starts at.
+    A day is only priced from its curve when every slot has a price, otherwise AEC uses the tariff bands of the site.
+    The curve prices the site's tariff periods, a regime is still chosen per period (see `AECCostEngine.period_prices`).
+    """
+    BATCH_SIZE = int(os.environ.get('AEC_PRICE_BATCH', 5000))
+    """Number of prices written per executemany"""
+    CACHE_SECONDS = float(os.environ.get('AEC_PRICE_CACHE_SECONDS', 900))
+    """Seconds a cached curve is reused before it is read again, day ahead prices can arrive during the day"""
+    cache = {}
+    """Time read and curve keyed by site and date, shared by all instances in the process"""
+
+    def __init__(self, storage):
+        """
+        Parameters
+        ----------
+        storage
+            AECStorage -> the prices of its `site_id` are read
+        """
+        self.storage = storage
+
+    @staticmethod
+    def parse_slot(value):
+        """
+        This method returns the slot index for a slot given as an index or as the HH:MM it starts at.
+        """
+        value = str(value).strip()
+        if ":" in value:
+            hour, minute = value.split(":")[:2]
+            slot = int(hour)*2+int(minute)//30
+        else:
+            slot = int(value)
+        if slot < 0 or slot >= AECCalendar.SLOTS:
+            raise ValueError("Slot %s is not a half hour of the day" % value)
+        return slot
+
+    @classmethod
+    def parse_row(cls, row):
+        """
+        This method returns the (SiteID, PriceDate, Slot, Price) tuple stored for one price.
+        """
+        return (int(row["SiteID"]), datetime.date.fromisoformat(str(row["Date"]).strip()[:10]).isoformat(), cls.parse_slot(row["Slot"]), float(row["Price"]))
+
+    @classmethod
+    def read_csv(cls, path):
+        """
+        This method reads the prices in a CSV file one row at a time.
+        """
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                yield cls.parse_row(row)
+
+    @classmethod
+    def read_json(cls, path):
+        """
+        This method reads the prices in a JSON file.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        for row in data:
+            if "Prices" in row:
+                if len(row["Prices"]) != AECCalendar.SLOTS:
+                    raise ValueError("Curve for site %s on %s has %d prices" % (row["SiteID"], row["Date"], len(row["Prices"])))
+                for slot, price in enumerate(row["Prices"]):
+                    yield cls.parse_row({"SiteID": row["SiteID"], "Date": row["Date"], "Slot": slot, "Price": price})
+            else:
+                yield cls.parse_row(row)
+
+    def load(self, path):
+        """
+        This method stores the prices in a CSV or JSON file in batches and drops the cached curves of the days it contains.
+
+        Parameters
+        ----------
+        path
+            String -> .csv or .json file
+
+        Returns
+        ----------
+        Integer
+            Number of prices stored.
+        """
+        rows = self.read_json(path) if path.lower().endswith(".json") else self.read_csv(path)
+        count, batch, days = 0, [], set()
+        for row in rows:
+            batch.append(row)
+            days.add((row[0], row[1]))
+            if len(batch) >= self.BATCH_SIZE:
+                self.storage.insert_price_curve(batch)
+                count, batch = count+len(batch), []
+        if len(batch):
+            self.storage.insert_price_curve(batch)
+            count += len(batch)
+        for site_id, day in days:
+            AECPrices.cache.pop((site_id, day), None)
+        return count
+
+    @staticmethod
+    def curve(rows, day):
+        """
+        This method returns the prices of one day from price_curve rows.
+
+        Parameters
+        ----------
+        rows
+            Array of price_curve rows
+        day
+            String -> YYYY-MM-DD
+
+        Returns
+        ----------
+        Numpy Array
+            Price of each slot, None when any slot has no price.
+        """
+        prices = np.full(AECCalendar.SLOTS, np.nan)
+        for row in rows:
+            if row["PriceDate"] == day:
+                prices[row["Slot"]] = row["Price"]
+        return None if np.isnan(prices).any() else prices
+
+    def day_prices(self, day):
+        """
+        This method returns the curve of a day, reading the day and the next day together when the day is not cached.
+        Only those two days are kept in the cache for the site.
+
+        Parameters
+        ----------
+        day
+            Date
+
+        Returns
+        ----------
+        Numpy Array
+            Price of each slot, None when the day has no complete curve.
+        """
+        site_id = int(self.storage.site_id)
+        key = (site_id, day.isoformat())
+        entry = AECPrices.cache.get(key)
+        if entry is not None and time.monotonic()-entry[0] < self.CACHE_SECONDS:
+            return entry[1]
+        days = [day.isoformat(), (day+datetime.timedelta(days=1)).isoformat()]
+        rows = self.storage.get_price_curve(days[0], days[1])
+        for cached in [cached for cached in AECPrices.cache if cached[0] == site_id and cached[1] not in days]:
+            del AECPrices.cache[cached]
+        read = time.monotonic()
+        for price_date in days:
+            AECPrices.cache[(site_id, price_date)] = [read, self.curve(rows, price_date)]
+        return AECPrices.cache[key][1]
+
+# Command line arguments: FILE [FILE ...], each a CSV or JSON price file
+if __name__ == "__main__":
+    db = AECDatabase()
+    db.setup_connection(os.environ['DB_USER'], os.environ['DB_PASS'], os.environ['DB_HOST'], int(os.environ['DB_PORT']), os.environ['DB_NAME'])
+    prices = AECPrices(db)
+    for path in sys.argv[1:]:
+        print(json.dumps({"File": path, "Prices": prices.load(path)}))
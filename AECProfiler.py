@@ -0,0 +1,135 @@
+import cProfile, datetime, json, os, shutil, sys, threading, time, tracemalloc
+from collections import Counter
+
+class AECProfiler:
+    """
+    This class profiles one AEC run. The run is split into named stages and for each the wall time and the tracemalloc peak memory are recorded,
+    while cProfile and a sampler that records the call stack of the running thread every SAMPLE_SECONDS cover the whole run.
+    The stages, the pstats file and the sampled stacks in collapsed form (one "frame;frame;frame count" line per stack, as read by flamegraph.pl and speedscope)
+    are written to a directory per run under DIRECTORY/site_<ID>, keeping the latest KEEP runs of each site.
+    Profiling is turned on by AEC_PROFILE or a --profile command line flag, AEC does not create a profiler otherwise.
+    tracemalloc is process wide, so when several sites are profiled at once in threads their peaks include each other's allocations.
+    """
+    ENABLED = os.environ.get('AEC_PROFILE', '').lower() in ('1', 'true', 'yes')
+    """Environment variable for AEC_PROFILE, --profile on the command line also sets it"""
+    DIRECTORY = os.environ.get('AEC_PROFILE_DIR', 'profiles')
+    """Directory the profiles are written to"""
+    KEEP = int(os.environ.get('AEC_PROFILE_KEEP', 20))
+    """Runs kept per site, older profiles are removed"""
+    SAMPLE_SECONDS = float(os.environ.get('AEC_PROFILE_SAMPLE_SECONDS', 0.005))
+    """Interval between stack samples"""
+    tracing = [0]
+    """Number of profilers using tracemalloc, it is stopped when the last one finishes"""
+    lock = threading.Lock()
+
+    @classmethod
+    def from_argv(cls, argv):
+        """
+        This method turns profiling on when --profile is given and returns the other arguments.
+        """
+        if "--profile" in argv:
+            cls.ENABLED = True
+        return [arg for arg in argv if arg != "--profile"]
+
+    def __init__(self, site_id):
+        """
+        Parameters
+        ----------
+        site_id
+            Integer -> site being run
+        """
+        self.site_id = site_id
+        self.started = datetime.datetime.now()
+        self.stages = []
+        self.notes = {}
+        self.current = None
+        self.thread = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        with AECProfiler.lock:
+            if AECProfiler.tracing[0] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            AECProfiler.tracing[0] += 1
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            self.profile = None
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    @staticmethod
+    def frame_name(frame):
+        return "%s:%s" % (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+
+    def sample(self):
+        """
+        This method records the call stack of the profiled thread until the profiler finishes.
+        """
+        while not self.stopped.wait(self.SAMPLE_SECONDS):
+            frame = sys._current_frames().get(self.thread)
+            stack = []
+            while frame is not None:
+                stack.append(self.frame_name(frame))
+                frame = frame.f_back
+            if len(stack):
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stage(self, name):
+        """
+        This method ends the current stage and starts the next one.
+
+        Parameters
+        ----------
+        name
+            String -> name of the next stage, None to only end the current one
+        """
+        now = time.perf_counter()
+        if self.current is not None:
+            self.stages.append({"Stage": self.current[0], "Seconds": now-self.current[1], "PeakMemory": tracemalloc.get_traced_memory()[1]-self.current[2]})
+        self.current = None
+        if name is not None:
+            tracemalloc.reset_peak()
+            self.current = (name, time.perf_counter(), tracemalloc.get_traced_memory()[0])
+
+    def note(self, key, value):
+        """
+        This method records a value alongside the stages, such as the CVXPY compilation and solver times.
+        """
+        self.notes.setdefault(key, []).append(value)
+
+    def finish(self):
+        """
+        This method stops profiling, writes the profile of the run and removes the oldest profiles of the site beyond KEEP.
+
+        Returns
+        ----------
+        String
+            Directory the profile was written to.
+        """
+        self.stage(None)
+        if self.profile is not None:
+            self.profile.disable()
+        self.stopped.set()
+        self.sampler.join()
+        with AECProfiler.lock:
+            AECProfiler.tracing[0] -= 1
+            if AECProfiler.tracing[0] == 0:
+                tracemalloc.stop()
+
+        site = os.path.join(self.DIRECTORY, "site_%s" % self.site_id)
+        path = os.path.join(site, self.started.strftime("%Y%m%dT%H%M%S%f"))
+        os.makedirs(path, exist_ok=True)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.join(path, "profile.pstats"))
+        with open(os.path.join(path, "stacks.txt"), "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write("%s %d\n" % (stack, count))
+        with open(os.path.join(path, "stages.json"), "w") as f:
+            json.dump({"SiteID": self.site_id, "Started": self.started.isoformat(), "Stages": self.stages, "Notes": self.notes}, f, indent=2, default=float)
+
+        runs = sorted(os.listdir(site))
+        for run in runs[:max(len(runs)-self.KEEP, 0)]:
+            shutil.rmtree(os.path.join(site, run), ignore_errors=True)
+        return path
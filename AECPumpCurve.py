@@ -0,0 +1,152 @@
+import numpy as np
+
+class AECPumpCurve:
+    """
+    This class provides a piecewise-linear model of a pump combination, fitted from its rows in the pump table.
+    Energy is modelled by the lower convex hull of the (Flow, Energy) points, so the optimiser can run the pump at any flow between the slowest and fastest running speed.
+    """
+    def __init__(self, pump_data):
+        """
+        This method fits the curve for a single pump combination.
+
+        Parameters
+        ----------
+        pump_data
+            Array of pump rows for one combination (Speed, Flow, Energy)
+        """
+        rows = sorted(pump_data, key=lambda data: float(data["Flow"]))
+        self.speed = np.array([float(data["Speed"]) for data in rows])
+        self.flow = np.array([float(data["Flow"]) for data in rows])
+        self.energy = np.array([float(data["Energy"]) for data in rows])
+        running = self.flow > 0
+        self.running_speed = self.speed[running]
+        self.running_flow = self.flow[running]
+        self.running_energy = self.energy[running]
+        self.min_flow = float(self.running_flow.min()) if running.any() else 0.0
+        self.max_flow = float(self.running_flow.max()) if running.any() else 0.0
+        self.slopes, self.intercepts = self.convex_hull(self.running_flow, self.running_energy)
+
+    @staticmethod
+    def convex_hull(flow, energy):
+        """
+        This method calculates the lower convex hull of the pump curve as a set of lines, energy >= slope*flow + intercept.
+
+        Parameters
+        ----------
+        flow
+            Numpy Array -> running flows sorted ascending
+        energy
+            Numpy Array -> energy for each flow
+
+        Returns
+        ----------
+        Tuple
+            Numpy Arrays of slopes and intercepts, one per hull segment.
+        """
+        if len(flow) == 0:
+            return np.zeros(1), np.zeros(1)
+        hull = []
+        for point in zip(flow, energy):
+            # Pop points that sit above the line joining their neighbours
+            while len(hull) >= 2:
+                (x1, y1), (x2, y2) = hull[-2], hull[-1]
+                if (x2-x1)*(point[1]-y1)-(y2-y1)*(point[0]-x1) <= 0:
+                    hull.pop()
+                else:
+                    break
+            if len(hull) and hull[-1][0] == point[0]:
+                if point[1] < hull[-1][1]:
+                    hull[-1] = point
+                continue
+            hull.append(point)
+        if len(hull) == 1:
+            return np.zeros(1), np.array([hull[0][1]])
+        hull = np.array(hull)
+        slopes = np.diff(hull[:, 1])/np.diff(hull[:, 0])
+        intercepts = hull[:-1, 1]-slopes*hull[:-1, 0]
+        return slopes, intercepts
+
+    def energy_at(self, flow):
+        """
+        This method returns the modelled energy at the given flow(s), zero when the pump is stopped.
+
+        Parameters
+        ----------
+        flow
+            Float or Numpy Array -> litres/second
+
+        Returns
+        ----------
+        Numpy Array
+            Energy in kilowatts.
+        """
+        flow = np.asarray(flow, dtype=float)
+        energy = np.max(np.multiply.outer(flow, self.slopes)+self.intercepts, axis=-1)
+        return np.where(flow > 0, energy, 0.0)
+
+    def speed_at(self, flow):
+        """
+        This method returns the speed needed for the given flow(s) by interpolating the pump table, zero when the pump is stopped.
+
+        Parameters
+        ----------
+        flow
+            Float or Numpy Array -> litres/second
+
+        Returns
+        ----------
+        Numpy Array
+            Speed setpoint.
+        """
+        flow = np.asarray(flow, dtype=float)
+        if len(self.running_flow) == 0:
+            return np.zeros_like(flow)
+        return np.where(flow > 0, np.interp(flow, self.running_flow, self.running_speed), 0.0)
+
+    @staticmethod
+    def adjust_for_suction(pump_data, suction_pressure):
+        """
+        This method corrects the pump data for the measured suction pressure. Flow is scaled by the ratio of the measured pressure to the pressure each row was recorded at,
+        and energy is scaled by the same ratio so the energy per litre pumped is unchanged.
+
+        Parameters
+        ----------
+        pump_data
+            Array of pump rows
+        suction_pressure
+            Float -> smoothed suction pressure for the site
+
+        Returns
+        ----------
+        Array
+            New pump rows with corrected Flow and Energy.
+        """
+        if len(pump_data) == 0:
+            return []
+        flow = np.array([float(data["Flow"]) for data in pump_data])
+        energy = np.array([float(data["Energy"]) for data in pump_data])
+        reference = np.array([float(data["SuctionPressure"]) for data in pump_data])
+        factor = suction_pressure/reference
+        flow = flow*factor
+        energy = energy*factor
+        return [dict(data, Flow=float(flow[i]), Energy=float(energy[i])) for i, data in enumerate(pump_data)]
+
+    @classmethod
+    def from_pump_data(cls, pump_data):
+        """
+        This method fits one curve per pump combination found in the pump data.
+
+        Parameters
+        ----------
+        pump_data
+            Array of pump rows, possibly for several combinations
+
+        Returns
+        ----------
+        Dictionary
+            Curve for each combination.
+        """
+        combos = {}
+        for data in pump_data:
+            combos.setdefault(float(data["Combination"]), []).append(data)
+        return {combo: cls(rows) for combo, rows in sorted(combos.items())}
@@ -0,0 +1,244 @@
+import datetime, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from AEC import AEC
+from AECDatabase import AECDatabase
+from AECExport import AECExport
+from AECSQLiteDatabase import AECSQLiteDatabase
+
+class ReplayAEC(AECSQLiteDatabase, AEC):
+    """
+    This class runs AEC at a simulated time against the embedded database of a replay, so regime and target reads and writes never touch MariaDB.
+    """
+    def __init__(self, storage, current_level, site_id, pump_combo, inputs):
+        self.share(storage)
+        AEC.__init__(self, current_level, site_id, pump_combo, False, run=False, inputs=inputs, now=storage.clock())
+
+class AECReplay:
+    """
+    This class replays how AEC would have run a site over a range of days. The recorded historical_buffer levels and flows from the Parquet export give the starting level and the real demand of each day,
+    the regime is recalculated at each recalculation point in simulated time and the reservoir level is then simulated under the regime in force.
+    Static site, pump, tariff and cost data is read from the database once, so days can be replayed in parallel processes. Each process replays against its own embedded AECSQLiteDatabase.
+    """
+    RECALCULATION_HOURS = [0, 8, 14, 16, 19]
+    """Hours Node-RED calls AECRun.py at"""
+    SAMPLES = 48
+    """Half hour samples in a day"""
+    storages = {}
+    """Embedded database per dump, shared by the replays in the process"""
+
+    def __init__(self, site_id, export_dir, pump_combo=1, fixture=None):
+        """
+        This method reads the static data for the site.
+
+        Parameters
+        ----------
+        site_id
+            Integer
+        export_dir
+            String -> directory of the Parquet export (see AECExport)
+        pump_combo
+            Float -> pump combination, None for every combination
+        fixture
+            String -> dump to read the static data from instead of MariaDB
+        """
+        self.site_id = site_id
+        self.pump_combo = pump_combo
+        self.fixture = fixture or AECSQLiteDatabase.FIXTURE
+        self.export = AECExport(export_dir, connect=False)
+        if fixture:
+            db = AECSQLiteDatabase(fixture=fixture)
+        else:
+            db = AECDatabase()
+            db.setup_connection(AEC.DB_USER, AEC.DB_PASS, AEC.DB_HOST, AEC.DB_PORT, AEC.DB_NAME)
+        db.site_id = site_id
+        self.site = db.get_site_data()
+        self.pump = db.get_all_pump_data() if pump_combo is None else db.get_pump_data(pump_combo)
+        self.tariff = db.get_tariff_data(self.site["TariffType"])
+        self.holidays = db.get_bank_holidays()
+        self.costs = {}
+        self.suction_pressure = None
+        if self.site["SuctionAdjustment"]:
+            window = db.get_suction_pressure_window(AEC.SUCTION_WINDOW)
+            self.suction_pressure = float(window["Pressure"]) if window["Pressure"] is not None else None
+        self.db = db
+
+    def load_costs(self, days):
+        """
+        This method reads the cost data for every month in the replayed days.
+        """
+        for month in sorted(set(day.strftime("%B")[:3] for day in days)):
+            if month not in self.costs:
+                self.costs[month] = self.db.get_cost_data(self.site["CostType"], month)
+
+    def storage(self):
+        """
+        This method returns the embedded database for this process, holding only the schema and stored procedures of the dump.
+        """
+        if self.fixture not in AECReplay.storages:
+            AECReplay.storages[self.fixture] = AECSQLiteDatabase(fixture=self.fixture, data=False)
+        return AECReplay.storages[self.fixture]
+
+    def day_samples(self, day):
+        """
+        This method resamples the recorded historical_buffer rows of a day onto half hour samples and derives the demand from the change in level.
+
+        Parameters
+        ----------
+        day
+            Date
+
+        Returns
+        ----------
+        DataFrame
+            Level at the start of each sample, pumped flow and demand in litres/second, None when less than half the day was recorded.
+        """
+        buffer = self.export.read("historical_buffer", self.site_id, [day.strftime("%Y-%m")], ["ID", "PumpedFlow", "Level", "Created"])
+        if len(buffer) == 0:
+            return None
+        buffer = buffer[buffer["Created"].dt.date == day]
+        if len(buffer) < self.SAMPLES/2:
+            return None
+        sample = buffer["Created"].dt.hour*2+buffer["Created"].dt.minute//30
+        samples = buffer.groupby(sample)[["PumpedFlow", "Level"]].first().reindex(range(self.SAMPLES+1))
+        samples = samples.interpolate(limit_direction="both")
+        # Demand is what was pumped less what went into storage, as in AECHistorical
+        stored = np.diff(samples["Level"].values)*float(self.site["SurfaceArea"])/1.8
+        demand = np.clip(samples["PumpedFlow"].values[:-1]-stored, 0, None)
+        return pd.DataFrame({"Level": samples["Level"].values[:-1], "PumpedFlow": samples["PumpedFlow"].values[:-1], "Demand": demand})
+
+    def plan_flows(self, regime, recorded):
+        """
+        This method expands the regime onto half hour samples of pump flow, using the recorded flow where there is no plan.
+
+        Parameters
+        ----------
+        regime
+            Array of regime rows
+        recorded
+            Numpy Array -> recorded pumped flow for each sample
+
+        Returns
+        ----------
+        Numpy Array
+            Pump flow for each sample.
+        """
+        flows = [float(data["Flow"]) for data in regime for i in range(0, int(float(data["Time"])*2))][:self.SAMPLES]
+        return np.concatenate([flows, recorded[len(flows):]])
+
+    def replay_day(self, day):
+        """
+        This method replays one day.
+
+        Parameters
+        ----------
+        day
+            Date
+
+        Returns
+        ----------
+        Dictionary
+            Cost and volume of the final regime, simulated level range, number of samples outside the site limits, the wall time of the recalculations (reading the data, solving and writing the plan) and the outcome of every recalculation.
+        """
+        samples = self.day_samples(day)
+        if samples is None:
+            return {"Date": str(day), "Error": "Not enough recorded data"}
+        inputs = {
+            "site": self.site,
+            "cost": self.costs[day.strftime("%B")[:3]],
+            "pump": self.pump,
+            "tariff": self.tariff,
+            "holidays": self.holidays,
+            "historical": self.export.historical_profile(self.site_id, datetime.datetime.combine(day, datetime.time())),
+            "suction_pressure": self.suction_pressure,
+        }
+        storage = self.storage()
+        storage.site_id = self.site_id
+        storage.clock = lambda: datetime.datetime.combine(day, datetime.time())
+        # Start from an empty plan in case the day was replayed before in this process
+        storage.open_connection()
+        storage.cur.execute("DELETE FROM regime WHERE SiteID = ? AND PlanDate = CURDATE();", (self.site_id,))
+        storage.cur.execute("DELETE FROM target WHERE SiteID = ? AND DATE(Created) = CURDATE();", (self.site_id,))
+        storage.connection.commit()
+        storage.close_connection()
+        area = float(self.site["SurfaceArea"])
+        levels = [float(samples["Level"][0])]
+        runs = []
+        for hour in self.RECALCULATION_HOURS+[24]:
+            # Simulate the level up to the recalculation point under the regime in force
+            regime = storage.get_regime_data()
+            flows = self.plan_flows(regime, samples["PumpedFlow"].values)
+            for i in range(len(levels)-1, hour*2):
+                levels.append(levels[-1]+(flows[i]-samples["Demand"][i])*1.8/area)
+            if hour == 24:
+                break
+            now = datetime.datetime.combine(day, datetime.time(hour))
+            storage.clock = lambda: now
+            start = time.perf_counter()
+            try:
+                ReplayAEC(storage, levels[-1], self.site_id, self.pump_combo, inputs).get_regime()
+                status = "Planned"
+            except SystemExit:
+                status = "Not required"
+            except Exception as e:
+                status = type(e).__name__
+            runs.append({"Hour": hour, "Level": levels[-1], "Status": status, "Seconds": time.perf_counter()-start})
+        levels = np.array(levels)
+        return {
+            "Date": str(day),
+            "Cost": sum(float(data["Cost"]) for data in regime),
+            "Volume": sum(float(data["Volume"]) for data in regime),
+            "MinLevel": float(levels.min()),
+            "MaxLevel": float(levels.max()),
+            "Excursions": int(((levels < float(self.site["MinLevel"])) | (levels > float(self.site["MaxLevel"]))).sum()),
+            "RunSeconds": sum(run["Seconds"] for run in runs),
+            "Runs": runs,
+        }
+
+    def replay(self, start, end, workers=None):
+        """
+        This method replays every day from start to end inclusive, one process per day.
+
+        Parameters
+        ----------
+        start
+            Date
+        end
+            Date
+        workers
+            Integer -> number of processes, defaults to the number of CPUs
+
+        Returns
+        ----------
+        Array
+            Result of each day in date order.
+        """
+        days = [start+datetime.timedelta(days=i) for i in range((end-start).days+1)]
+        self.load_costs(days)
+        if workers == 1:
+            return [self.replay_day(day) for day in days]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.replay_day, days))
+
+    def __getstate__(self):
+        # The database handle is only needed in the parent process
+        return {key: value for key, value in self.__dict__.items() if key != "db"}
+
+# Command line arguments: SITE EXPORT_DIR START END [COMBO], dates as YYYY-MM-DD and COMBO "all" to optimise across every combination
+if __name__ == "__main__":
+    pump_combo = sys.argv[5] if len(sys.argv) > 5 else "1"
+    # AEC_REPLAY_FIXTURE reads the static data from a dump instead of MariaDB
+    replay = AECReplay(int(sys.argv[1]), sys.argv[2], None if pump_combo == "all" else float(pump_combo), os.environ.get("AEC_REPLAY_FIXTURE"))
+    workers = int(os.environ["AEC_REPLAY_WORKERS"]) if os.environ.get("AEC_REPLAY_WORKERS") else None
+    results = replay.replay(datetime.date.fromisoformat(sys.argv[3]), datetime.date.fromisoformat(sys.argv[4]), workers)
+    for result in results:
+        print(json.dumps(result))
+    replayed = [result for result in results if "Error" not in result]
+    print(json.dumps({
+        "Days": len(results),
+        "Replayed": len(replayed),
+        "Cost": sum(result["Cost"] for result in replayed),
+        "Excursions": sum(result["Excursions"] for result in replayed),
+        "RunSeconds": sum(result["RunSeconds"] for result in replayed),
+    }))
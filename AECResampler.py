@@ -0,0 +1,103 @@
+import datetime, os
+
+class AECResampler:
+    """
+    This class turns the irregular level and pumped flow samples of a site into the average outlet flow of fixed length bins aligned to midnight.
+    Between two samples the flow and level are taken to change linearly, so the pumped volume of a bin is the time weighted integral of the flow
+    and the outlet is what was pumped less what went into storage. Only the running totals of the current bin and the last sample are kept,
+    so the state is the same size however many samples arrive.
+    """
+    BIN_SECONDS = int(os.environ.get('AEC_RESAMPLE_SECONDS', 1800))
+    """Length of a bin in seconds, 1800 gives the half hour slots of historical"""
+    MAX_GAP_SECONDS = float(os.environ.get('AEC_RESAMPLE_MAX_GAP', 3600))
+    """Longest gap between samples that is interpolated across, resampling restarts after a longer gap"""
+
+    def __init__(self, surface_area, state=None, bin_seconds=None):
+        """
+        Parameters
+        ----------
+        surface_area
+            Float -> reservoir surface area in square metres
+        state
+            Dictionary -> state saved by a previous resampler (BinStart, BinLevel, BinPumped, LastTime, LastLevel, LastFlow), None to start afresh
+        bin_seconds
+            Integer -> length of a bin, defaults to BIN_SECONDS
+        """
+        self.surface_area = float(surface_area)
+        self.bin_seconds = bin_seconds or self.BIN_SECONDS
+        self.state = None
+        if state is not None:
+            self.state = {key: self.to_datetime(value) if key in ("BinStart", "LastTime") else float(value) for key, value in state.items() if key in ("BinStart", "BinLevel", "BinPumped", "LastTime", "LastLevel", "LastFlow")}
+
+    @staticmethod
+    def to_datetime(value):
+        """
+        This method returns a DateTime for a value read from the database, which may be a string.
+        """
+        return value if isinstance(value, datetime.datetime) else datetime.datetime.fromisoformat(str(value))
+
+    def bin_start(self, created):
+        """
+        This method returns the start of the bin a time falls in.
+        """
+        midnight = datetime.datetime(created.year, created.month, created.day)
+        return midnight+datetime.timedelta(seconds=int((created-midnight).total_seconds())//self.bin_seconds*self.bin_seconds)
+
+    def restart(self, created, level, flow):
+        """
+        This method starts resampling from a sample. The bin the sample falls in is only partly covered, so its BinStart is the sample time and it is not emitted.
+        """
+        self.state = {"BinStart": created, "BinLevel": level, "BinPumped": 0.0, "LastTime": created, "LastLevel": level, "LastFlow": flow}
+
+    def add(self, created, level, flow):
+        """
+        This method adds a sample.
+
+        Parameters
+        ----------
+        created
+            DateTime -> time the sample was taken
+        level
+            Float -> reservoir level in metres
+        flow
+            Float -> pumped flow in litres/second
+
+        Returns
+        ----------
+        Array
+            (bin start, average outlet flow in litres/second) for each bin the sample completes, oldest first.
+        """
+        level, flow = float(level), float(flow)
+        if self.state is None:
+            self.restart(created, level, flow)
+            return []
+        state = self.state
+        elapsed = (created-state["LastTime"]).total_seconds()
+        if elapsed <= 0:
+            # Repeated or out of order samples add nothing
+            return []
+        if elapsed > self.MAX_GAP_SECONDS:
+            self.restart(created, level, flow)
+            return []
+
+        completed = []
+        start = state["LastTime"]
+        boundary = self.bin_start(state["BinStart"])+datetime.timedelta(seconds=self.bin_seconds)
+        while boundary <= created:
+            # Interpolate the flow and level at the bin boundary and close the bin
+            fraction = (boundary-state["LastTime"]).total_seconds()/elapsed
+            boundary_flow = state["LastFlow"]+(flow-state["LastFlow"])*fraction
+            boundary_level = state["LastLevel"]+(level-state["LastLevel"])*fraction
+            start_flow = state["LastFlow"]+(flow-state["LastFlow"])*(start-state["LastTime"]).total_seconds()/elapsed
+            pumped = state["BinPumped"]+(start_flow+boundary_flow)/2*(boundary-start).total_seconds()
+            stored = (boundary_level-state["BinLevel"])*self.surface_area*1000
+            if state["BinStart"] == self.bin_start(state["BinStart"]):
+                completed.append((state["BinStart"], max((pumped-stored)/self.bin_seconds, 0.0)))
+            state["BinStart"], state["BinLevel"], state["BinPumped"] = boundary, boundary_level, 0.0
+            start = boundary
+            boundary = boundary+datetime.timedelta(seconds=self.bin_seconds)
+
+        start_flow = state["LastFlow"]+(flow-state["LastFlow"])*(start-state["LastTime"]).total_seconds()/elapsed
+        state["BinPumped"] += (start_flow+flow)/2*(created-start).total_seconds()
+        state["LastTime"], state["LastLevel"], state["LastFlow"] = created, level, flow
+        return completed
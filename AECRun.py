@@ -1,9 +1,12 @@
 import csv, sys, math
 from AEC import AEC
+from AECProfiler import AECProfiler
 
-# Command line arguments
-current_level = float(sys.argv[1])
-pump_combo = float(sys.argv[2])
+# Command line arguments: LEVEL COMBO [--profile]
+argv = AECProfiler.from_argv(sys.argv)
+current_level = float(argv[1])
+# "all" optimises jointly across every pump combination at the site
+pump_combo = None if argv[2] == "all" else float(argv[2])
 site_id = 2
 
 AEC(current_level, site_id, pump_combo, True)
\ No newline at end of file
@@ -0,0 +1,302 @@
+import datetime, os, re, sqlite3
+from AECDatabase import AECDatabase
+
+class SQLiteCursor():
+    """
+    This class wraps a SQLite cursor so the MariaDB SQL in AECDatabase runs unchanged, translating it on the way in.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.cur = storage.sqlite.cursor()
+
+    def execute(self, sql, params=()):
+        sql, params = self.storage.translate(sql, params)
+        self.cur.execute(sql, params)
+        return self
+
+    def executemany(self, sql, params):
+        self.cur.executemany(self.storage.translate(sql, ())[0], params)
+        return self
+
+    def fetchone(self):
+        return self.cur.fetchone()
+
+    def fetchall(self):
+        return self.cur.fetchall()
+
+    def fetchmany(self, size=1):
+        return self.cur.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self.cur)
+
+    @property
+    def description(self):
+        return self.cur.description
+
+    @property
+    def lastrowid(self):
+        return self.cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cur.rowcount
+
+class SQLiteConnection():
+    """
+    This class stands in for a MariaDB connection. Closing it does nothing, the SQLite connection stays open for the life of the storage.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def cursor(self):
+        return SQLiteCursor(self.storage)
+
+    def commit(self):
+        self.storage.sqlite.commit()
+
+    def rollback(self):
+        self.storage.sqlite.rollback()
+
+    def close(self):
+        pass
+
+class AECSQLiteDatabase(AECDatabase):
+    """
+    This class is the embedded implementation of AECStorage. It loads the aec.sql dump into SQLite and runs the AECDatabase queries against it over one persistent connection,
+    so simulations, benchmarks and tests run in process with no server.
+    MariaDB syntax is translated as it is executed: date functions are registered against `clock`, INTERVAL arithmetic becomes SQLite date modifiers
+    and CALL runs the stored procedure from the dump. Created and Updated columns follow `clock`, so a simulated day stores rows on that day.
+    """
+    FIXTURE = os.environ.get('AEC_SQLITE_FIXTURE', os.path.join(os.path.dirname(os.path.abspath(__file__)), "aec.sql"))
+    """Dump loaded into new databases"""
+    INTERVAL = re.compile(r"(NOW\(\)|CURDATE\(\))((?:\s*[+-]\s*INTERVAL\s+\d+\s+(?:MONTH|WEEK|DAY|HOUR|MINUTE))+)", re.IGNORECASE)
+    """MariaDB date arithmetic"""
+    INTERVAL_PART = re.compile(r"([+-])\s*INTERVAL\s+(\d+)\s+(MONTH|WEEK|DAY|HOUR|MINUTE)", re.IGNORECASE)
+    """One step of MariaDB date arithmetic"""
+    CALL = re.compile(r"^\s*CALL\s+`?(\w+)`?\s*\(.*\)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+    """Stored procedure call"""
+
+    def __init__(self, path=":memory:", fixture=None, clock=None, data=True, site_id=None):
+        """
+        This method opens the database, loading the dump when it is new.
+
+        Parameters
+        ----------
+        path
+            String -> SQLite file, an existing file is used as it is, ":memory:" for a private in-memory database
+        fixture
+            String -> dump to load, defaults to FIXTURE
+        clock
+            Function -> returns the current DateTime, defaults to datetime.now
+        data
+            Boolean -> False to load only the schema and stored procedures
+        site_id
+            Integer
+        """
+        self.clock = clock or datetime.datetime.now
+        self.site_id = site_id
+        self.connect(path, fixture or self.FIXTURE, data)
+
+    def connect(self, path, fixture, data=True):
+        """
+        This method opens the SQLite connection and registers the MariaDB date functions.
+        """
+        load = path == ":memory:" or not os.path.exists(path)
+        self.sqlite = sqlite3.connect(path, check_same_thread=False)
+        self.sqlite.create_function("CURDATE", 0, lambda: self.clock().strftime("%Y-%m-%d"))
+        self.sqlite.create_function("NOW", 0, lambda: self.clock().strftime("%Y-%m-%d %H:%M:%S"))
+        self.sqlite.create_function("WEEKDAY", 1, lambda value: None if value is None else datetime.datetime.fromisoformat(str(value)).weekday(), deterministic=True)
+        self.sqlite.create_function("HOUR", 1, lambda value: None if value is None else datetime.datetime.fromisoformat(str(value)).hour, deterministic=True)
+        self.sqlite.create_function("MINUTE", 1, lambda value: None if value is None else datetime.datetime.fromisoformat(str(value)).minute, deterministic=True)
+        self.translations = {}
+        with open(fixture, encoding="utf-8") as f:
+            script, self.procedures = self.convert_dump(f.read(), data)
+        if load:
+            self.sqlite.executescript(script)
+            self.sqlite.commit()
+            # The dumped regime rows predate plan versions
+            self.backfill_plan_versions()
+
+    def share(self, storage):
+        """
+        This method makes this instance use the connection, procedures and clock of another instance, so AEC subclasses can run against an existing database.
+
+        Parameters
+        ----------
+        storage
+            AECSQLiteDatabase
+        """
+        self.sqlite = storage.sqlite
+        self.procedures = storage.procedures
+        self.translations = storage.translations
+        self.clock = lambda: storage.clock()
+
+    def setup_connection(self, username, password, host, port, database):
+        """
+        This method opens the database at the path given as database. The credentials are not used, an instance that already has a connection keeps it.
+        """
+        if getattr(self, "sqlite", None) is None:
+            self.clock = getattr(self, "clock", datetime.datetime.now)
+            self.connect(database, self.FIXTURE)
+
+    def open_connection(self):
+        """
+        This method hands out a cursor on the persistent connection.
+        """
+        self.connection = SQLiteConnection(self)
+        self.cur = self.connection.cursor()
+
+    def close_connection(self):
+        """
+        This method does nothing, the connection stays open.
+        """
+        pass
+
+    def add_plan_columns(self):
+        """
+        This method does nothing, the tables are created from aec.sql with the plan version columns.
+        """
+        pass
+
+    def get_partitions(self, table):
+        """
+        This method returns no partitions, SQLite tables are not partitioned so expired rows are deleted instead.
+        """
+        return []
+
+    def acquire_site_lock(self, timeout):
+        """
+        This method always holds the lock, an embedded database is only used by one process and runs within it are coordinated by AECCoordinator.
+        """
+        return True
+
+    def release_site_lock(self):
+        """
+        This method does nothing, see acquire_site_lock.
+        """
+        pass
+
+    def translate(self, sql, params):
+        """
+        This method translates a MariaDB statement to SQLite.
+
+        Parameters
+        ----------
+        sql
+            String
+        params
+            Tuple
+
+        Returns
+        ----------
+        Tuple
+            SQLite statement and parameters.
+        """
+        call = self.CALL.match(sql)
+        if call:
+            if call.group(1) not in self.procedures:
+                raise sqlite3.OperationalError("PROCEDURE %s does not exist" % call.group(1))
+            return self.procedures[call.group(1)], params
+        if sql not in self.translations:
+            self.translations[sql] = self.INTERVAL.sub(self.translate_interval, sql)
+        return self.translations[sql], params
+
+    @classmethod
+    def translate_interval(cls, match):
+        """
+        This method turns MariaDB date arithmetic such as CURDATE() - INTERVAL 4 WEEK into SQLite date modifiers.
+        """
+        modifiers = []
+        units = set()
+        for sign, count, unit in cls.INTERVAL_PART.findall(match.group(2)):
+            unit = unit.upper()
+            units.add(unit)
+            count = int(count)*7 if unit == "WEEK" else int(count)
+            unit = "DAY" if unit == "WEEK" else unit
+            modifiers.append("'%s%d %ss'" % (sign, count, unit.lower()))
+        function = "date" if match.group(1).upper() == "CURDATE()" and units <= {"MONTH", "WEEK", "DAY"} else "datetime"
+        return "%s(%s, %s)" % (function, match.group(1), ", ".join(modifiers))
+
+    @classmethod
+    def convert_dump(cls, dump, data=True):
+        """
+        This method converts a HeidiSQL MariaDB dump into a SQLite script. Keys become indexes, AUTO_INCREMENT IDs become SQLite row IDs,
+        current_timestamp() defaults become triggers on NOW() and stored procedures are returned as single SQLite statements.
+
+        Parameters
+        ----------
+        dump
+            String -> contents of the dump
+        data
+            Boolean -> False to leave out the INSERT statements
+
+        Returns
+        ----------
+        Tuple
+            SQLite script and the procedures by name.
+        """
+        tables, rows, indexes, triggers, procedures = [], [], [], [], {}
+        lines = iter(dump.replace("\r\n", "\n").split("\n"))
+        for line in lines:
+            if line.startswith("CREATE TABLE"):
+                table = re.search(r"`(\w+)`", line).group(1)
+                columns, automatic = [], False
+                for line in lines:
+                    line = line.strip()
+                    if line.startswith(")"):
+                        # Skip table options such as partitions up to the end of the statement
+                        while not line.endswith(";"):
+                            line = next(lines).strip()
+                        break
+                    line = line.rstrip(",")
+                    keys = re.findall(r"\(([^)]*)\)", line)
+                    if line.startswith("PRIMARY KEY"):
+                        if not automatic:
+                            columns.append("PRIMARY KEY (%s)" % keys[0])
+                    elif line.startswith("UNIQUE KEY"):
+                        columns.append("UNIQUE (%s)" % keys[0])
+                    elif line.startswith("KEY"):
+                        indexes.append("CREATE INDEX IF NOT EXISTS `%s_%s` ON `%s` (%s);" % (table, re.search(r"`(\w+)`", line).group(1), table, keys[0]))
+                    elif line.startswith("CONSTRAINT"):
+                        columns.append(line)
+                    else:
+                        column = re.search(r"`(\w+)`", line).group(1)
+                        line = re.sub(r" COLLATE \w+", "", line)
+                        if " ON UPDATE current_timestamp()" in line:
+                            line = line.replace(" ON UPDATE current_timestamp()", "")
+                            triggers.append("CREATE TRIGGER `%s_%s_update` AFTER UPDATE ON `%s` WHEN NEW.`%s` IS OLD.`%s` BEGIN UPDATE `%s` SET `%s` = NOW() WHERE rowid = NEW.rowid; END;" % (table, column, table, column, column, table, column))
+                        if "DEFAULT current_timestamp()" in line:
+                            # The trigger fills the column after the insert, so it has to accept NULL first
+                            line = line.replace(" DEFAULT current_timestamp()", "").replace(" NOT NULL", "")
+                            triggers.append("CREATE TRIGGER `%s_%s_default` AFTER INSERT ON `%s` WHEN NEW.`%s` IS NULL BEGIN UPDATE `%s` SET `%s` = NOW() WHERE rowid = NEW.rowid; END;" % (table, column, table, column, table, column))
+                        if "AUTO_INCREMENT" in line:
+                            line = "`%s` INTEGER PRIMARY KEY AUTOINCREMENT" % column
+                            automatic = True
+                        columns.append(line)
+                tables.append("CREATE TABLE IF NOT EXISTS `%s` (\n  %s\n);" % (table, ",\n  ".join(columns)))
+            elif line.startswith("INSERT INTO"):
+                statement = [line]
+                while not statement[-1].endswith(";"):
+                    statement.append(next(lines))
+                if data:
+                    rows.append("\n".join(statement))
+            elif line.startswith("CREATE PROCEDURE"):
+                name = re.search(r"`(\w+)`", line).group(1)
+                params, body = [], []
+                for line in lines:
+                    if line.strip() == "BEGIN":
+                        break
+                    param = re.match(r"\s*(?:IN|OUT|INOUT)\s+`?(\w+)`?", line)
+                    if param:
+                        params.append(param.group(1))
+                for line in lines:
+                    if line.startswith("END"):
+                        break
+                    body.append(line.strip())
+                statement = " ".join(body).strip().rstrip(";")
+                for i, param in enumerate(params):
+                    statement = re.sub(r"\b%s\b" % param, "?%d" % (i+1), statement)
+                procedures[name] = cls.INTERVAL.sub(cls.translate_interval, statement)
+        # Triggers are created after the rows so the dumped values are kept as they are
+        return "\n".join(tables+rows+indexes+triggers), procedures
@@ -0,0 +1,240 @@
+import datetime, json, os, threading, time
+from AECResampler import AECResampler
+
+class AECSampleWriter:
+    """
+    This class is a write-behind buffer for SCADA samples, for a long running ingest process in place of one AECHistorical.py run per sample.
+    Samples are queued in memory and written for every site at once when BATCH_SIZE are queued or FLUSH_SECONDS have passed,
+    with multi-row inserts into historical_buffer, historical and suction_pressure and a single commit (see AECStorage.insert_samples).
+    The resampler of each site (see AECResampler) is kept in memory and its state saved with each batch, so a sample needs no reads either.
+
+    Each sample is first appended to a spool file, which is fsynced once SYNC_SAMPLES samples or SYNC_SECONDS have gone unsynced, so at most those are lost in a crash.
+    When a batch is written, the spool is renamed to <spool>.flushing and a new one started. The renamed file is removed once the batch is committed.
+    A writer started after a crash queues the samples of both files again, the batch being written first, and writes them on its first flush.
+    A crash between the commit and the removal of the renamed file stores that batch twice.
+    Samples of a site the database does not know are moved to <spool>.rejected when their batch is written, so they never hold up the samples of other sites.
+    """
+    BATCH_SIZE = int(os.environ.get('AEC_WRITER_BATCH', 500))
+    """Samples queued before they are written"""
+    FLUSH_SECONDS = float(os.environ.get('AEC_WRITER_FLUSH_SECONDS', 5))
+    """Longest time a sample stays queued before it is written"""
+    SYNC_SAMPLES = int(os.environ.get('AEC_WRITER_SYNC_SAMPLES', 50))
+    """Samples appended to the spool before it is fsynced"""
+    SYNC_SECONDS = float(os.environ.get('AEC_WRITER_SYNC_SECONDS', 1))
+    """Longest time an appended sample goes unsynced"""
+    SPOOL = os.environ.get('AEC_WRITER_SPOOL', 'aec_samples.spool')
+    """Spool file of the samples queued"""
+
+    def __init__(self, storage, spool=None):
+        """
+        Parameters
+        ----------
+        storage
+            AECStorage -> database the samples are written to, by one flush at a time: the background thread's, or those of close and any caller of flush
+        spool
+            String -> defaults to SPOOL
+        """
+        self.storage = storage
+        self.spool = spool or self.SPOOL
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.resamplers = {}
+        self.sites = set()
+        self.stats = {"Samples": 0, "Recovered": 0, "Rejected": 0, "Syncs": 0, "Flushes": 0, "FlushErrors": 0, "Rows": 0, "FlushSeconds": 0.0}
+        # Samples left by a writer that stopped before writing them
+        self.batch = self.read_spool(self.spool+".flushing")
+        self.queue = self.read_spool(self.spool)
+        self.stats["Recovered"] = len(self.batch)+len(self.queue)
+        self.file = open(self.spool, "a")
+        self.unsynced = 0
+        self.synced = time.monotonic()
+        self.stopped = threading.Event()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self.background, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def read_spool(path):
+        """
+        This method returns the samples in a spool file, skipping a last line left half written by a crash.
+        """
+        samples = []
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        samples.append(json.loads(line))
+                    except ValueError:
+                        pass
+        return samples
+
+    def add(self, site_id, level, pumped_flow, suction_pressure=None, created=None):
+        """
+        This method queues a sample, waking the background thread to write the queue when it reaches BATCH_SIZE.
+        The caller never writes to the database, so it carries on while the database is unavailable.
+
+        Parameters
+        ----------
+        site_id
+            Integer -> site the sample is from
+        level
+            Float -> reservoir level in metres
+        pumped_flow
+            Float -> pumped flow in litres/second
+        suction_pressure
+            Float -> suction pressure, None when not measured
+        created
+            DateTime -> time the sample was taken, defaults to now
+        """
+        sample = {"SiteID": int(site_id), "Level": float(level), "PumpedFlow": float(pumped_flow), "SuctionPressure": None if suction_pressure is None else float(suction_pressure),
+            "Created": (created or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S.%f")}
+        with self.lock:
+            self.file.write(json.dumps(sample)+"\n")
+            self.queue.append(sample)
+            self.stats["Samples"] += 1
+            self.unsynced += 1
+            if self.unsynced >= self.SYNC_SAMPLES:
+                self.sync()
+            if len(self.queue) >= self.BATCH_SIZE:
+                self.wake.set()
+
+    def sync(self):
+        """
+        This method fsyncs the spool, the caller holds `lock`.
+        """
+        if self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.stats["Syncs"] += 1
+            self.unsynced = 0
+        self.synced = time.monotonic()
+
+    def resampler(self, site_id):
+        """
+        This method returns the resampler of a site, starting it from the state saved in the database.
+        """
+        if site_id not in self.resamplers:
+            self.storage.site_id = site_id
+            self.resamplers[site_id] = AECResampler(self.storage.get_site_data()["SurfaceArea"], self.storage.get_historical_state())
+        return self.resamplers[site_id]
+
+    def reject_unknown(self, samples):
+        """
+        This method appends the samples of sites not in the database to <spool>.rejected and returns the others.
+        The sites are read again whenever a sample names one not seen before, so a site added while the writer runs is accepted.
+        """
+        if not {sample["SiteID"] for sample in samples} <= self.sites:
+            self.sites = set(self.storage.get_site_ids())
+        rejected = [sample for sample in samples if sample["SiteID"] not in self.sites]
+        if not len(rejected):
+            return samples
+        with open(self.spool+".rejected", "a") as f:
+            for sample in rejected:
+                f.write(json.dumps(sample)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.stats["Rejected"] += len(rejected)
+        return [sample for sample in samples if sample["SiteID"] in self.sites]
+
+    def rows(self, samples):
+        """
+        This method returns the rows of insert_samples for samples and the resampler state of each site after them, without changing the resamplers.
+        """
+        buffer, historical, suction, states = [], [], [], {}
+        for sample in samples:
+            site_id = sample["SiteID"]
+            created = datetime.datetime.strptime(sample["Created"], "%Y-%m-%d %H:%M:%S.%f")
+            if site_id not in states:
+                states[site_id] = AECResampler(self.resampler(site_id).surface_area)
+                states[site_id].state = None if self.resamplers[site_id].state is None else dict(self.resamplers[site_id].state)
+            for slot_start, outlet in states[site_id].add(created, sample["Level"], sample["PumpedFlow"]):
+                historical.append((site_id, outlet, slot_start.strftime("%Y-%m-%d %H:%M:%S")))
+            buffer.append((site_id, sample["PumpedFlow"], sample["Level"], created.strftime("%Y-%m-%d %H:%M:%S")))
+            if sample["SuctionPressure"] is not None:
+                suction.append((site_id, sample["SuctionPressure"], created.strftime("%Y-%m-%d %H:%M:%S")))
+        return buffer, historical, suction, states
+
+    def flush(self):
+        """
+        This method writes the queued samples. A batch that fails to write is kept and written first by the next flush, less the samples rejected (see `reject_unknown`).
+
+        Returns
+        ----------
+        Integer
+            Samples written.
+        """
+        with self.flush_lock:
+            if not len(self.batch):
+                with self.lock:
+                    if not len(self.queue):
+                        return 0
+                    self.sync()
+                    self.file.close()
+                    os.replace(self.spool, self.spool+".flushing")
+                    self.file = open(self.spool, "a")
+                    self.batch, self.queue = self.queue, []
+            start = time.perf_counter()
+            try:
+                self.batch = self.reject_unknown(self.batch)
+                buffer, historical, suction, states = self.rows(self.batch)
+                state_rows = [(site_id, resampler.state["BinStart"].strftime("%Y-%m-%d %H:%M:%S"), resampler.state["BinLevel"], resampler.state["BinPumped"],
+                    resampler.state["LastTime"].strftime("%Y-%m-%d %H:%M:%S.%f"), resampler.state["LastLevel"], resampler.state["LastFlow"]) for site_id, resampler in states.items()]
+                if len(self.batch):
+                    self.storage.insert_samples(buffer, historical, suction, state_rows)
+            except Exception:
+                self.stats["FlushErrors"] += 1
+                raise
+            for site_id, resampler in states.items():
+                self.resamplers[site_id] = resampler
+            os.remove(self.spool+".flushing")
+            written = len(self.batch)
+            self.batch = []
+            self.stats["Flushes"] += 1
+            self.stats["Rows"] += len(buffer)+len(historical)+len(suction)+len(state_rows)
+            self.stats["FlushSeconds"] += time.perf_counter()-start
+            return written
+
+    def background(self):
+        """
+        This method syncs the spool and writes the queue on their time thresholds, or when add finds the queue full, until the writer is closed.
+        After a failed write the next is not tried for FLUSH_SECONDS, however full the queue.
+        """
+        flushed = time.monotonic()
+        failed = False
+        while not self.stopped.is_set():
+            woken = self.wake.wait(min(self.SYNC_SECONDS, self.FLUSH_SECONDS))
+            self.wake.clear()
+            with self.lock:
+                if time.monotonic()-self.synced >= self.SYNC_SECONDS:
+                    self.sync()
+            if self.stopped.is_set():
+                break
+            if (woken and not failed) or time.monotonic()-flushed >= self.FLUSH_SECONDS:
+                try:
+                    self.flush()
+                    failed = False
+                except Exception as e:
+                    # The batch is kept, so the database being unavailable only delays it
+                    print(json.dumps({"Error": "Flush failed", "Detail": str(e)}))
+                    failed = True
+                flushed = time.monotonic()
+
+    def close(self):
+        """
+        This method stops the background thread, writes everything queued and removes the spool. When a write fails the error is raised and the spool kept.
+        """
+        self.stopped.set()
+        self.wake.set()
+        self.thread.join()
+        while len(self.batch) or len(self.queue):
+            self.flush()
+        with self.lock:
+            self.file.close()
+        os.remove(self.spool)
+
+    def metrics(self):
+        """
+        This method returns a copy of the counters with the number of samples not yet written.
+        """
+        with self.lock:
+            return dict(self.stats, Queued=len(self.queue)+len(self.batch))
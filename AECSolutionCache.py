@@ -0,0 +1,159 @@
+import hashlib, json, os, tempfile, threading
+from collections import OrderedDict
+
+class AECSolutionCache:
+    """
+    This class keeps the regimes recently solved, keyed by a fingerprint of everything the optimiser reads with the level and target rounded,
+    so a run with nearly the same inputs as an earlier one reuses its regime instead of solving again.
+    Entries are held in memory with least recently used eviction and, when a directory is given, also as one JSON file per entry so separate AECRun.py processes share them.
+    The entries in memory and the counters are shared by the threads of a process, such as those of AECAsyncRun, under `lock`.
+    """
+    SIZE = int(os.environ.get('AEC_CACHE_SIZE', 128))
+    """Entries kept in memory and on disk, 0 disables the cache"""
+    DIRECTORY = os.environ.get('AEC_CACHE_DIR')
+    """Directory of the on disk store, None to keep entries in memory only"""
+    LEVEL_STEP = float(os.environ.get('AEC_CACHE_LEVEL_STEP', 0.005))
+    """Levels within the same step in metres share an entry"""
+    TARGET_STEP = float(os.environ.get('AEC_CACHE_TARGET_STEP', 1000))
+    """Targets within the same step in litres share an entry"""
+
+    def __init__(self, size=None, directory=None):
+        """
+        Parameters
+        ----------
+        size
+            Integer -> defaults to SIZE
+        directory
+            String -> defaults to DIRECTORY
+        """
+        self.size = self.SIZE if size is None else size
+        self.directory = directory or self.DIRECTORY
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = {"Hits": 0, "DiskHits": 0, "Misses": 0}
+
+    @classmethod
+    def fingerprint(cls, level, target, parts):
+        """
+        This method returns the key for a problem.
+
+        Parameters
+        ----------
+        level
+            Float -> current level, rounded to LEVEL_STEP
+        target
+            Float -> target volume, rounded to TARGET_STEP
+        parts
+            Dictionary -> every other input of the problem, which must be JSON serialisable
+
+        Returns
+        ----------
+        String
+            SHA-256 of the rounded level and target and the parts.
+        """
+        data = json.dumps([round(float(level)/cls.LEVEL_STEP), round(float(target)/cls.TARGET_STEP), parts], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, "%s.json" % key)
+
+    def get(self, key):
+        """
+        This method returns the cached solution for a key, None when there is none.
+        """
+        if self.size <= 0:
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["Hits"] += 1
+                return self.entries[key]
+        if self.directory and os.path.exists(self.path(key)):
+            try:
+                with open(self.path(key)) as f:
+                    solution = json.load(f)
+            except (OSError, ValueError):
+                solution = None
+            if solution is not None:
+                # Touch the file so the on disk store evicts by last use as well, unless another process has just evicted it
+                try:
+                    os.utime(self.path(key))
+                except FileNotFoundError:
+                    pass
+                self.remember(key, solution)
+                with self.lock:
+                    self.stats["DiskHits"] += 1
+                return solution
+        with self.lock:
+            self.stats["Misses"] += 1
+        return None
+
+    def remember(self, key, solution):
+        """
+        This method adds an entry in memory, evicting the least recently used entry when full.
+        """
+        with self.lock:
+            self.entries[key] = solution
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def put(self, key, solution):
+        """
+        This method caches a solution.
+
+        Parameters
+        ----------
+        key
+            String -> from fingerprint
+        solution
+            Dictionary -> must be JSON serialisable when there is an on disk store
+        """
+        if self.size <= 0:
+            return
+        self.remember(key, solution)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written to a temporary file of its own first so a reader never sees it half written, even while another process writes the same key
+            handle, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(handle, "w") as f:
+                    json.dump(solution, f)
+                os.replace(temporary, self.path(key))
+            except BaseException:
+                os.remove(temporary)
+                raise
+            self.evict()
+
+    def evict(self):
+        """
+        This method removes the least recently used files beyond the size of the on disk store. Other processes evict from the same directory,
+        so a file that has gone by the time it is looked at is skipped.
+        """
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        for mtime, path in sorted(files)[:max(len(files)-self.size, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def hit_rate(self):
+        """
+        This method returns the share of lookups answered from the cache.
+        """
+        stats = self.metrics()
+        lookups = stats["Hits"]+stats["DiskHits"]+stats["Misses"]
+        return (stats["Hits"]+stats["DiskHits"])/lookups if lookups else 0.0
+
+    def metrics(self):
+        """
+        This method returns a copy of the counters with the number of entries in memory.
+        """
+        with self.lock:
+            return dict(self.stats, Entries=len(self.entries))
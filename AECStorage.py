@@ -0,0 +1,263 @@
+from abc import ABC, abstractmethod
+
+class AECStorage(ABC):
+    """
+    This class is the storage interface AEC and its tools are written against. AECDatabase implements it for MariaDB and AECSQLiteDatabase for an embedded SQLite database loaded from the aec.sql dump.
+    Methods work on the site in `site_id`, rows are returned as dictionaries keyed by column name.
+    """
+    @abstractmethod
+    def setup_connection(self, username, password, host, port, database):
+        """Sets up the connection details."""
+
+    @abstractmethod
+    def open_connection(self):
+        """Opens the connection and sets `connection` and `cur`."""
+
+    @abstractmethod
+    def close_connection(self):
+        """Closes the connection."""
+
+    # Site, pump, tariff and cost data
+    @abstractmethod
+    def get_site_data(self):
+        """Returns the site row."""
+
+    @abstractmethod
+    def get_cost_data(self, cost_id, month):
+        """Returns the tariff costs for the month."""
+
+    @abstractmethod
+    def get_pump_data(self, pump_combo):
+        """Returns the pump rows for one combination."""
+
+    @abstractmethod
+    def get_all_pump_data(self):
+        """Returns the pump rows for every combination."""
+
+    @abstractmethod
+    def get_tariff_data(self, tariff_id):
+        """Returns the tariff periods."""
+
+    @abstractmethod
+    def get_bank_holidays(self):
+        """Returns the bank holiday dates."""
+
+    @abstractmethod
+    def get_price_curve(self, first_date, last_date):
+        """Returns the half hourly prices for a range of dates."""
+
+    @abstractmethod
+    def insert_price_curve(self, rows):
+        """Stores half hourly prices."""
+
+    @abstractmethod
+    def update_setpoint(self, site_id, setpoint):
+        """Changes the level setpoint of a site."""
+
+    # Measured data
+    @abstractmethod
+    def get_volume_used(self):
+        """Returns the volume pumped today."""
+
+    @abstractmethod
+    def get_volume_delivered_0000(self):
+        """Returns the volume delivered since midnight."""
+
+    @abstractmethod
+    def get_volume_delivered_12(self):
+        """Returns the volume delivered since 12:00."""
+
+    @abstractmethod
+    def get_volume_delivered_0800(self):
+        """Returns the volume delivered since 08:00."""
+
+    @abstractmethod
+    def get_volume_delivered_1600(self):
+        """Returns the volume delivered since 16:00."""
+
+    @abstractmethod
+    def get_volume_delivered_1900(self):
+        """Returns the volume delivered since 19:00."""
+
+    @abstractmethod
+    def get_typical_inlet_data(self):
+        """Returns the typical inlet data."""
+
+    @abstractmethod
+    def get_typical_outlet_data(self):
+        """Returns the typical outlet data."""
+
+    @abstractmethod
+    def get_latest_suction_pressure(self):
+        """Returns the latest suction pressure sample."""
+
+    @abstractmethod
+    def get_suction_pressure_window(self, samples):
+        """Returns the average of the latest suction pressure samples."""
+
+    @abstractmethod
+    def insert_suction_pressure(self, suction_pressure):
+        """Stores a suction pressure sample."""
+
+    @abstractmethod
+    def insert_buffer(self, pumped_flow, level):
+        """Stores a pumped flow and level sample."""
+
+    @abstractmethod
+    def last_historical_buffer(self):
+        """Returns the latest pumped flow and level sample."""
+
+    @abstractmethod
+    def get_historical_buffer(self):
+        """Returns every pumped flow and level sample."""
+
+    @abstractmethod
+    def insert_historical(self, outlet, created=None):
+        """Stores an outlet flow sample."""
+
+    @abstractmethod
+    def get_historical_state(self):
+        """Returns the saved resampler state."""
+
+    @abstractmethod
+    def save_historical_state(self, state):
+        """Saves the resampler state."""
+
+    @abstractmethod
+    def insert_samples(self, buffer, historical, suction, states):
+        """Stores a batch of samples of any sites with their resampler states in one transaction."""
+
+    @abstractmethod
+    def update_historical(self, outlet, updateID):
+        """Corrects an outlet flow sample."""
+
+    @abstractmethod
+    def get_historical(self):
+        """Returns the averaged daily demand profile."""
+
+    @abstractmethod
+    def get_historical_for_target(self, date):
+        """Returns the outlet flow samples for a date."""
+
+    @abstractmethod
+    def get_rows_after(self, table, last_id, limit):
+        """Returns the next batch of rows of an exported table."""
+
+    # Maintenance
+    @abstractmethod
+    def get_partitions(self, table):
+        """Returns the monthly partitions of a table, empty when it is not partitioned."""
+
+    @abstractmethod
+    def add_partition(self, table, name, less_than):
+        """Adds a monthly partition."""
+
+    @abstractmethod
+    def drop_partition(self, table, name):
+        """Drops a monthly partition."""
+
+    @abstractmethod
+    def delete_rows_before(self, table, before):
+        """Deletes the rows created before a time."""
+
+    @abstractmethod
+    def get_buffer_samples(self, first, last):
+        """Returns the samples of every site in a time range."""
+
+    @abstractmethod
+    def get_last_rollup(self):
+        """Returns the latest rolled up slot."""
+
+    @abstractmethod
+    def insert_buffer_rollup(self, rows):
+        """Stores slot aggregates of the samples."""
+
+    @abstractmethod
+    def get_site_ids(self):
+        """Returns the ID of every site."""
+
+    @abstractmethod
+    def get_table(self, table):
+        """Returns every row of a table synthetic sites are derived from."""
+
+    @abstractmethod
+    def insert_rows(self, table, columns, rows):
+        """Stores generated rows of a table in one batch."""
+
+    # Regime
+    @abstractmethod
+    def get_regime_data(self):
+        """Returns today's plan."""
+
+    @abstractmethod
+    def get_regime_yesterday(self):
+        """Returns yesterday's plan."""
+
+    @abstractmethod
+    def add_plan_columns(self):
+        """Adds the plan version columns and tables to a database created before them."""
+
+    @abstractmethod
+    def backfill_plan_versions(self):
+        """Dates the regime rows written before plan versions and seeds their first version."""
+
+    @abstractmethod
+    def save_plan(self, combo):
+        """Stores the regime as a new plan version and returns the version."""
+
+    @abstractmethod
+    def get_latest_plan_version(self):
+        """Returns the latest version of today's plan."""
+
+    @abstractmethod
+    def acquire_site_lock(self, timeout):
+        """Takes the site's lock across processes, returns True when it is held."""
+
+    @abstractmethod
+    def release_site_lock(self):
+        """Releases the site's lock."""
+
+    @abstractmethod
+    def get_plan_versions(self, plan_date):
+        """Returns the version history of a plan."""
+
+    @abstractmethod
+    def get_plan_version(self, plan_date, version):
+        """Returns a plan as it was at a version."""
+
+    @abstractmethod
+    def insert_level_estimate(self, t1, t2, t3, t4, t5, t6, end_day):
+        """Stores the estimated levels of a regime."""
+
+    @abstractmethod
+    def insert_level_trajectory(self, version, trajectory):
+        """Stores the predicted level, inflow and outflow of a plan version as one packed row."""
+
+    @abstractmethod
+    def get_level_trajectory(self, version=None):
+        """Returns the predicted level, inflow and outflow of a plan version of today as a NumPy array."""
+
+    @abstractmethod
+    def insert_diagnostics(self, json_data):
+        """Stores diagnostics of a run."""
+
+    # Targets
+    @abstractmethod
+    def get_target(self):
+        """Returns today's latest target."""
+
+    @abstractmethod
+    def insert_target(self, init_target, demand_adjustment, level_adjustment, pumped_volume, new_target):
+        """Stores a target."""
+
+    @abstractmethod
+    def update_target(self, day, target):
+        """Changes the typical inlet target for a day of the week."""
+
+    @abstractmethod
+    def update_target_new(self, target):
+        """Changes today's target."""
+
+    @abstractmethod
+    def clear_data(self, site_id):
+        """Removes today's targets and regime management data."""
@@ -93,29 +93,30 @@ class AECUtilities:
     def max_volume(self):
         """
         Calculate the max volume remaining for rest of the day.
-        Retrieves the max flow available for pump set * Time Remaining * 3600
+        Retrieves the max flow available across the loaded pump data * Time Remaining * 3600
 
         Returns
         ----------
         Float
             Max Volume available for pumping
         """
-        end_day = datetime.datetime.now().replace(hour=23, minute=59, second=59)
-        time_now = datetime.datetime.now().replace(hour=self.hour, minute=self.minute)
+        end_day = self.now.replace(hour=23, minute=59, second=59)
+        time_now = self.now.replace(hour=self.hour, minute=self.minute)
         diff = end_day-time_now
-        max_volume = diff.total_seconds()*float(self.pump_data[len(self.pump_data)-1]["Flow"])
+        max_volume = diff.total_seconds()*max(float(data["Flow"]) for data in self.pump_data)
         return max_volume
 
     def is_weekday(self):
         """
         This method returns whether or not it is currently a weekday, and is used for adjusting the tariff periods based on time of week.
+        Bank holidays use the weekend tariff.
 
         Returns
         ----------
         Boolean
-            True if current day is a weekday, False otherwise.
+            True if current day is a working weekday, False otherwise.
         """
-        return True if datetime.datetime.today().weekday() < 5 else False
+        return self.calendar.is_working_day(self.now, self.holidays)
 
     """
     This method will return a list of dates in the required format for querying the database and inserting new targets for week ahead.
@@ -19,6 +19,30 @@
 CREATE DATABASE IF NOT EXISTS `aec_redesign` /*!40100 DEFAULT CHARACTER SET armscii8 COLLATE armscii8_bin */;
 USE `aec_redesign`;
 
+-- Dumping structure for table aec_redesign.bank_holiday
+CREATE TABLE IF NOT EXISTS `bank_holiday` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `HolidayDate` date NOT NULL,
+  `Name` varchar(50) COLLATE armscii8_bin DEFAULT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`),
+  UNIQUE KEY `holiday_date` (`HolidayDate`)
+) ENGINE=InnoDB AUTO_INCREMENT=12 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.bank_holiday: ~11 rows (approximately)
+INSERT INTO `bank_holiday` (`ID`, `HolidayDate`, `Name`, `Created`) VALUES
+	(1, '2022-01-03', 'New Year Holiday', '2022-07-13 10:30:00'),
+	(2, '2022-03-17', 'St Patricks Day', '2022-07-13 10:30:00'),
+	(3, '2022-04-15', 'Good Friday', '2022-07-13 10:30:00'),
+	(4, '2022-04-18', 'Easter Monday', '2022-07-13 10:30:00'),
+	(5, '2022-05-02', 'Early May Bank Holiday', '2022-07-13 10:30:00'),
+	(6, '2022-06-02', 'Spring Bank Holiday', '2022-07-13 10:30:00'),
+	(7, '2022-06-03', 'Platinum Jubilee Bank Holiday', '2022-07-13 10:30:00'),
+	(8, '2022-07-12', 'Battle of the Boyne', '2022-07-13 10:30:00'),
+	(9, '2022-08-29', 'Summer Bank Holiday', '2022-07-13 10:30:00'),
+	(10, '2022-12-26', 'Christmas Day', '2022-07-13 10:30:00'),
+	(11, '2022-12-27', 'Boxing Day', '2022-07-13 10:30:00');
+
 -- Dumping structure for table aec_redesign.cost
 CREATE TABLE IF NOT EXISTS `cost` (
   `ID` int(11) NOT NULL AUTO_INCREMENT,
@@ -63,14 +87,163 @@ CREATE TABLE IF NOT EXISTS `cost_type` (
 INSERT INTO `cost_type` (`ID`, `Name`, `Created`, `Updated`) VALUES
 	(1, 'T035', '2022-07-13 11:21:13', NULL);
 
+-- Dumping structure for table aec_redesign.diagnostics
+CREATE TABLE IF NOT EXISTS `diagnostics` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `SiteID` int(11) DEFAULT NULL,
+  `Data` longtext COLLATE armscii8_bin DEFAULT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`),
+  KEY `site_created` (`SiteID`,`Created`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.diagnostics: ~0 rows (approximately)
+
+-- Dumping structure for procedure aec_redesign.getHistoricalForTarget
+DELIMITER //
+CREATE PROCEDURE `getHistoricalForTarget`(
+	IN `site_id` INT,
+	IN `target_date` DATE
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT * FROM historical WHERE SiteID = site_id AND DATE(Created) = target_date ORDER BY ID;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getRegimeYesterday
+DELIMITER //
+CREATE PROCEDURE `getRegimeYesterday`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT * FROM regime WHERE SiteID = site_id AND PlanDate = CURDATE() - INTERVAL 1 DAY ORDER BY ID;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeDelivered0000
+DELIMITER //
+CREATE PROCEDURE `getVolumeDelivered0000`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(Outlet), 0)*1800 AS VolumeDelivered FROM historical WHERE SiteID = site_id AND Created >= CURDATE();
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeDelivered0800
+DELIMITER //
+CREATE PROCEDURE `getVolumeDelivered0800`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(Outlet), 0)*1800 AS VolumeDelivered FROM historical WHERE SiteID = site_id AND Created >= CURDATE() + INTERVAL 8 HOUR;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeDelivered12
+DELIMITER //
+CREATE PROCEDURE `getVolumeDelivered12`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(Outlet), 0)*1800 AS VolumeDelivered FROM historical WHERE SiteID = site_id AND Created >= CURDATE() + INTERVAL 12 HOUR;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeDelivered1600
+DELIMITER //
+CREATE PROCEDURE `getVolumeDelivered1600`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(Outlet), 0)*1800 AS VolumeDelivered FROM historical WHERE SiteID = site_id AND Created >= CURDATE() + INTERVAL 16 HOUR;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeDelivered1900
+DELIMITER //
+CREATE PROCEDURE `getVolumeDelivered1900`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(Outlet), 0)*1800 AS VolumeDelivered FROM historical WHERE SiteID = site_id AND Created >= CURDATE() + INTERVAL 19 HOUR;
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.getVolumeUsed
+DELIMITER //
+CREATE PROCEDURE `getVolumeUsed`(
+	IN `site_id` INT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	SELECT COALESCE(SUM(PumpedFlow), 0)*1800 AS ActualPumped FROM historical_buffer WHERE SiteID = site_id AND Created >= CURDATE();
+END//
+DELIMITER ;
+
 -- Dumping structure for table aec_redesign.historical
 CREATE TABLE IF NOT EXISTS `historical` (
   `ID` int(11) NOT NULL AUTO_INCREMENT,
   `SiteID` int(11) DEFAULT NULL,
   `Outlet` float DEFAULT NULL,
-  `Created` timestamp NULL DEFAULT current_timestamp(),
-  PRIMARY KEY (`ID`)
-) ENGINE=InnoDB AUTO_INCREMENT=59504 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+  `Created` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`,`Created`),
+  KEY `site_created` (`SiteID`,`Created`)
+) ENGINE=InnoDB AUTO_INCREMENT=59504 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin
+/*!50100 PARTITION BY RANGE (UNIX_TIMESTAMP(`Created`))
+(PARTITION `p202107` VALUES LESS THAN (1627772400) ENGINE = InnoDB,
+ PARTITION `p202108` VALUES LESS THAN (1630450800) ENGINE = InnoDB,
+ PARTITION `p202109` VALUES LESS THAN (1633042800) ENGINE = InnoDB,
+ PARTITION `p202110` VALUES LESS THAN (1635724800) ENGINE = InnoDB,
+ PARTITION `p202111` VALUES LESS THAN (1638316800) ENGINE = InnoDB,
+ PARTITION `p202112` VALUES LESS THAN (1640995200) ENGINE = InnoDB,
+ PARTITION `p202201` VALUES LESS THAN (1643673600) ENGINE = InnoDB,
+ PARTITION `p202202` VALUES LESS THAN (1646092800) ENGINE = InnoDB,
+ PARTITION `p202203` VALUES LESS THAN (1648767600) ENGINE = InnoDB,
+ PARTITION `p202204` VALUES LESS THAN (1651359600) ENGINE = InnoDB,
+ PARTITION `p202205` VALUES LESS THAN (1654038000) ENGINE = InnoDB,
+ PARTITION `p202206` VALUES LESS THAN (1656630000) ENGINE = InnoDB,
+ PARTITION `p202207` VALUES LESS THAN (1659308400) ENGINE = InnoDB,
+ PARTITION `pmax` VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
 
 -- Dumping data for table aec_redesign.historical: ~31,638 rows (approximately)
 INSERT INTO `historical` (`ID`, `SiteID`, `Outlet`, `Created`) VALUES
@@ -34063,9 +34236,25 @@ CREATE TABLE IF NOT EXISTS `historical_buffer` (
   `SiteID` int(11) DEFAULT NULL,
   `PumpedFlow` float DEFAULT NULL,
   `Level` float DEFAULT NULL,
-  `Created` timestamp NULL DEFAULT current_timestamp(),
-  PRIMARY KEY (`ID`)
-) ENGINE=InnoDB AUTO_INCREMENT=48218 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+  `Created` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`,`Created`),
+  KEY `site_created` (`SiteID`,`Created`)
+) ENGINE=InnoDB AUTO_INCREMENT=48218 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin
+/*!50100 PARTITION BY RANGE (UNIX_TIMESTAMP(`Created`))
+(PARTITION `p202107` VALUES LESS THAN (1627772400) ENGINE = InnoDB,
+ PARTITION `p202108` VALUES LESS THAN (1630450800) ENGINE = InnoDB,
+ PARTITION `p202109` VALUES LESS THAN (1633042800) ENGINE = InnoDB,
+ PARTITION `p202110` VALUES LESS THAN (1635724800) ENGINE = InnoDB,
+ PARTITION `p202111` VALUES LESS THAN (1638316800) ENGINE = InnoDB,
+ PARTITION `p202112` VALUES LESS THAN (1640995200) ENGINE = InnoDB,
+ PARTITION `p202201` VALUES LESS THAN (1643673600) ENGINE = InnoDB,
+ PARTITION `p202202` VALUES LESS THAN (1646092800) ENGINE = InnoDB,
+ PARTITION `p202203` VALUES LESS THAN (1648767600) ENGINE = InnoDB,
+ PARTITION `p202204` VALUES LESS THAN (1651359600) ENGINE = InnoDB,
+ PARTITION `p202205` VALUES LESS THAN (1654038000) ENGINE = InnoDB,
+ PARTITION `p202206` VALUES LESS THAN (1656630000) ENGINE = InnoDB,
+ PARTITION `p202207` VALUES LESS THAN (1659308400) ENGINE = InnoDB,
+ PARTITION `pmax` VALUES LESS THAN MAXVALUE ENGINE = InnoDB) */;
 
 -- Dumping data for table aec_redesign.historical_buffer: ~29,199 rows (approximately)
 INSERT INTO `historical_buffer` (`ID`, `SiteID`, `PumpedFlow`, `Level`, `Created`) VALUES
@@ -34077,7 +34266,7 @@ INSERT INTO `historical_buffer` (`ID`, `SiteID`, `PumpedFlow`, `Level`, `Created
 	(7, 11, 100, 4.4, '2022-07-13 19:26:07'),
 	(8, 11, 200, 4.4, '2022-07-13 19:32:17'),
 	(9, 13, 200, 4.4, '2022-07-14 15:11:12'),
-	(17621, 2, 1, 2, NULL),
+	(17621, 2, 1, 2, '2021-07-05 09:11:40'),
 	(17622, 2, 1, 2, '2021-07-05 09:11:40'),
 	(17623, 2, 11, 3, '2021-07-05 10:24:07'),
 	(17624, 2, 11, 3, '2021-07-05 10:24:22'),
@@ -64678,6 +64867,119 @@ INSERT INTO `historical_buffer` (`ID`, `SiteID`, `PumpedFlow`, `Level`, `Created
 	(48216, 3, 0, 1.944, '2022-07-20 12:00:00'),
 	(48217, 3, 48.15, 1.917, '2022-07-20 12:30:00');
 
+-- Dumping structure for table aec_redesign.historical_buffer_rollup
+CREATE TABLE IF NOT EXISTS `historical_buffer_rollup` (
+  `SiteID` int(11) NOT NULL,
+  `SlotStart` datetime NOT NULL,
+  `Samples` int(11) NOT NULL,
+  `PumpedFlow` float DEFAULT NULL,
+  `Level` float DEFAULT NULL,
+  `MinLevel` float DEFAULT NULL,
+  `MaxLevel` float DEFAULT NULL,
+  PRIMARY KEY (`SiteID`,`SlotStart`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.historical_buffer_rollup: ~0 rows (approximately)
+
+-- Dumping structure for table aec_redesign.historical_state
+CREATE TABLE IF NOT EXISTS `historical_state` (
+  `SiteID` int(11) NOT NULL,
+  `BinStart` datetime NOT NULL,
+  `BinLevel` float NOT NULL,
+  `BinPumped` double NOT NULL,
+  `LastTime` datetime(6) NOT NULL,
+  `LastLevel` float NOT NULL,
+  `LastFlow` float NOT NULL,
+  `Updated` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`SiteID`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.historical_state: ~0 rows (approximately)
+
+-- Dumping structure for procedure aec_redesign.insertDiagnostics
+DELIMITER //
+CREATE PROCEDURE `insertDiagnostics`(
+	IN `site_id` INT,
+	IN `json_data` LONGTEXT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	INSERT INTO diagnostics (SiteID, Data) VALUES (site_id, json_data);
+END//
+DELIMITER ;
+
+-- Dumping structure for procedure aec_redesign.insertLevelEstimate
+DELIMITER //
+CREATE PROCEDURE `insertLevelEstimate`(
+	IN `site_id` INT,
+	IN `t1` FLOAT,
+	IN `t2` FLOAT,
+	IN `t3` FLOAT,
+	IN `t4` FLOAT,
+	IN `t5` FLOAT,
+	IN `t6` FLOAT,
+	IN `end_day` FLOAT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	INSERT INTO level_estimate (SiteID, T1, T2, T3, T4, T5, T6, EndDay) VALUES (site_id, t1, t2, t3, t4, t5, t6, end_day);
+END//
+DELIMITER ;
+
+-- Dumping structure for table aec_redesign.level_estimate
+CREATE TABLE IF NOT EXISTS `level_estimate` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `SiteID` int(11) DEFAULT NULL,
+  `T1` float DEFAULT NULL,
+  `T2` float DEFAULT NULL,
+  `T3` float DEFAULT NULL,
+  `T4` float DEFAULT NULL,
+  `T5` float DEFAULT NULL,
+  `T6` float DEFAULT NULL,
+  `EndDay` float DEFAULT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.level_estimate: ~0 rows (approximately)
+
+-- Dumping structure for table aec_redesign.level_trajectory
+CREATE TABLE IF NOT EXISTS `level_trajectory` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `SiteID` int(11) NOT NULL,
+  `PlanDate` date NOT NULL,
+  `Version` int(11) NOT NULL,
+  `Samples` int(11) NOT NULL,
+  `Trajectory` blob NOT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`),
+  UNIQUE KEY `site_plan_version` (`SiteID`,`PlanDate`,`Version`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.level_trajectory: ~0 rows (approximately)
+
+-- Dumping structure for table aec_redesign.price_curve
+CREATE TABLE IF NOT EXISTS `price_curve` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `SiteID` int(11) NOT NULL,
+  `PriceDate` date NOT NULL,
+  `Slot` tinyint(4) NOT NULL,
+  `Price` double NOT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`),
+  UNIQUE KEY `site_date_slot` (`SiteID`,`PriceDate`,`Slot`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.price_curve: ~0 rows (approximately)
+
 -- Dumping structure for table aec_redesign.pump
 CREATE TABLE IF NOT EXISTS `pump` (
   `ID` int(11) NOT NULL AUTO_INCREMENT,
@@ -64781,9 +65083,12 @@ CREATE TABLE IF NOT EXISTS `regime` (
   `Cost` float(10,2) DEFAULT NULL,
   `EstLevel` float(10,2) DEFAULT NULL,
   `Pump` int(11) DEFAULT NULL,
+  `PlanDate` date DEFAULT NULL,
+  `Version` int(11) DEFAULT NULL,
   `Created` timestamp NULL DEFAULT current_timestamp(),
   `Updated` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
-  PRIMARY KEY (`ID`)
+  PRIMARY KEY (`ID`),
+  KEY `site_plan_date` (`SiteID`,`PlanDate`)
 ) ENGINE=InnoDB AUTO_INCREMENT=2327 DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
 
 -- Dumping data for table aec_redesign.regime: ~2,211 rows (approximately)
@@ -67008,6 +67313,39 @@ INSERT INTO `regime` (`ID`, `SiteID`, `PeriodName`, `Speed`, `Flow`, `Time`, `Vo
 	(2325, 3, 'T6', 99.00, 9.60, 2.00, 57024.00, 3.29, 1.85, 1, '2022-07-22 07:13:18', '2022-07-22 07:13:18'),
 	(2326, 3, 'T7', 90.00, 9.60, 1.50, 51840.00, 2.58, 2.01, 1, '2022-07-22 07:13:18', '2022-07-22 07:13:18');
 
+-- Dumping structure for table aec_redesign.regime_version
+CREATE TABLE IF NOT EXISTS `regime_version` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `SiteID` int(11) NOT NULL,
+  `PlanDate` date NOT NULL,
+  `Version` int(11) NOT NULL,
+  `ChangedPeriods` int(11) DEFAULT NULL,
+  `Created` timestamp NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`ID`),
+  UNIQUE KEY `site_plan_version` (`SiteID`,`PlanDate`,`Version`)
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.regime_version: ~0 rows (approximately)
+
+-- Dumping structure for table aec_redesign.regime_version_period
+CREATE TABLE IF NOT EXISTS `regime_version_period` (
+  `ID` int(11) NOT NULL AUTO_INCREMENT,
+  `VersionID` int(11) NOT NULL,
+  `PeriodName` varchar(50) COLLATE armscii8_bin DEFAULT NULL,
+  `Speed` float(10,2) DEFAULT NULL,
+  `Flow` float(10,2) DEFAULT NULL,
+  `Time` float(10,2) DEFAULT NULL,
+  `Volume` float(10,2) DEFAULT NULL,
+  `Cost` float(10,2) DEFAULT NULL,
+  `EstLevel` float(10,2) DEFAULT NULL,
+  `Pump` int(11) DEFAULT NULL,
+  PRIMARY KEY (`ID`),
+  KEY `FK_regime_version_period_version` (`VersionID`),
+  CONSTRAINT `FK_regime_version_period_version` FOREIGN KEY (`VersionID`) REFERENCES `regime_version` (`ID`) ON DELETE NO ACTION ON UPDATE NO ACTION
+) ENGINE=InnoDB DEFAULT CHARSET=armscii8 COLLATE=armscii8_bin;
+
+-- Dumping data for table aec_redesign.regime_version_period: ~0 rows (approximately)
+
 -- Dumping structure for table aec_redesign.site
 CREATE TABLE IF NOT EXISTS `site` (
   `ID` int(11) NOT NULL AUTO_INCREMENT,
@@ -67020,6 +67358,17 @@ CREATE TABLE IF NOT EXISTS `site` (
   `TariffType` int(11) DEFAULT NULL,
   `CostType` int(11) DEFAULT NULL,
   `SuctionAdjustment` tinyint(4) DEFAULT 0,
+  `SwitchCost` float DEFAULT NULL,
+  `MaxSwitches` int(11) DEFAULT NULL,
+  `ContinuousSpeed` tinyint(4) DEFAULT 0,
+  `MaxDemand` float DEFAULT NULL,
+  `DemandCharge` float DEFAULT NULL,
+  `MaxEnergy` float DEFAULT NULL,
+  `MaxStarts` int(11) DEFAULT NULL,
+  `MinRunHours` float DEFAULT NULL,
+  `MaxRamp` float DEFAULT NULL,
+  `LevelWeight` float DEFAULT NULL,
+  `EnergyWeight` float DEFAULT NULL,
   `Created` timestamp NULL DEFAULT current_timestamp(),
   `Updated` timestamp NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
   PRIMARY KEY (`ID`),
@@ -67885,6 +68234,22 @@ INSERT INTO `tariff_type` (`ID`, `Name`, `Created`, `Updated`) VALUES
 	(2, '7 Periods', '2022-07-13 10:39:30', '2022-07-13 10:39:40'),
 	(3, '8 Periods', '2022-07-15 08:51:36', '2022-07-15 08:51:36');
 
+-- Dumping structure for procedure aec_redesign.updateTarget
+DELIMITER //
+CREATE PROCEDURE `updateTarget`(
+	IN `site_id` INT,
+	IN `new_target` FLOAT
+)
+LANGUAGE SQL
+NOT DETERMINISTIC
+CONTAINS SQL
+SQL SECURITY DEFINER
+COMMENT ''
+BEGIN
+	UPDATE target SET NewTarget = new_target WHERE SiteID = site_id AND DATE(Created) = CURDATE();
+END//
+DELIMITER ;
+
 /*!40103 SET TIME_ZONE=IFNULL(@OLD_TIME_ZONE, 'system') */;
 /*!40101 SET SQL_MODE=IFNULL(@OLD_SQL_MODE, '') */;
 /*!40014 SET FOREIGN_KEY_CHECKS=IFNULL(@OLD_FOREIGN_KEY_CHECKS, 1) */;